@@ -4,6 +4,7 @@ import { GoogleGenerativeAI } from "@google/generative-ai"
 import Anthropic from "@anthropic-ai/sdk"
 
 const CONFIDENCE_THRESHOLD = 0.4
+const MATCH_THRESHOLD = 0.3
 
 type FPRIntent =
   | "personal_earnings_projection" // "How much will I make?"
@@ -192,13 +193,27 @@ export async function POST(request: Request, { params }: { params: Promise<{ fdd
     console.log("[v0] AI Chat: Searching for similar chunks in database...")
     const supabase = await createClient()
 
-    const { data: matches, error: searchError } = await supabase.rpc("match_fdd_chunks", {
+    // Hybrid full-text + vector search (RRF); fall back to vector-only if the function isn't deployed
+    let { data: matches, error: searchError } = await supabase.rpc("hybrid_match_fdd_chunks", {
+      query_text: query,
       query_embedding: queryEmbedding,
       fdd_id_filter: fdd_id,
-      match_threshold: 0.3,
       match_count: limit,
+      match_threshold: MATCH_THRESHOLD,
     })
 
+    if (searchError) {
+      console.log("[v0] AI Chat: Hybrid search unavailable, using vector search:", searchError.message)
+      const fallback = await supabase.rpc("match_fdd_chunks", {
+        query_embedding: queryEmbedding,
+        fdd_id_filter: fdd_id,
+        match_threshold: MATCH_THRESHOLD,
+        match_count: limit,
+      })
+      matches = fallback.data
+      searchError = fallback.error
+    }
+
     if (searchError) {
       console.error("[v0] AI Chat: Database search error:", searchError)
       if (pageImages?.length > 0) {
@@ -218,10 +233,17 @@ export async function POST(request: Request, { params }: { params: Promise<{ fdd
       )
     }
 
-    const avgSimilarity = matches?.length
-      ? matches.reduce((sum: number, m: any) => sum + m.similarity, 0) / matches.length
+    // Confidence comes from the semantic hits only: hybrid search also returns lexical-only matches
+    // below match_threshold (similarity 0 without an embedding), which vector search never did
+    const semanticMatches = (matches || []).filter((m: any) => m.similarity >= MATCH_THRESHOLD)
+    const avgSimilarity = semanticMatches.length
+      ? semanticMatches.reduce((sum: number, m: any) => sum + m.similarity, 0) / semanticMatches.length
       : 0
-    console.log("[v0] AI Chat: Average similarity score:", avgSimilarity.toFixed(3))
+    console.log(
+      "[v0] AI Chat: Average similarity score:",
+      avgSimilarity.toFixed(3),
+      `(${semanticMatches.length} of ${matches?.length || 0} matches are semantic)`,
+    )
 
     if (avgSimilarity < CONFIDENCE_THRESHOLD) {
       console.log("[v0] AI Chat: Low confidence, using vision fallback")
@@ -306,7 +306,7 @@ export interface FDDQuestionAnswer {
   updated_at: string
 }
 
-// Type for match_fdd_chunks function result
+// Type for match_fdd_chunks / hybrid_match_fdd_chunks function results
 export interface FDDChunkMatch {
   id: string
   chunk_text: string
@@ -316,6 +316,7 @@ export interface FDDChunkMatch {
   end_page: number
   metadata: Record<string, any>
   similarity: number
+  rrf_score?: number // hybrid_match_fdd_chunks only
 }
 
 // Type for search_fdd_chunks_with_filters function result
@@ -0,0 +1,39 @@
+-- Migration: Idempotent chunk upserts for fdd_chunks
+-- Feature: enhanced_chunking_for_semantic_search.py upserts on (fdd_id, chunk_index)
+--          and skips chunks whose content_hash is unchanged
+
+-- =============================================================================
+-- STEP 1: Add content hash column
+-- sha256 of the chunk fields (text, pages, metadata) and embedding model
+-- =============================================================================
+
+ALTER TABLE fdd_chunks
+ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+COMMENT ON COLUMN fdd_chunks.content_hash IS
+'sha256 of chunk text, page range, metadata and embedding model. Unchanged chunks are skipped on re-ingestion.';
+
+-- =============================================================================
+-- STEP 2: Remove duplicates left by repeated blind inserts
+-- Keeps the most recently created row for each (fdd_id, chunk_index)
+-- =============================================================================
+
+DELETE FROM fdd_chunks a
+USING fdd_chunks b
+WHERE a.fdd_id = b.fdd_id
+  AND a.chunk_index = b.chunk_index
+  AND (a.created_at, a.id::text) < (b.created_at, b.id::text);
+
+-- =============================================================================
+-- STEP 3: Upsert key
+-- PostgREST on_conflict=fdd_id,chunk_index requires a unique index
+-- =============================================================================
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_fdd_chunks_fdd_id_chunk_index
+ON fdd_chunks(fdd_id, chunk_index);
+
+-- Verify
+SELECT fdd_id, COUNT(*) AS chunks, COUNT(content_hash) AS hashed
+FROM fdd_chunks
+GROUP BY fdd_id
+ORDER BY chunks DESC;
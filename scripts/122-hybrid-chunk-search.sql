@@ -0,0 +1,104 @@
+-- Migration: Hybrid lexical + vector search over fdd_chunks
+-- Feature: Postgres full-text search fused with pgvector similarity via
+--          reciprocal rank fusion (RRF). Exact terms ("royalty", "Item 19
+--          median", dollar amounts) rank well even when cosine similarity
+--          alone does not. Local equivalent: scripts/hybrid_search.py
+
+-- =============================================================================
+-- STEP 1: Full-text column and index
+-- =============================================================================
+
+ALTER TABLE fdd_chunks
+ADD COLUMN IF NOT EXISTS chunk_tsv TSVECTOR
+GENERATED ALWAYS AS (to_tsvector('english', COALESCE(chunk_text, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_fdd_chunks_chunk_tsv ON fdd_chunks USING GIN (chunk_tsv);
+
+-- =============================================================================
+-- STEP 2: hybrid_match_fdd_chunks
+-- Each retriever contributes 1 / (rrf_k + rank) for its top candidate_count
+-- chunks. With lexical_prefilter, vector scoring only considers the lexical
+-- candidates (falls back to all chunks when nothing matches lexically).
+-- similarity is the cosine similarity, as returned by match_fdd_chunks.
+-- =============================================================================
+
+DROP FUNCTION IF EXISTS hybrid_match_fdd_chunks(TEXT, VECTOR, UUID, INT, FLOAT, INT, INT, BOOLEAN);
+
+CREATE OR REPLACE FUNCTION hybrid_match_fdd_chunks(
+  query_text TEXT,
+  query_embedding VECTOR(768),
+  fdd_id_filter UUID,
+  match_count INT DEFAULT 5,
+  match_threshold FLOAT DEFAULT 0.3,
+  candidate_count INT DEFAULT 50,
+  rrf_k INT DEFAULT 60,
+  lexical_prefilter BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+  id UUID,
+  chunk_text TEXT,
+  item_number INT,
+  page_number INT,
+  start_page INT,
+  end_page INT,
+  metadata JSONB,
+  similarity FLOAT,
+  rrf_score FLOAT
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH query AS (
+    SELECT websearch_to_tsquery('english', query_text) AS tsq
+  ),
+  lexical AS (
+    SELECT c.id, ROW_NUMBER() OVER (ORDER BY ts_rank_cd(c.chunk_tsv, q.tsq) DESC) AS rank
+    FROM fdd_chunks c, query q
+    WHERE c.fdd_id = fdd_id_filter
+      AND c.chunk_tsv @@ q.tsq
+    ORDER BY ts_rank_cd(c.chunk_tsv, q.tsq) DESC
+    LIMIT candidate_count
+  ),
+  semantic AS (
+    SELECT c.id, ROW_NUMBER() OVER (ORDER BY c.embedding <=> query_embedding) AS rank
+    FROM fdd_chunks c
+    WHERE c.fdd_id = fdd_id_filter
+      AND c.embedding IS NOT NULL
+      AND 1 - (c.embedding <=> query_embedding) > match_threshold
+      AND (
+        NOT lexical_prefilter
+        OR NOT EXISTS (SELECT 1 FROM lexical)
+        OR c.id IN (SELECT l.id FROM lexical l)
+      )
+    ORDER BY c.embedding <=> query_embedding
+    LIMIT candidate_count
+  ),
+  fused AS (
+    SELECT
+      COALESCE(l.id, s.id) AS id,
+      COALESCE(1.0 / (rrf_k + l.rank), 0) + COALESCE(1.0 / (rrf_k + s.rank), 0) AS rrf_score
+    FROM lexical l
+    FULL OUTER JOIN semantic s ON s.id = l.id
+  )
+  SELECT
+    c.id,
+    c.chunk_text,
+    c.item_number,
+    c.page_number,
+    c.start_page,
+    c.end_page,
+    c.metadata,
+    CASE WHEN c.embedding IS NULL THEN 0 ELSE 1 - (c.embedding <=> query_embedding) END AS similarity,
+    f.rrf_score::FLOAT
+  FROM fused f
+  JOIN fdd_chunks c ON c.id = f.id
+  ORDER BY f.rrf_score DESC
+  LIMIT match_count;
+$$;
+
+-- Verify the function was created
+DO $$
+BEGIN
+  RAISE NOTICE '✓ hybrid_match_fdd_chunks created';
+  RAISE NOTICE 'Function signature: hybrid_match_fdd_chunks(query_text, query_embedding, fdd_id_filter, match_count, match_threshold, candidate_count, rrf_k, lexical_prefilter)';
+END $$;
@@ -0,0 +1,26 @@
+-- Migration: updated_at watermarks for incremental prod → staging sync
+-- Feature: sync_engine.py copies only rows whose updated_at moved past the
+--          last synced watermark. fdd_chunks had no updated_at trigger, so
+--          embedding-only updates (e.g. --repair) were invisible to it.
+
+-- =============================================================================
+-- STEP 1: Keep fdd_chunks.updated_at current on every update
+-- =============================================================================
+
+ALTER TABLE fdd_chunks
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+DROP TRIGGER IF EXISTS update_fdd_chunks_updated_at ON fdd_chunks;
+CREATE TRIGGER update_fdd_chunks_updated_at BEFORE UPDATE ON fdd_chunks
+  FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- =============================================================================
+-- STEP 2: Keyset index for "updated_at > watermark ORDER BY updated_at, id"
+-- Smaller tables are cheap to scan; fdd_chunks is the one that needs it
+-- =============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_fdd_chunks_updated_at_id ON fdd_chunks(updated_at, id);
+
+-- Verify
+SELECT COUNT(*) AS chunks, COUNT(updated_at) AS with_updated_at, MAX(updated_at) AS latest
+FROM fdd_chunks;
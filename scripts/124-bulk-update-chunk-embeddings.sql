@@ -0,0 +1,48 @@
+-- Migration: Bulk embedding updates for fdd_chunks
+-- Feature: sync_embeddings_batch.py writes many embeddings per request through
+--          one parameterized UPDATE instead of one PATCH per chunk (or SQL
+--          built by string concatenation through exec_sql)
+
+-- =============================================================================
+-- update_fdd_chunk_embeddings
+-- chunk_ids[i] gets embeddings[i] (pgvector text, e.g. '[0.1,0.2,...]').
+-- Returns the number of rows updated; ids that do not exist are ignored.
+-- =============================================================================
+
+DROP FUNCTION IF EXISTS update_fdd_chunk_embeddings(UUID[], TEXT[]);
+
+CREATE OR REPLACE FUNCTION update_fdd_chunk_embeddings(
+  chunk_ids UUID[],
+  embeddings TEXT[]
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  updated_count INT;
+BEGIN
+  IF COALESCE(array_length(chunk_ids, 1), 0) <> COALESCE(array_length(embeddings, 1), 0) THEN
+    RAISE EXCEPTION 'chunk_ids and embeddings must have the same length (% vs %)',
+      array_length(chunk_ids, 1), array_length(embeddings, 1);
+  END IF;
+
+  UPDATE fdd_chunks c
+  SET embedding = u.embedding::vector(768)
+  FROM unnest(chunk_ids, embeddings) AS u(id, embedding)
+  WHERE c.id = u.id;
+
+  GET DIAGNOSTICS updated_count = ROW_COUNT;
+  RETURN updated_count;
+END;
+$$;
+
+-- Service role only: the sync scripts call it with the service key
+REVOKE ALL ON FUNCTION update_fdd_chunk_embeddings(UUID[], TEXT[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION update_fdd_chunk_embeddings(UUID[], TEXT[]) TO service_role;
+
+-- Verify the function was created
+DO $$
+BEGIN
+  RAISE NOTICE '✓ update_fdd_chunk_embeddings created';
+  RAISE NOTICE 'Function signature: update_fdd_chunk_embeddings(chunk_ids UUID[], embeddings TEXT[])';
+END $$;
@@ -0,0 +1,141 @@
+-- Migration: Checksum functions for prod ↔ staging drift detection
+-- Feature: drift_detector.py compares per-bucket hashes computed in each
+--          database, drilling into buckets that differ (Merkle-style) until
+--          it can name the exact rows. Only hashes leave the database. The
+--          root call hashes the whole table once per side; deeper calls read
+--          only the rows under a differing bucket.
+
+-- =============================================================================
+-- Buckets are prefixes of a partition column's text (id by default, or e.g.
+-- fdd_id for fdd_chunks). A row hash is md5 of the row as JSONB minus the
+-- excluded columns (columns that legitimately differ between environments:
+-- updated_at rewritten by triggers, remapped user UUIDs, generated columns).
+--
+-- On UUID partition columns a prefix is also turned into a UUID range, so
+-- reads under a bucket use the column's btree index instead of a full scan.
+-- Each bucket reports how many partition values it holds: a bucket with a
+-- single value (one FDD's chunks) is compared with table_row_hashes by
+-- equality on that value instead of drilling down the rest of the UUID.
+-- =============================================================================
+
+DROP FUNCTION IF EXISTS table_bucket_hashes(TEXT, TEXT, TEXT, INT, TEXT[]);
+DROP FUNCTION IF EXISTS table_row_hashes(TEXT, TEXT, TEXT, TEXT[], TEXT, INT);
+DROP FUNCTION IF EXISTS table_row_hashes(TEXT, TEXT, TEXT, TEXT[], TEXT, INT, TEXT);
+DROP FUNCTION IF EXISTS drift_check_target(TEXT, TEXT);
+
+-- Validates the target and returns the partition column's type
+CREATE OR REPLACE FUNCTION drift_check_target(p_table TEXT, p_partition TEXT)
+RETURNS TEXT
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  v_type TEXT;
+BEGIN
+  SELECT data_type INTO v_type
+  FROM information_schema.columns
+  WHERE table_schema = 'public' AND table_name = p_table AND column_name = p_partition;
+  IF v_type IS NULL THEN
+    RAISE EXCEPTION 'unknown table or partition column: %.%', p_table, p_partition;
+  END IF;
+  RETURN v_type;
+END;
+$$;
+
+-- Every UUID whose text starts with p_prefix lies between these bounds
+CREATE OR REPLACE FUNCTION drift_uuid_bounds(p_prefix TEXT, OUT lo UUID, OUT hi UUID)
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT (p_prefix || substr('00000000-0000-0000-0000-000000000000', length(p_prefix) + 1))::UUID,
+         (p_prefix || substr('ffffffff-ffff-ffff-ffff-ffffffffffff', length(p_prefix) + 1))::UUID
+$$;
+
+-- One row per child bucket of p_prefix (bucket = first length(p_prefix) + p_depth characters)
+CREATE OR REPLACE FUNCTION table_bucket_hashes(
+  p_table TEXT,
+  p_partition TEXT DEFAULT 'id',
+  p_prefix TEXT DEFAULT '',
+  p_depth INT DEFAULT 1,
+  p_exclude TEXT[] DEFAULT '{}'
+)
+RETURNS TABLE (bucket TEXT, row_count BIGINT, partition_count BIGINT, partition_value TEXT, bucket_hash TEXT)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  v_type TEXT := drift_check_target(p_table, p_partition);
+  v_lo UUID;
+  v_hi UUID;
+  v_range TEXT := '';
+BEGIN
+  IF v_type = 'uuid' AND p_prefix <> '' THEN
+    SELECT b.lo, b.hi INTO v_lo, v_hi FROM drift_uuid_bounds(p_prefix) b;
+    v_range := format(' AND t.%I BETWEEN $4 AND $5', p_partition);
+  END IF;
+  RETURN QUERY EXECUTE format(
+    'SELECT left(t.%1$I::text, $3) AS bucket,
+            count(*)::BIGINT,
+            count(DISTINCT t.%1$I)::BIGINT,
+            min(t.%1$I::text),
+            md5(string_agg(md5((to_jsonb(t) - $2)::text), '''' ORDER BY t.id))
+     FROM public.%2$I t
+     WHERE starts_with(t.%1$I::text, $1)%3$s
+     GROUP BY 1
+     ORDER BY 1',
+    p_partition, p_table, v_range)
+  USING p_prefix, p_exclude, length(p_prefix) + p_depth, v_lo, v_hi;
+END;
+$$;
+
+-- Row hashes under a bucket (or for one partition value when p_value is
+-- given), keyset-paged by id (p_after = last id of the previous page)
+CREATE OR REPLACE FUNCTION table_row_hashes(
+  p_table TEXT,
+  p_partition TEXT DEFAULT 'id',
+  p_prefix TEXT DEFAULT '',
+  p_exclude TEXT[] DEFAULT '{}',
+  p_after TEXT DEFAULT '',
+  p_limit INT DEFAULT 1000,
+  p_value TEXT DEFAULT NULL
+)
+RETURNS TABLE (id TEXT, partition_value TEXT, row_hash TEXT)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  v_type TEXT := drift_check_target(p_table, p_partition);
+  v_lo UUID;
+  v_hi UUID;
+  v_filter TEXT;
+BEGIN
+  IF p_value IS NOT NULL THEN
+    v_filter := format('t.%I = $5::%s', p_partition, v_type);
+  ELSE
+    v_filter := format('starts_with(t.%I::text, $1)', p_partition);
+    IF v_type = 'uuid' AND p_prefix <> '' THEN
+      SELECT b.lo, b.hi INTO v_lo, v_hi FROM drift_uuid_bounds(p_prefix) b;
+      v_filter := v_filter || format(' AND t.%I BETWEEN $6 AND $7', p_partition);
+    END IF;
+  END IF;
+  RETURN QUERY EXECUTE format(
+    'SELECT t.id::text, t.%1$I::text, md5((to_jsonb(t) - $2)::text)
+     FROM public.%2$I t
+     WHERE %3$s AND t.id::text > $3
+     ORDER BY t.id::text
+     LIMIT $4',
+    p_partition, p_table, v_filter)
+  USING p_prefix, p_exclude, p_after, p_limit, p_value, v_lo, v_hi;
+END;
+$$;
+
+-- Service role only: they read every row of any public table
+REVOKE ALL ON FUNCTION drift_check_target(TEXT, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION table_bucket_hashes(TEXT, TEXT, TEXT, INT, TEXT[]) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION table_row_hashes(TEXT, TEXT, TEXT, TEXT[], TEXT, INT, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION drift_check_target(TEXT, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION table_bucket_hashes(TEXT, TEXT, TEXT, INT, TEXT[]) TO service_role;
+GRANT EXECUTE ON FUNCTION table_row_hashes(TEXT, TEXT, TEXT, TEXT[], TEXT, INT, TEXT) TO service_role;
+
+-- Verify
+SELECT * FROM table_bucket_hashes('fdds') LIMIT 5;
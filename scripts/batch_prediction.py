@@ -0,0 +1,425 @@
+"""
+Provider-Native Batch Prediction
+================================
+Offline batch mode for bulk FDD backfills. Instead of thousands of
+synchronous online requests, prompts are written to a JSONL request file,
+submitted as one batch job, polled until the provider finishes, and the
+results are read back keyed by custom_id.
+
+Backends (pluggable, same interface):
+- local:     file-based stand-in; a responder callable answers each request
+             (e.g. the script's online model call, or canned fixtures)
+- vertex:    Vertex AI batch prediction (Gemini, GCS input/output)
+- anthropic: Anthropic Message Batches API
+
+The model is always explicit: a batch job runs whatever model it is given,
+which is only the online path's model if the caller passes that one (Vertex
+batch here supports Gemini models only, not OpenAI-compatible MaaS models
+such as DeepSeek-R1).
+
+Request record (one JSON object per line):
+    {"custom_id": "req-000001", "prompt": "...", "max_tokens": 8000, "temperature": 0.1}
+
+Result record (one JSON object per line):
+    {"custom_id": "req-000001", "text": "..."}  or  {"custom_id": "...", "error": "..."}
+"""
+
+import os
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+# Normalized job states returned by every backend's poll()
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+DEFAULT_POLL_INTERVAL = 60  # seconds
+DEFAULT_MAX_TOKENS = 8000
+DEFAULT_TEMPERATURE = 0.1
+
+
+# ============================================================================
+# REQUEST / RESULT FILES
+# ============================================================================
+
+def make_request(custom_id: str, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS,
+                 temperature: float = DEFAULT_TEMPERATURE) -> Dict:
+    """Build a provider-neutral batch request record"""
+    return {
+        "custom_id": custom_id,
+        "prompt": prompt,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+
+
+def write_jsonl(records: List[Dict], path: Path) -> Path:
+    """Write records to a JSONL file (one compact JSON object per line)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return path
+
+
+def read_jsonl(path: Path) -> List[Dict]:
+    """Read a JSONL file, skipping blank lines"""
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class BatchBackend(ABC):
+    """
+    Interface for batch-job providers.
+
+    submit() uploads a request JSONL file and returns a job id, poll() returns
+    one of the normalized JOB_* states, and fetch_results() returns
+    {custom_id: text or None} once the job has succeeded. A backend missing
+    any of them fails when it is created, not partway through a job.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def submit(self, requests_path: Path) -> str:
+        ...
+
+    @abstractmethod
+    def poll(self, job_id: str) -> str:
+        ...
+
+    @abstractmethod
+    def fetch_results(self, job_id: str) -> Dict[str, Optional[str]]:
+        ...
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in backend for offline runs and tests.
+
+    Each job is a directory under root_dir containing requests.jsonl. The job
+    succeeds once results.jsonl exists in that directory. If a responder
+    callable (prompt, max_tokens) -> text is given, submit() produces
+    results.jsonl immediately; otherwise results can be dropped in by hand
+    (e.g. canned fixtures) and the next poll picks them up.
+    """
+
+    name = "local"
+
+    def __init__(self, root_dir: Path, responder: Optional[Callable[[str, int], Optional[str]]] = None):
+        self.root_dir = Path(root_dir)
+        self.responder = responder
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.root_dir / job_id
+
+    def submit(self, requests_path: Path) -> str:
+        job_id = f"local-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        job_dir = self.job_dir(job_id)
+        job_dir.mkdir(parents=True, exist_ok=True)
+
+        batch_requests = read_jsonl(requests_path)
+        write_jsonl(batch_requests, job_dir / "requests.jsonl")
+
+        if self.responder:
+            results = []
+            for request in batch_requests:
+                try:
+                    text = self.responder(request["prompt"], request.get("max_tokens", DEFAULT_MAX_TOKENS))
+                    if text is None:
+                        results.append({"custom_id": request["custom_id"], "error": "no response"})
+                    else:
+                        results.append({"custom_id": request["custom_id"], "text": text})
+                except Exception as e:
+                    results.append({"custom_id": request["custom_id"], "error": str(e)})
+            write_jsonl(results, job_dir / "results.jsonl")
+        else:
+            print(f"  Local job waiting for results at {job_dir / 'results.jsonl'}")
+
+        return job_id
+
+    def poll(self, job_id: str) -> str:
+        job_dir = self.job_dir(job_id)
+        if not job_dir.exists():
+            return JOB_FAILED
+        if (job_dir / "results.jsonl").exists():
+            return JOB_SUCCEEDED
+        return JOB_PENDING
+
+    def fetch_results(self, job_id: str) -> Dict[str, Optional[str]]:
+        results = {}
+        for record in read_jsonl(self.job_dir(job_id) / "results.jsonl"):
+            results[record["custom_id"]] = record.get("text")
+        return results
+
+
+class VertexBatchBackend(BatchBackend):
+    """
+    Vertex AI batch prediction for Gemini models.
+
+    Requests are translated to generateContent instances, uploaded to GCS,
+    and submitted as a batchPredictionJob. Vertex echoes each request in the
+    output, so custom_id travels in the request's labels.
+    """
+
+    name = "vertex"
+
+    STATE_MAP = {
+        "JOB_STATE_QUEUED": JOB_PENDING,
+        "JOB_STATE_PENDING": JOB_PENDING,
+        "JOB_STATE_RUNNING": JOB_RUNNING,
+        "JOB_STATE_UPDATING": JOB_RUNNING,
+        "JOB_STATE_SUCCEEDED": JOB_SUCCEEDED,
+        "JOB_STATE_PARTIALLY_SUCCEEDED": JOB_SUCCEEDED,
+        "JOB_STATE_FAILED": JOB_FAILED,
+        "JOB_STATE_CANCELLING": JOB_FAILED,
+        "JOB_STATE_CANCELLED": JOB_FAILED,
+        "JOB_STATE_EXPIRED": JOB_FAILED,
+    }
+
+    def __init__(self, project_id: str, location: str, gcs_prefix: str, model: str):
+        if not gcs_prefix or not gcs_prefix.startswith("gs://"):
+            raise ValueError("Vertex batch prediction needs a gs:// prefix (set BATCH_GCS_PREFIX)")
+        if "/" not in model:
+            model = f"publishers/google/models/{model}"
+        if not model.startswith("publishers/google/models/gemini"):
+            raise ValueError(f"Vertex batch backend only runs Gemini models (got {model})")
+        self.project_id = project_id
+        self.location = location
+        self.gcs_prefix = gcs_prefix.rstrip("/")
+        self.model = model
+        self.api_base = f"https://{location}-aiplatform.googleapis.com/v1/projects/{project_id}/locations/{location}"
+
+    def _headers(self) -> Dict:
+        from google.auth import default
+        from google.auth.transport.requests import Request
+
+        credentials, _ = default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
+        credentials.refresh(Request())
+        return {
+            "Authorization": f"Bearer {credentials.token}",
+            "Content-Type": "application/json"
+        }
+
+    def _storage_client(self):
+        from google.cloud import storage
+        return storage.Client(project=self.project_id)
+
+    @staticmethod
+    def _split_gcs_uri(uri: str):
+        bucket, _, blob = uri[len("gs://"):].partition("/")
+        return bucket, blob
+
+    def submit(self, requests_path: Path) -> str:
+        job_name = f"fdd-batch-{time.strftime('%Y%m%d-%H%M%S')}"
+        instances = []
+        for request in read_jsonl(requests_path):
+            instances.append({
+                "request": {
+                    "contents": [{"role": "user", "parts": [{"text": request["prompt"]}]}],
+                    "generationConfig": {
+                        "maxOutputTokens": request.get("max_tokens", DEFAULT_MAX_TOKENS),
+                        "temperature": request.get("temperature", DEFAULT_TEMPERATURE),
+                        "topP": 0.8,
+                        "topK": 40
+                    },
+                    "labels": {"custom_id": request["custom_id"]}
+                }
+            })
+
+        input_uri = f"{self.gcs_prefix}/{job_name}/input.jsonl"
+        bucket_name, blob_name = self._split_gcs_uri(input_uri)
+        blob = self._storage_client().bucket(bucket_name).blob(blob_name)
+        blob.upload_from_string(
+            "".join(json.dumps(instance, ensure_ascii=False) + "\n" for instance in instances),
+            content_type="application/jsonl"
+        )
+
+        payload = {
+            "displayName": job_name,
+            "model": self.model,
+            "inputConfig": {"instancesFormat": "jsonl", "gcsSource": {"uris": [input_uri]}},
+            "outputConfig": {
+                "predictionsFormat": "jsonl",
+                "gcsDestination": {"outputUriPrefix": f"{self.gcs_prefix}/{job_name}/output"}
+            }
+        }
+        response = requests.post(f"{self.api_base}/batchPredictionJobs", headers=self._headers(),
+                                 json=payload, timeout=60)
+        response.raise_for_status()
+        return response.json()["name"]
+
+    def _get_job(self, job_id: str) -> Dict:
+        url = f"https://{self.location}-aiplatform.googleapis.com/v1/{job_id}"
+        response = requests.get(url, headers=self._headers(), timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def poll(self, job_id: str) -> str:
+        return self.STATE_MAP.get(self._get_job(job_id).get("state"), JOB_RUNNING)
+
+    def fetch_results(self, job_id: str) -> Dict[str, Optional[str]]:
+        output_dir = self._get_job(job_id)["outputInfo"]["gcsOutputDirectory"]
+        bucket_name, prefix = self._split_gcs_uri(output_dir)
+        client = self._storage_client()
+
+        results = {}
+        for blob in client.list_blobs(bucket_name, prefix=prefix):
+            if not blob.name.endswith(".jsonl"):
+                continue
+            for line in blob.download_as_text().splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                custom_id = record.get("request", {}).get("labels", {}).get("custom_id")
+                if not custom_id:
+                    continue
+                try:
+                    results[custom_id] = record["response"]["candidates"][0]["content"]["parts"][0]["text"]
+                except (KeyError, IndexError, TypeError):
+                    results[custom_id] = None
+        return results
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """Anthropic Message Batches API (50% of online pricing, results within 24h)"""
+
+    name = "anthropic"
+
+    def __init__(self, api_key: str, model: str):
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY not configured")
+        import anthropic
+        self.client = anthropic.Anthropic(api_key=api_key)
+        self.model = model
+
+    def submit(self, requests_path: Path) -> str:
+        batch_requests = []
+        for request in read_jsonl(requests_path):
+            batch_requests.append({
+                "custom_id": request["custom_id"],
+                "params": {
+                    "model": self.model,
+                    "max_tokens": request.get("max_tokens", DEFAULT_MAX_TOKENS),
+                    "temperature": request.get("temperature", DEFAULT_TEMPERATURE),
+                    "messages": [{"role": "user", "content": request["prompt"]}]
+                }
+            })
+        batch = self.client.messages.batches.create(requests=batch_requests)
+        return batch.id
+
+    def poll(self, job_id: str) -> str:
+        batch = self.client.messages.batches.retrieve(job_id)
+        if batch.processing_status == "ended":
+            return JOB_SUCCEEDED
+        if batch.processing_status == "canceling":
+            return JOB_FAILED
+        return JOB_RUNNING
+
+    def fetch_results(self, job_id: str) -> Dict[str, Optional[str]]:
+        results = {}
+        for entry in self.client.messages.batches.results(job_id):
+            if entry.result.type == "succeeded" and entry.result.message.content:
+                results[entry.custom_id] = entry.result.message.content[0].text
+            else:
+                results[entry.custom_id] = None
+        return results
+
+
+def get_batch_backend(name: str, work_dir: Path, model: Optional[str] = None,
+                      responder: Optional[Callable] = None) -> BatchBackend:
+    """
+    Build a backend by name using the usual environment configuration.
+    vertex / anthropic need a model (argument, BATCH_VERTEX_MODEL or
+    BATCH_ANTHROPIC_MODEL); local needs a responder, since nothing else
+    would ever produce its results.
+    """
+    if name == "local":
+        if responder is None:
+            raise ValueError("local batch backend needs a responder (use LocalBatchBackend directly for fixtures)")
+        return LocalBatchBackend(Path(work_dir) / "local_jobs", responder=responder)
+    if name == "vertex":
+        model = model or os.getenv("BATCH_VERTEX_MODEL")
+        if not model:
+            raise ValueError("vertex batch backend needs a model (--batch-model or BATCH_VERTEX_MODEL)")
+        return VertexBatchBackend(
+            project_id=os.getenv("GOOGLE_CLOUD_PROJECT", "fddadvisor-fdd-processing"),
+            location=os.getenv("MODEL_LOCATION", "us-central1"),
+            gcs_prefix=os.getenv("BATCH_GCS_PREFIX", ""),
+            model=model
+        )
+    if name == "anthropic":
+        model = model or os.getenv("BATCH_ANTHROPIC_MODEL")
+        if not model:
+            raise ValueError("anthropic batch backend needs a model (--batch-model or BATCH_ANTHROPIC_MODEL)")
+        return AnthropicBatchBackend(api_key=os.getenv("ANTHROPIC_API_KEY"), model=model)
+    raise ValueError(f"Unknown batch backend: {name}")
+
+
+# ============================================================================
+# RUN A BATCH END TO END
+# ============================================================================
+
+def run_batch_job(backend: BatchBackend, batch_requests: List[Dict], work_dir: Path,
+                  label: str = "batch", poll_interval: int = DEFAULT_POLL_INTERVAL,
+                  timeout: Optional[int] = None) -> Dict[str, Optional[str]]:
+    """
+    Write requests to JSONL, submit them, poll until done and return
+    {custom_id: text or None}. Requests missing from the output map to None.
+
+    The job id is written to <work_dir>/<label>_job.json so an interrupted
+    run can be inspected or resumed with resume_batch_job().
+    """
+    work_dir = Path(work_dir)
+    requests_path = write_jsonl(batch_requests, work_dir / f"{label}_requests.jsonl")
+    print(f"  Wrote {len(batch_requests)} requests to {requests_path}")
+
+    job_id = backend.submit(requests_path)
+    with open(work_dir / f"{label}_job.json", 'w') as f:
+        json.dump({"backend": backend.name, "job_id": job_id, "submitted_at": time.time()}, f, indent=2)
+    print(f"  ✓ Submitted {backend.name} batch job: {job_id}")
+
+    return resume_batch_job(backend, job_id, [r["custom_id"] for r in batch_requests],
+                            poll_interval=poll_interval, timeout=timeout)
+
+
+def resume_batch_job(backend: BatchBackend, job_id: str, custom_ids: List[str],
+                     poll_interval: int = DEFAULT_POLL_INTERVAL,
+                     timeout: Optional[int] = None) -> Dict[str, Optional[str]]:
+    """Poll an already-submitted job until it finishes and collect its results"""
+    started = time.time()
+    while True:
+        state = backend.poll(job_id)
+        if state in TERMINAL_STATES:
+            break
+        if timeout is not None and time.time() - started > timeout:
+            raise TimeoutError(f"Batch job {job_id} still {state} after {timeout}s")
+        print(f"  … job {job_id} is {state}, checking again in {poll_interval}s")
+        time.sleep(poll_interval)
+
+    if state == JOB_FAILED:
+        raise RuntimeError(f"Batch job {job_id} failed")
+
+    fetched = backend.fetch_results(job_id)
+    results = {custom_id: fetched.get(custom_id) for custom_id in custom_ids}
+    succeeded = sum(1 for text in results.values() if text)
+    print(f"  ✓ Batch job finished: {succeeded}/{len(custom_ids)} requests returned text")
+    return results
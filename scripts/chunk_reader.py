@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Keyset-Paginated fdd_chunks Reader
+==================================
+Shared reader for the scripts that walk fdd_chunks over PostgREST
+(sync_all_chunks.py, sync_embeddings_batch.py, sync_missing_embeddings.py).
+
+Pages are ordered by (fdd_id, chunk_index) and each request starts after the
+last key seen instead of at offset=N. Late pages cost the same as early ones
+(an index range scan, not a scan-and-discard), and rows written mid-scan
+cannot shift later pages. (fdd_id, chunk_index) is unique since
+121-fdd-chunks-upsert-key.sql.
+
+Usage:
+    from chunk_reader import iter_fdd_chunk_pages, iter_fdd_chunks
+
+    for page in iter_fdd_chunk_pages(url, key, fdd_id, select='id,embedding', with_embeddings=True):
+        ...
+"""
+
+from typing import Dict, Iterator, List, Optional
+
+from sync_engine import CHUNK_PAGE_SIZE, make_request, rest_path
+
+KEY_COLUMNS = ['fdd_id', 'chunk_index']
+
+
+def iter_fdd_chunk_pages(base_url: str, key: str, fdd_id: Optional[str] = None, select: str = '*',
+                         with_embeddings: bool = False,
+                         page_size: int = CHUNK_PAGE_SIZE) -> Iterator[List[Dict]]:
+    """
+    Yield pages of fdd_chunks rows (one FDD, or all FDDs when fdd_id is None).
+    with_embeddings only returns rows whose embedding is not null. The key
+    columns are always selected so the next page can start after the last row.
+    """
+    columns = select.split(',')
+    if '*' not in columns:
+        columns += [c for c in KEY_COLUMNS if c not in columns]
+
+    cursor: Optional[Dict] = None
+    while True:
+        params = [('select', ','.join(columns)), ('limit', str(page_size))]
+        if fdd_id:
+            params += [('fdd_id', f'eq.{fdd_id}'), ('order', 'chunk_index.asc')]
+            if cursor:
+                params.append(('chunk_index', f"gt.{cursor['chunk_index']}"))
+        else:
+            params.append(('order', 'fdd_id.asc,chunk_index.asc'))
+            if cursor:
+                params.append(('or', f"(fdd_id.gt.{cursor['fdd_id']},"
+                                      f"and(fdd_id.eq.{cursor['fdd_id']},chunk_index.gt.{cursor['chunk_index']}))"))
+        if with_embeddings:
+            params.append(('embedding', 'not.is.null'))
+
+        status, rows = make_request(base_url, key, rest_path('fdd_chunks', params))
+        if status != 200:
+            raise RuntimeError(f"fdd_chunks: read failed ({status}): {str(rows)[:200]}")
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        cursor = rows[-1]
+
+
+def iter_fdd_chunks(base_url: str, key: str, fdd_id: Optional[str] = None, select: str = '*',
+                    with_embeddings: bool = False, page_size: int = CHUNK_PAGE_SIZE) -> Iterator[Dict]:
+    """Yield fdd_chunks rows one at a time (see iter_fdd_chunk_pages)"""
+    for page in iter_fdd_chunk_pages(base_url, key, fdd_id, select, with_embeddings, page_size):
+        yield from page
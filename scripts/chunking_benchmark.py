@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Chunking Parameter Benchmark
+============================
+Re-chunks stored items/ folders under a grid of chunking parameters and
+measures retrieval quality and cost against a labeled question set, using
+the local vector index (no database).
+
+Question set (JSON list):
+    {"question": "...", "fdd": "<pipeline_output folder>", "item": 5, "page": 15}
+"page" is optional. A chunk is relevant when it belongs to the question's
+Item and, if a page is given, its start_page..end_page range contains it
+(page ranges need page_offsets.json, see vertex_item_by_item_pipeline.py).
+
+Embeddings go through the local embedding cache, so each distinct chunk
+text is embedded once across runs and configurations.
+
+Usage:
+    python3 chunking_benchmark.py chunking_benchmark_questions.json \\
+        --target 400 600 800 --overlap 0 75 150 --min 100
+"""
+
+import json
+import time
+import itertools
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from enhanced_chunking_for_semantic_search import (
+    TARGET_CHUNK_SIZE, MIN_CHUNK_SIZE, OVERLAP_SIZE,
+    create_semantic_chunks_from_items, generate_embeddings_batch, get_embedding_cache,
+    load_page_mapping, load_page_offsets,
+)
+from local_vector_search import VectorIndex, embed_query
+
+PIPELINE_OUTPUT_ROOT = Path(__file__).parent / "pipeline_output"
+DEFAULT_K = (1, 3, 5, 10)
+
+
+def is_relevant(chunk: Dict, question: Dict) -> bool:
+    """Chunk answers the question's Item (and page, when labeled)"""
+    if chunk['item_number'] != question['item']:
+        return False
+    page = question.get('page')
+    return page is None or chunk['start_page'] <= page <= chunk['end_page']
+
+
+def chunk_fdd(output_dir: Path, target_size: int, min_size: int, overlap_size: int) -> List[Dict]:
+    """Chunk one pipeline output folder with the given parameters"""
+    page_mapping = load_page_mapping(output_dir / "page_mapping.json")
+    page_offsets = load_page_offsets(output_dir)
+    chunks = create_semantic_chunks_from_items(
+        output_dir / "items", page_mapping, output_dir.name, page_offsets,
+        target_size=target_size, min_size=min_size, overlap_size=overlap_size
+    )
+    for chunk in chunks:
+        chunk['fdd'] = output_dir.name
+    return chunks
+
+
+def evaluate_config(questions: List[Dict], query_vectors: List[List[float]], fdd_dirs: Dict[str, Path],
+                    target_size: int, min_size: int, overlap_size: int, ks: Sequence[int]) -> Dict:
+    """Chunk, embed and index every FDD for one configuration and score the questions"""
+    chunks = []
+    for output_dir in fdd_dirs.values():
+        chunks.extend(chunk_fdd(output_dir, target_size, min_size, overlap_size))
+    chunks = generate_embeddings_batch(chunks)
+    embedded = [c for c in chunks if c['embedding']]
+    index = VectorIndex([c['embedding'] for c in embedded], embedded)
+
+    max_k = max(ks)
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks = []
+    started = time.perf_counter()
+    for question, query_vector in zip(questions, query_vectors):
+        results = index.search(query_vector, max_k, fdds=[question['fdd']])
+        rank: Optional[int] = None
+        for position, (row, _) in enumerate(results, 1):
+            if is_relevant(index.chunks[row], question):
+                rank = position
+                break
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        for k in ks:
+            if rank and rank <= k:
+                hits[k] += 1
+    latency_ms = (time.perf_counter() - started) / len(questions) * 1000
+
+    return {
+        'target_size': target_size,
+        'min_size': min_size,
+        'overlap_size': overlap_size,
+        'chunks': len(chunks),
+        'avg_tokens': sum(c['token_count'] for c in chunks) / max(len(chunks), 1),
+        'index_bytes': index.nbytes,
+        'query_ms': latency_ms,
+        'mrr': sum(reciprocal_ranks) / len(questions),
+        'recall': {k: hits[k] / len(questions) for k in ks},
+    }
+
+
+def print_results(results: List[Dict], ks: Sequence[int]):
+    """Results table, best MRR first"""
+    recall_headers = " ".join(f"{'R@' + str(k):>6}" for k in ks)
+    print(f"\n{'='*70}")
+    print("CHUNKING BENCHMARK")
+    print(f"{'='*70}\n")
+    print(f"  {'target':>6} {'min':>4} {'overlap':>7} {'chunks':>7} {'avg tok':>7} "
+          f"{'index MB':>8} {'ms/q':>6} {'MRR':>6} {recall_headers}")
+    for r in sorted(results, key=lambda r: (-r['mrr'], r['chunks'])):
+        recalls = " ".join(f"{r['recall'][k]:>6.2f}" for k in ks)
+        print(f"  {r['target_size']:>6} {r['min_size']:>4} {r['overlap_size']:>7} {r['chunks']:>7} "
+              f"{r['avg_tokens']:>7.0f} {r['index_bytes'] / 1e6:>8.2f} {r['query_ms']:>6.2f} "
+              f"{r['mrr']:>6.3f} {recalls}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark chunking parameters on a labeled question set")
+    parser.add_argument("questions", help="JSON list of {question, fdd, item, page?}")
+    parser.add_argument("--pipeline-root", default=str(PIPELINE_OUTPUT_ROOT),
+                        help="Folder containing the pipeline output folders named in 'fdd'")
+    parser.add_argument("--target", type=int, nargs="+", default=[TARGET_CHUNK_SIZE], help="Target chunk sizes (tokens)")
+    parser.add_argument("--min", type=int, nargs="+", default=[MIN_CHUNK_SIZE], help="Minimum chunk sizes (tokens)")
+    parser.add_argument("--overlap", type=int, nargs="+", default=[OVERLAP_SIZE], help="Overlap sizes (tokens)")
+    parser.add_argument("--k", type=int, nargs="+", default=list(DEFAULT_K), help="Cutoffs for recall@k")
+    parser.add_argument("--output", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.questions, 'r') as f:
+        questions = json.load(f)
+
+    fdd_dirs = {}
+    for fdd in sorted({q['fdd'] for q in questions}):
+        output_dir = Path(args.pipeline_root) / fdd
+        if not (output_dir / "items").exists():
+            raise FileNotFoundError(f"Items directory not found: {output_dir / 'items'}")
+        fdd_dirs[fdd] = output_dir
+
+    print(f"Embedding {len(questions)} questions...")
+    cache = get_embedding_cache()
+    query_vectors = [embed_query(q['question'], cache) for q in questions]
+
+    results = []
+    for target_size, min_size, overlap_size in itertools.product(args.target, args.min, args.overlap):
+        print(f"\n--- target={target_size} min={min_size} overlap={overlap_size} ---")
+        results.append(evaluate_config(questions, query_vectors, fdd_dirs,
+                                       target_size, min_size, overlap_size, args.k))
+
+    print_results(results, args.k)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Saved results to {args.output}")
@@ -1,7 +1,6 @@
 import os
-import urllib.request
-import urllib.error
-import json
+
+from supabase_rest import get_client
 
 print("=== Environment Variables ===")
 print(f"SUPABASE_URL: {os.environ.get('SUPABASE_URL', 'NOT SET')[:50]}...")
@@ -22,36 +21,24 @@ print(f"Key starts with: {staging_key[:20]}...")
 print(f"Key ends with: ...{staging_key[-10:]}")
 print(f"Key length: {len(staging_key)}")
 
-# Test a simple insert
-test_url = f"{staging_url}/rest/v1/franchises?select=id&limit=1"
-headers = {
-    "apikey": staging_key,
-    "Authorization": f"Bearer {staging_key}",
-    "Content-Type": "application/json"
-}
-
-try:
-    req = urllib.request.Request(test_url, headers=headers)
-    with urllib.request.urlopen(req) as response:
-        data = json.loads(response.read().decode())
-        print(f"\nSELECT test: SUCCESS - Got {len(data)} rows")
-except urllib.error.HTTPError as e:
-    print(f"\nSELECT test: FAILED - {e.code} {e.reason}")
-    print(f"Response: {e.read().decode()}")
+client = get_client(staging_url, staging_key)
+
+# Test a simple select
+status, data = client.request('GET', '/rest/v1/franchises?select=id&limit=1')
+if status == 200:
+    print(f"\nSELECT test: SUCCESS - Got {len(data)} rows")
+else:
+    print(f"\nSELECT test: FAILED - {status}")
+    print(f"Response: {data}")
 
 # Test insert with minimal data
 print("\n=== Testing Insert ===")
-insert_url = f"{staging_url}/rest/v1/franchises"
-test_data = json.dumps({"name": "TEST_DELETE_ME", "slug": "test-delete-me"}).encode()
-headers["Prefer"] = "return=minimal"
-
-try:
-    req = urllib.request.Request(insert_url, data=test_data, headers=headers, method='POST')
-    with urllib.request.urlopen(req) as response:
-        print(f"INSERT test: SUCCESS - Status {response.status}")
-except urllib.error.HTTPError as e:
-    print(f"INSERT test: FAILED - {e.code} {e.reason}")
-    error_body = e.read().decode()
+status, error_body = client.request('POST', '/rest/v1/franchises', {"name": "TEST_DELETE_ME", "slug": "test-delete-me"})
+
+if status in [200, 201]:
+    print(f"INSERT test: SUCCESS - Status {status}")
+else:
+    print(f"INSERT test: FAILED - {status}")
     print(f"Response: {error_body}")
     
     # Check if it's an RLS issue or key issue
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Production ↔ Staging Drift Detector
+===================================
+Finds exactly which rows differ between production and staging without
+reading either table in full (needs 125-drift-hash-functions.sql on both).
+
+Per table, each database hashes its rows into buckets by prefix of a
+partition column (id, or fdd_id for fdd_chunks). Buckets whose hashes match
+are done; buckets that differ are split one character deeper (Merkle-style)
+until they are small enough to compare row hashes, or hold a single
+partition value (one FDD), which is compared by equality on that value.
+The result is the ids that are changed, missing from staging, or only in
+staging, plus the partitions (e.g. FDDs) they belong to.
+
+The root call hashes each table in full on both sides; after that only the
+rows under differing buckets are read (an index range on UUID columns).
+
+Columns that legitimately differ are left out of the hashes: updated_at
+(staging triggers rewrite it on upsert), user UUID columns (remapped by
+email) and generated columns. A row whose only difference is in those
+columns is not reported.
+
+--repair upserts changed and missing rows from production and deletes
+staging-only rows, using sync_engine's readers and writers, parents first.
+
+Usage:
+    python3 drift_detector.py
+    python3 drift_detector.py --tables fdd_chunks fdds
+    python3 drift_detector.py --partition fdd_chunks:fdd_id --output drift.json
+    python3 drift_detector.py --repair
+"""
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from task_dag import TaskGraph
+import sync_engine
+from sync_engine import (ALL_TABLES, SKIP_COLUMNS, UUID_FIELDS, build_uuid_map, delete_rows, fetch_rows_by_id,
+                         prepare_rows, table_parents, upsert_rows)
+from supabase_rest import get_client
+
+ROOT_DEPTH = int(os.getenv("DRIFT_ROOT_DEPTH", "2"))  # 256 buckets at the first level
+LEAF_ROWS = int(os.getenv("DRIFT_LEAF_ROWS", "500"))  # compare row hashes once a bucket is this small
+ROW_HASH_PAGE_SIZE = 1000  # db-max-rows
+DETECT_CONCURRENCY = int(os.getenv("DRIFT_CONCURRENCY", "4"))  # tables compared at once
+
+# Default partition column per table (id otherwise)
+PARTITIONS: Dict[str, str] = {
+    'fdd_chunks': 'fdd_id',
+}
+
+
+class Bucket(NamedTuple):
+    rows: int
+    partitions: int  # distinct partition values in the bucket
+    value: Optional[str]  # the partition value when there is only one
+    hash: Optional[str]
+
+
+EMPTY_BUCKET = Bucket(0, 0, None, None)
+
+
+def excluded_columns(table: str) -> List[str]:
+    """Columns left out of row hashes"""
+    return ['updated_at'] + UUID_FIELDS.get(table, []) + SKIP_COLUMNS.get(table, [])
+
+
+# ============================================================================
+# HASHES
+# ============================================================================
+
+def call_rpc(base_url: str, key: str, name: str, args: Dict) -> List[Dict]:
+    status, body = get_client(base_url, key).request('POST', f"/rest/v1/rpc/{name}", args, idempotent=True)
+    if status != 200:
+        raise RuntimeError(f"{name}({args.get('p_table')}) failed ({status}): {str(body)[:200]}")
+    return body
+
+
+def bucket_hashes(base_url: str, key: str, table: str, partition: str, exclude: List[str], prefix: str,
+                  depth: int) -> Dict[str, Bucket]:
+    """{bucket: Bucket} for the child buckets of prefix"""
+    rows = call_rpc(base_url, key, 'table_bucket_hashes', {
+        'p_table': table, 'p_partition': partition, 'p_prefix': prefix,
+        'p_depth': depth, 'p_exclude': exclude,
+    })
+    return {r['bucket']: Bucket(r['row_count'], r['partition_count'], r['partition_value'], r['bucket_hash'])
+            for r in rows}
+
+
+def row_hashes(base_url: str, key: str, table: str, partition: str, exclude: List[str], prefix: str,
+               value: Optional[str] = None) -> Dict[str, Tuple[str, str]]:
+    """{id: (partition value, hash)} for every row under prefix, or with partition = value (keyset-paged)"""
+    hashes: Dict[str, Tuple[str, str]] = {}
+    after = ''
+    while True:
+        rows = call_rpc(base_url, key, 'table_row_hashes', {
+            'p_table': table, 'p_partition': partition, 'p_prefix': prefix,
+            'p_exclude': exclude, 'p_after': after, 'p_limit': ROW_HASH_PAGE_SIZE,
+            'p_value': value,
+        })
+        hashes.update((r['id'], (r['partition_value'], r['row_hash'])) for r in rows)
+        if len(rows) < ROW_HASH_PAGE_SIZE:
+            return hashes
+        after = rows[-1]['id']
+
+
+def both_sides(executor: ThreadPoolExecutor, func, *args):
+    """Run func against production and staging concurrently"""
+    prod = executor.submit(func, sync_engine.PROD_URL, sync_engine.PROD_KEY, *args)
+    staging = executor.submit(func, sync_engine.STAGING_URL, sync_engine.STAGING_KEY, *args)
+    return prod.result(), staging.result()
+
+
+# ============================================================================
+# DIFF
+# ============================================================================
+
+def diff_table(table: str, partition: Optional[str] = None, ignore: Optional[List[str]] = None) -> Dict:
+    """
+    Row-level drift for one table, descending only into buckets whose hashes
+    differ. Columns in ignore are left out of the hashes as well.
+    """
+    partition = partition or PARTITIONS.get(table, 'id')
+    exclude = excluded_columns(table) + (ignore or [])
+    report = {
+        'table': table, 'partition': partition, 'rows': 0,
+        'changed': [], 'missing': [], 'extra': [], 'partitions': {},
+        'buckets_compared': 0, 'rows_hashed': 0, 'error': None,
+    }
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pending = ['']
+        while pending:
+            prefix = pending.pop()
+            prod, staging = both_sides(executor, bucket_hashes, table, partition, exclude, prefix,
+                                       ROOT_DEPTH if not prefix else 1)
+            if not prefix:
+                report['rows'] = sum(b.rows for b in prod.values())
+            report['buckets_compared'] += len(set(prod) | set(staging))
+
+            for bucket in sorted(set(prod) | set(staging)):
+                prod_bucket = prod.get(bucket, EMPTY_BUCKET)
+                staging_bucket = staging.get(bucket, EMPTY_BUCKET)
+                if prod_bucket.hash == staging_bucket.hash:
+                    continue
+                # One partition value on both sides (e.g. one FDD): compare its rows by equality
+                values = {b.value for b in (prod_bucket, staging_bucket) if b.rows}
+                if len(values) == 1 and prod_bucket.partitions <= 1 and staging_bucket.partitions <= 1:
+                    compare_rows(report, *both_sides(executor, row_hashes, table, partition, exclude, bucket,
+                                                     values.pop()))
+                elif max(prod_bucket.rows, staging_bucket.rows) > LEAF_ROWS and len(bucket) > len(prefix):
+                    pending.append(bucket)
+                else:
+                    compare_rows(report, *both_sides(executor, row_hashes, table, partition, exclude, bucket))
+    return report
+
+
+def compare_rows(report: Dict, prod: Dict[str, Tuple[str, str]], staging: Dict[str, Tuple[str, str]]):
+    """Add ids that differ to the report, counted per partition value"""
+    report['rows_hashed'] += len(prod) + len(staging)
+
+    def record(kind: str, row_id: str, value: str):
+        report[kind].append(row_id)
+        counts = report['partitions'].setdefault(value, {'changed': 0, 'missing': 0, 'extra': 0})
+        counts[kind] += 1
+
+    for row_id, (value, row_hash) in prod.items():
+        if row_id not in staging:
+            record('missing', row_id, value)
+        elif staging[row_id][1] != row_hash:
+            record('changed', row_id, value)
+    for row_id, (value, _) in staging.items():
+        if row_id not in prod:
+            record('extra', row_id, value)
+
+
+def detect_drift(tables: Optional[List[str]] = None, partitions: Optional[Dict[str, str]] = None,
+                 max_workers: int = DETECT_CONCURRENCY) -> Dict[str, Dict]:
+    """{table: report} for the selected tables, several tables at a time"""
+    selected = [t for t in ALL_TABLES if not tables or t in tables]
+    partitions = partitions or {}
+    reports: Dict[str, Dict] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(diff_table, t, partitions.get(t)): t for t in selected}
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                reports[table] = future.result()
+            except Exception as e:
+                reports[table] = {'table': table, 'error': str(e)}
+            print_table_report(reports[table])
+    return {t: reports[t] for t in selected}
+
+
+def drifted_partitions(table: str, partition: Optional[str] = None,
+                       ignore: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+    """{partition value (e.g. fdd_id): {'changed', 'missing', 'extra'} counts} for values with drift"""
+    report = diff_table(table, partition, ignore)
+    return report['partitions']
+
+
+def fdds_with_changed_chunks() -> List[str]:
+    """
+    FDDs with chunks that differ from production only in their embedding,
+    the drift the embedding sync scripts can repair. Chunks that differ in
+    other columns, are missing or exist only in staging are reported, since
+    those need sync_all_chunks.py.
+    """
+    print("Comparing fdd_chunks hashes by FDD...")
+    drifted = drifted_partitions('fdd_chunks', 'fdd_id')
+    if not drifted:
+        print("  0 FDDs with differing embeddings")
+        return []
+    # A second pass without embeddings: rows that still differ changed in other columns
+    content = drifted_partitions('fdd_chunks', 'fdd_id', ignore=['embedding'])
+
+    changed = []
+    for fdd_id, counts in sorted(drifted.items()):
+        other = content.get(fdd_id, {}).get('changed', 0)
+        if counts['changed'] > other:
+            changed.append(fdd_id)
+        if other or counts['missing'] or counts['extra']:
+            print(f"  ⚠ {fdd_id}: {other} chunks changed beyond embeddings, {counts['missing']} missing, "
+                  f"{counts['extra']} only in staging (run sync_all_chunks.py --fdd {fdd_id})")
+    print(f"  {len(changed)} FDDs with differing embeddings")
+    return changed
+
+
+def print_table_report(report: Dict):
+    table = report['table']
+    if report.get('error'):
+        print(f"  ✗ {table}: FAILED: {report['error'][:150]}")
+        return
+    drift = len(report['changed']) + len(report['missing']) + len(report['extra'])
+    cost = f"{report['buckets_compared']} buckets, {report['rows_hashed']} row hashes"
+    if not drift:
+        print(f"  ✓ {table}: in sync ({report['rows']} rows; {cost})")
+    else:
+        where = f" across {len(report['partitions'])} {report['partition']} values" if report['partition'] != 'id' else ""
+        print(f"  ✗ {table}: {len(report['changed'])} changed, {len(report['missing'])} missing, "
+              f"{len(report['extra'])} only in staging{where} ({cost})")
+
+
+# ============================================================================
+# REPAIR
+# ============================================================================
+
+def repair_table(report: Dict, uuid_map: Dict[str, str]) -> Tuple[int, int, Optional[str]]:
+    """Copy changed and missing rows from production, delete staging-only rows"""
+    table = report['table']
+    written = deleted = 0
+    ids = report['changed'] + report['missing']
+    for rows in fetch_rows_by_id(table, ids):
+        count, error = upsert_rows(table, prepare_rows(table, rows, UUID_FIELDS.get(table, []), uuid_map))
+        written += count
+        if error:
+            return written, deleted, error
+    deleted, error = delete_rows(table, report['extra'])
+    return written, deleted, error
+
+
+def repair(reports: Dict[str, Dict]) -> bool:
+    """Repair drifted tables parents-first (same FK order as sync_engine)"""
+    drifted = [t for t, r in reports.items()
+               if not r.get('error') and (r['changed'] or r['missing'] or r['extra'])]
+    if not drifted:
+        return True
+
+    graph = TaskGraph()
+    for table in drifted:
+        graph.add_task(table, lambda: None, inputs=sorted(table_parents(table) & set(drifted)), outputs=[table])
+
+    uuid_map = build_uuid_map()
+    ok = True
+    for table in graph.topological_order():
+        written, deleted, error = repair_table(reports[table], uuid_map)
+        if error:
+            print(f"  ✗ {table}: {written} written, {deleted} deleted - FAILED: {error[:100]}")
+            ok = False
+        else:
+            print(f"  ✓ {table}: {written} written, {deleted} deleted")
+    return ok
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find (and optionally repair) rows that differ between production and staging")
+    parser.add_argument("--tables", nargs="+", help="Only compare these tables")
+    parser.add_argument("--partition", action="append", default=[], metavar="TABLE:COLUMN",
+                        help="Bucket a table by this column instead of the default")
+    parser.add_argument("--repair", action="store_true", help="Copy differing rows from production")
+    parser.add_argument("--output", help="Write the row-level report to this JSON file")
+    args = parser.parse_args()
+
+    if not all([sync_engine.PROD_URL, sync_engine.PROD_KEY, sync_engine.STAGING_URL, sync_engine.STAGING_KEY]):
+        print("ERROR: Missing environment variables")
+        return
+
+    partitions = dict(p.split(':', 1) for p in args.partition)
+    print("=== Production ↔ Staging Drift ===\n")
+    reports = detect_drift(args.tables, partitions)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n✓ Saved report to {args.output}")
+
+    if args.repair:
+        print("\n--- Repairing drifted rows ---")
+        repair(reports)
+
+
+if __name__ == "__main__":
+    main()
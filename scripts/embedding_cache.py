@@ -0,0 +1,172 @@
+"""
+Content-Addressed Embedding Cache
+=================================
+Local cache of embedding vectors keyed by (model, task_type, sha256(text)).
+Re-chunking an unchanged FDD, or embedding boilerplate shared across brands
+(state addenda, Item 23 receipts), is served from disk with no API calls.
+
+Layout of a cache directory:
+    index.json     {"dim": 768, "dtype": "float32", "rows": {key: row, ...}}
+    vectors.bin    raw row-major array (rows x dim), memory-mapped
+
+The vector file grows by doubling its capacity; the index is rewritten on
+flush(). One cache directory holds vectors of a single dimension and dtype.
+
+Several processes may share a cache directory: put_many() only buffers,
+and flush() holds an exclusive lock on cache.lock while it re-reads the
+index, appends rows after everything already there and publishes the new
+index. Readers pick up other processes' rows when index.json changes.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+INDEX_FILE = "index.json"
+VECTORS_FILE = "vectors.bin"
+LOCK_FILE = "cache.lock"
+INITIAL_CAPACITY = 1024  # rows
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+def cache_key(model: str, task_type: str, text: str) -> str:
+    """Cache key for one embedding input"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{task_type}:{digest}"
+
+
+class EmbeddingCache:
+    """Memory-mapped vector store with a JSON key -> row index"""
+
+    def __init__(self, cache_dir: Path, dim: int = 768, dtype: str = "float32"):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype} (use one of {SUPPORTED_DTYPES})")
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / INDEX_FILE
+        self.vectors_path = self.cache_dir / VECTORS_FILE
+        self.lock_path = self.cache_dir / LOCK_FILE
+        self.lock = threading.Lock()
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+
+        self.rows: Dict[str, int] = {}
+        self.pending: Dict[str, np.ndarray] = {}  # put but not yet flushed
+        self.index_mtime: Optional[int] = None
+        with self._file_lock():
+            self._reload_index(force=True)
+            self._open(max(INITIAL_CAPACITY, len(self.rows), self._rows_on_disk()))
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dim * self.dtype.itemsize
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process using this cache directory"""
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _reload_index(self, force: bool = False):
+        """Read index.json if it changed since it was last read (written atomically, so no lock needed)"""
+        try:
+            mtime = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self.index_mtime and not force:
+            return
+        with open(self.index_path, 'r') as f:
+            index = json.load(f)
+        if index["dim"] != self.dim or index["dtype"] != self.dtype.name:
+            raise ValueError(
+                f"Cache at {self.cache_dir} holds {index['dim']}-dim {index['dtype']} vectors, "
+                f"not {self.dim}-dim {self.dtype.name}"
+            )
+        self.rows = index["rows"]
+        self.index_mtime = mtime
+
+    def _rows_on_disk(self) -> int:
+        return self.vectors_path.stat().st_size // self._row_bytes if self.vectors_path.exists() else 0
+
+    def _open(self, capacity: int):
+        """(Re)map the vector file with room for capacity rows"""
+        size = capacity * self._row_bytes
+        with open(self.vectors_path, 'ab') as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self.capacity = capacity
+        self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode='r+', shape=(capacity, self.dim))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    # ------------------------------------------------------------------
+    # Lookup / insert
+    # ------------------------------------------------------------------
+
+    def get_many(self, model: str, task_type: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vector for each text, or None on a miss"""
+        with self.lock:
+            self._reload_index()
+            if len(self.rows) > self.capacity:  # rows are 0..n-1
+                self._open(self._rows_on_disk())  # another process grew the file
+            results: List[Optional[List[float]]] = []
+            for text in texts:
+                key = cache_key(model, task_type, text)
+                if key in self.pending:
+                    results.append(self.pending[key].astype(np.float32).tolist())
+                    continue
+                row = self.rows.get(key)
+                results.append(None if row is None else self.vectors[row].astype(np.float32).tolist())
+            return results
+
+    def put_many(self, model: str, task_type: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Buffer vectors for texts until flush() (existing keys are left as they are)"""
+        with self.lock:
+            for text, vector in zip(texts, vectors):
+                if len(vector) != self.dim:
+                    raise ValueError(f"Expected {self.dim}-dim vector, got {len(vector)}")
+                key = cache_key(model, task_type, text)
+                if key in self.rows or key in self.pending:
+                    continue
+                self.pending[key] = np.asarray(vector, dtype=self.dtype)
+
+    def flush(self):
+        """Append buffered vectors after every row already on disk and publish the index"""
+        with self.lock:
+            if not self.pending:
+                return
+            with self._file_lock():
+                # Rows other processes flushed since this one last read the index
+                self._reload_index(force=True)
+                new = [(key, vector) for key, vector in self.pending.items() if key not in self.rows]
+                needed = len(self.rows) + len(new)
+                capacity = max(self.capacity, self._rows_on_disk())
+                while capacity < needed:
+                    capacity *= 2
+                if capacity != self.capacity:
+                    self.vectors.flush()
+                    self._open(capacity)
+                for key, vector in new:
+                    row = len(self.rows)
+                    self.vectors[row] = vector
+                    self.rows[key] = row
+                self.vectors.flush()
+
+                tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_path, 'w') as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype.name, "rows": self.rows}, f)
+                os.replace(tmp_path, self.index_path)
+                self.index_mtime = self.index_path.stat().st_mtime_ns
+                self.pending.clear()
@@ -15,8 +15,12 @@ import os
 import json
 import time
 import re
+import hashlib
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 from google.auth import default
 from google.auth.transport.requests import Request
@@ -24,6 +28,8 @@ from google.oauth2 import service_account
 import requests
 from supabase import create_client, Client
 import tiktoken
+from embedding_cache import EmbeddingCache
+from vector_format import to_pgvector_text
 
 load_dotenv()
 
@@ -43,8 +49,36 @@ MAX_CHUNK_SIZE = 1000
 MIN_CHUNK_SIZE = 100
 OVERLAP_SIZE = 75  # Larger overlap for better context
 
-# Initialize clients
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Embedding request sizing - text-embedding-004 accepts up to 250 instances and
+# 20,000 tokens per request. Chunk token counts come from tiktoken, so the token
+# budget keeps some headroom for tokenizer differences.
+EMBEDDING_BATCH_SIZE = min(int(os.getenv("EMBEDDING_BATCH_SIZE", "100")), 250)
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "16000"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = 3
+EMBEDDING_TIMEOUT = 60  # seconds per request
+RETRY_QUEUE_FILE = "embedding_retry_queue.json"  # chunks whose embedding failed, for --repair
+EMBEDDING_TASK_TYPE = "RETRIEVAL_DOCUMENT"  # Optimize for retrieval/search
+
+# Local embedding cache keyed by (model, task_type, sha256(text)); set EMBEDDING_CACHE_DIR="" to disable
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", str(Path(__file__).parent / "embedding_cache"))
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")  # or float16 for half the disk
+EMBEDDING_DIMENSIONS = 768
+# --repair filter: NULL, or the zero vectors written by older runs (the quoted literal is compared as a vector)
+MISSING_EMBEDDING_FILTER = f'embedding.is.null,embedding.eq."{to_pgvector_text([0] * EMBEDDING_DIMENSIONS)}"'
+
+# Supabase writes - upserts keyed on (fdd_id, chunk_index), see 121-fdd-chunks-upsert-key.sql
+UPSERT_MAX_BATCH_BYTES = 2_000_000  # JSON payload per request
+UPSERT_MAX_BATCH_ROWS = 200
+UPSERT_CONCURRENCY = 4
+UPSERT_MAX_RETRIES = 3
+
+# Page location - paragraphs are matched back to full_text.txt by their opening characters
+PAGE_PROBE_CHARS = 120
+PAGE_SEARCH_WINDOW = 50000  # chars past the previous match to search for the next paragraph
+
+# Initialize clients (Supabase is optional so chunking can be imported for offline benchmarks)
+supabase: Optional[Client] = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
 encoding = tiktoken.get_encoding("cl100k_base")
 
 
@@ -127,16 +161,88 @@ def load_page_mapping(page_mapping_file: Path) -> Dict[int, int]:
     return page_mapping
 
 
+def load_page_offsets(output_path: Path) -> Optional[Tuple[str, List[int]]]:
+    """Load full_text.txt and the per-page character offsets saved at extraction
+
+    Returns (full_text, page_starts) where page_starts[i] is the offset of
+    page i+1, or None for pipeline output produced before offsets were saved.
+    """
+    offsets_file = output_path / "page_offsets.json"
+    full_text_file = output_path / "full_text.txt"
+    if not offsets_file.exists() or not full_text_file.exists():
+        return None
+    
+    with open(offsets_file, 'r') as f:
+        page_starts = json.load(f).get("page_starts", [])
+    with open(full_text_file, 'r', encoding='utf-8') as f:
+        full_text = f.read()
+    
+    if not page_starts:
+        return None
+    return full_text, page_starts
+
+
+def page_for_offset(page_starts: List[int], offset: int) -> int:
+    """1-indexed page containing a character offset of full_text"""
+    return max(1, bisect_right(page_starts, offset))
+
+
+def chunk_page_range(page_starts: List[int], start: Optional[int], end: Optional[int],
+                     item_page: int) -> Tuple[int, int]:
+    """(start_page, end_page) for a chunk's character span, falling back to the Item page"""
+    if start is None or end is None:
+        return item_page, item_page
+    first = page_for_offset(page_starts, start)
+    return first, max(first, page_for_offset(page_starts, end - 1))
+
+
+def locate_paragraphs(full_text: str, paragraphs: List[str], start: int) -> List[Optional[int]]:
+    """
+    Character offset of each paragraph in full_text (None if not found).
+    
+    Searches forward from start so repeated boilerplate resolves to the
+    occurrence inside this Item. If the Item's first paragraph is not near
+    start (e.g. Items extracted out of order), it is anchored with a search
+    of the whole document.
+    """
+    offsets: List[Optional[int]] = []
+    cursor = start
+    anchored = False
+    
+    for para in paragraphs:
+        probe = para[:PAGE_PROBE_CHARS]
+        pos = full_text.find(probe, cursor, cursor + PAGE_SEARCH_WINDOW + len(probe))
+        if pos == -1 and not anchored:
+            pos = full_text.find(probe)
+        if pos == -1:
+            offsets.append(None)
+            continue
+        offsets.append(pos)
+        cursor = pos + len(para)
+        anchored = True
+    
+    return offsets
+
+
 def create_semantic_chunks_from_items(
     items_dir: Path,
     page_mapping: Dict[int, int],
-    franchise_name: str
+    franchise_name: str,
+    page_offsets: Optional[Tuple[str, List[int]]] = None,
+    target_size: int = TARGET_CHUNK_SIZE,
+    min_size: int = MIN_CHUNK_SIZE,
+    overlap_size: int = OVERLAP_SIZE
 ) -> List[Dict]:
     """
     Create semantic chunks from individual Item files
     Reads from items/item_01.txt, items/item_02.txt, etc.
+    
+    With page_offsets (see load_page_offsets) each chunk gets the pages its
+    text actually spans; otherwise every chunk uses the Item's first page.
+    Sizes default to the module settings (chunking_benchmark.py varies them).
     """
     chunks = []
+    search_from = 0  # Items appear in document order, so search after the previous Item
     
     print(f"\nReading individual Item files from {items_dir}...")
     
@@ -173,48 +279,91 @@ def create_semantic_chunks_from_items(
         # Split item text into paragraphs
         paragraphs = split_into_paragraphs(item_text)
         
-        current_chunk_text = f"ITEM {item_num}: {item_title}\n\n"
-        chunk_start_page = page_num
+        # Locate each paragraph in the full text to find its page
+        if page_offsets:
+            full_text, page_starts = page_offsets
+            para_offsets = locate_paragraphs(full_text, paragraphs, search_from)
+            located = [o for o in para_offsets if o is not None]
+            if located:
+                search_from = located[-1]
+            else:
+                print(f"    ⚠ Could not locate Item {item_num} in full text, using Item page")
+        else:
+            page_starts = []
+            para_offsets = [None] * len(paragraphs)
+        
+        # Token counts are kept incrementally: each paragraph is encoded once
+        # (with its "\n\n" separator) and the chunk's token array is the
+        # concatenation of its pieces. Every piece ends in "\n\n" and the next
+        # one starts with non-whitespace, which is always a pre-token boundary
+        # for cl100k_base, so the running count equals count_tokens() of the
+        # full chunk text and chunks are identical to re-encoding each time.
+        header = f"ITEM {item_num}: {item_title}\n\n"
+        current_chunk_text = header
+        current_tokens = encoding.encode(header)
+        # Character span of the current chunk's text within full_text
+        span_start: Optional[int] = None
+        span_end: Optional[int] = None
         
-        for para in paragraphs:
-            potential_text = current_chunk_text + para + "\n\n"
-            potential_tokens = count_tokens(potential_text)
+        for para, para_offset in zip(paragraphs, para_offsets):
+            para_text = para + "\n\n"
+            para_tokens = encoding.encode(para_text)
+            potential_tokens = len(current_tokens) + len(para_tokens)
             
-            if potential_tokens > TARGET_CHUNK_SIZE and count_tokens(current_chunk_text) >= MIN_CHUNK_SIZE:
+            if potential_tokens > target_size and len(current_tokens) >= min_size:
                 # Save current chunk
+                start_page, end_page = chunk_page_range(page_starts, span_start, span_end, page_num)
                 chunks.append({
                     'franchise_name': franchise_name,
                     'item_number': item_num,
                     'item_title': item_title[:100],  # Truncate if too long
-                    'page_number': chunk_start_page,
-                    'start_page': chunk_start_page,
-                    'end_page': page_num,
+                    'page_number': start_page,
+                    'start_page': start_page,
+                    'end_page': end_page,
                     'chunk_text': current_chunk_text.strip(),
-                    'token_count': count_tokens(current_chunk_text),
+                    'token_count': len(current_tokens),
                     'metadata': {
                         'chunk_type': 'item_section',
                         'has_table': 'table' in para.lower() or '|' in para
                     }
                 })
                 
-                # Start new chunk with overlap
-                overlap = get_last_n_tokens(current_chunk_text, OVERLAP_SIZE)
-                current_chunk_text = f"ITEM {item_num}: {item_title}\n\n{overlap}\n\n{para}\n\n"
+                # Start new chunk with overlap taken from the cached token array
+                if len(current_tokens) <= overlap_size:
+                    overlap = current_chunk_text
+                else:
+                    overlap = encoding.decode(current_tokens[-overlap_size:]) if overlap_size else ""
+                # The overlap can start mid-word, so re-encode this short prefix as a whole
+                prefix = f"{header}{overlap}\n\n" if overlap else header
+                current_chunk_text = prefix + para_text
+                current_tokens = encoding.encode(prefix) + para_tokens
+                # The new chunk starts with the tail of the previous one
+                if not overlap:
+                    span_start = span_end = None
+                elif span_end is not None:
+                    span_start = max(0, span_end - len(overlap))
             else:
                 # Add paragraph to current chunk
-                current_chunk_text = potential_text
+                current_chunk_text += para_text
+                current_tokens.extend(para_tokens)
+            
+            if para_offset is not None:
+                if span_start is None:
+                    span_start = para_offset
+                span_end = para_offset + len(para)
         
         # Save final chunk for this Item
-        if count_tokens(current_chunk_text) >= MIN_CHUNK_SIZE:
+        if len(current_tokens) >= min_size:
+            start_page, end_page = chunk_page_range(page_starts, span_start, span_end, page_num)
             chunks.append({
                 'franchise_name': franchise_name,
                 'item_number': item_num,
                 'item_title': item_title[:100],
-                'page_number': chunk_start_page,
-                'start_page': chunk_start_page,
-                'end_page': page_num,
+                'page_number': start_page,
+                'start_page': start_page,
+                'end_page': end_page,
                 'chunk_text': current_chunk_text.strip(),
-                'token_count': count_tokens(current_chunk_text),
+                'token_count': len(current_tokens),
                 'metadata': {
                     'chunk_type': 'item_section',
                     'has_table': False
@@ -224,74 +373,333 @@ def create_semantic_chunks_from_items(
     return chunks
 
 
+def plan_embedding_batches(chunks: List[Dict], batch_size: int = EMBEDDING_BATCH_SIZE,
+                           max_tokens: int = EMBEDDING_MAX_BATCH_TOKENS) -> List[List[int]]:
+    """Group chunk indexes into requests bounded by instance count and total tokens"""
+    batches = []
+    current: List[int] = []
+    current_tokens = 0
+    for idx, chunk in enumerate(chunks):
+        tokens = chunk.get('token_count') or count_tokens(chunk['chunk_text'])
+        if current and (len(current) >= batch_size or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def embed_texts(texts: List[str], headers: Dict[str, str],
+                task_type: str = EMBEDDING_TASK_TYPE) -> List[List[float]]:
+    """Embed one request's worth of texts, retrying transient failures with backoff"""
+    payload = {
+        "instances": [
+            {"content": text, "task_type": task_type}
+            for text in texts
+        ]
+    }
+    
+    for attempt in range(EMBEDDING_MAX_RETRIES):
+        try:
+            response = requests.post(
+                EMBEDDING_ENDPOINT,
+                headers=headers,
+                json=payload,
+                timeout=EMBEDDING_TIMEOUT
+            )
+            response.raise_for_status()
+            predictions = response.json().get("predictions", [])
+            if len(predictions) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(predictions)}")
+            # Gemini returns embeddings in 'embeddings' field
+            return [p.get("embeddings", {}).get("values", []) for p in predictions]
+        except Exception as e:
+            if attempt == EMBEDDING_MAX_RETRIES - 1:
+                raise
+            delay = 2 ** attempt
+            print(f"    ⚠ Embedding request failed (attempt {attempt + 1}/{EMBEDDING_MAX_RETRIES}): {e}, retrying in {delay}s")
+            time.sleep(delay)
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Shared embedding cache, or None when disabled or unavailable"""
+    global _embedding_cache
+    if _embedding_cache is None and EMBEDDING_CACHE_DIR:
+        try:
+            _embedding_cache = EmbeddingCache(Path(EMBEDDING_CACHE_DIR), EMBEDDING_DIMENSIONS, EMBEDDING_CACHE_DTYPE)
+        except Exception as e:
+            print(f"  ⚠ Embedding cache unavailable ({e}), embedding without it")
+    return _embedding_cache
+
+
+def embed_batches(chunks: List[Dict], batches: List[List[int]], headers: Dict[str, str]) -> List[int]:
+    """Embed the given batches concurrently, returning the chunk indexes that failed"""
+    failed = []
+    with ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY) as pool:
+        futures = {
+            pool.submit(embed_texts, [chunks[idx]['chunk_text'] for idx in batch], headers): batch
+            for batch in batches
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            batch = futures[future]
+            try:
+                for idx, embedding in zip(batch, future.result()):
+                    chunks[idx]['embedding'] = embedding
+                print(f"  ✓ Request {done}/{len(batches)}: {len(batch)} chunks")
+            except Exception as e:
+                print(f"    ⚠ Error generating embeddings for batch: {e}")
+                failed.extend(batch)
+    return failed
+
+
 def generate_embeddings_batch(chunks: List[Dict]) -> List[Dict]:
     """
     Generate embeddings for chunks using Google Gemini text-embedding-004
     768-dimensional embeddings
-    Processes in batches to avoid rate limits
-    """
-    BATCH_SIZE = 5  # Gemini handles smaller batches better
+    Chunks already in the local embedding cache cost no API call; the rest
+    are sent in requests sized by instance count and tokens, concurrently.
     
+    Chunks from a failed request are retried one per request so a single bad
+    chunk cannot sink its whole batch. Chunks that still fail keep
+    embedding=None (stored as NULL) - never a zero vector, which would match
+    every query in cosine search.
+    """
     print(f"\nGenerating embeddings for {len(chunks)} chunks...")
+    started = time.monotonic()
     
-    access_token = get_access_token()
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+    # Serve unchanged chunks and shared boilerplate from the local cache
+    cache = get_embedding_cache()
+    texts = [chunk['chunk_text'] for chunk in chunks]
+    cached = cache.get_many(EMBEDDING_MODEL, EMBEDDING_TASK_TYPE, texts) if cache is not None else [None] * len(chunks)
+    for chunk, embedding in zip(chunks, cached):
+        chunk['embedding'] = embedding
+    to_embed = [idx for idx, embedding in enumerate(cached) if embedding is None]
+    if cache is not None:
+        print(f"  ✓ Cache: {len(chunks) - len(to_embed)} hits, {len(to_embed)} misses")
     
-    for i in range(0, len(chunks), BATCH_SIZE):
-        batch = chunks[i:i + BATCH_SIZE]
+    failed: List[int] = []
+    if to_embed:
+        pending = [chunks[idx] for idx in to_embed]
+        batches = [[to_embed[i] for i in batch] for batch in plan_embedding_batches(pending)]
+        print(f"  Sending {len(batches)} requests ({EMBEDDING_CONCURRENCY} concurrent)...")
         
-        print(f"  Processing batch {i//BATCH_SIZE + 1}/{(len(chunks)-1)//BATCH_SIZE + 1}...")
+        access_token = get_access_token()
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
         
-        # Prepare batch request for Gemini
-        instances = []
-        for chunk in batch:
-            instances.append({
-                "content": chunk['chunk_text'],
-                "task_type": "RETRIEVAL_DOCUMENT"  # Optimize for retrieval/search
-            })
+        failed = embed_batches(chunks, batches, headers)
+        if failed:
+            print(f"  Retrying {len(failed)} chunks individually...")
+            failed = embed_batches(chunks, [[idx] for idx in failed], headers)
         
-        payload = {"instances": instances}
-        
-        try:
-            response = requests.post(
-                EMBEDDING_ENDPOINT,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            # Extract embeddings from response
-            predictions = result.get("predictions", [])
-            
-            for chunk, prediction in zip(batch, predictions):
-                # Gemini returns embeddings in 'embeddings' field
-                embedding = prediction.get("embeddings", {}).get("values", [])
-                chunk['embedding'] = embedding
-                
-        except Exception as e:
-            print(f"    ⚠ Error generating embeddings for batch: {e}")
-            # Add empty embeddings as fallback
-            for chunk in batch:
-                chunk['embedding'] = [0.0] * 768  # 768-dimensional zero vector
+        if cache is not None:
+            new_idxs = [idx for idx in to_embed if len(chunks[idx]['embedding'] or []) == EMBEDDING_DIMENSIONS]
+            cache.put_many(EMBEDDING_MODEL, EMBEDDING_TASK_TYPE,
+                           [texts[idx] for idx in new_idxs], [chunks[idx]['embedding'] for idx in new_idxs])
+            cache.flush()
     
-    print("  ✓ All embeddings generated")
+    elapsed = time.monotonic() - started
+    embedded = len(chunks) - len(failed)
+    rate = embedded / elapsed if elapsed > 0 else 0.0
+    print(f"  ✓ Embedded {embedded}/{len(chunks)} chunks in {elapsed:.1f}s ({rate:.1f} embeddings/s)")
+    if failed:
+        print(f"  ⚠ {len(failed)} chunks have no embedding (stored as NULL)")
     return chunks
 
 
+def save_retry_queue(output_path: Path, fdd_id: str, chunk_indexes: List[int]):
+    """Persist the chunk indexes still missing embeddings (removes the file when none are left)"""
+    queue_file = output_path / RETRY_QUEUE_FILE
+    if not chunk_indexes:
+        if queue_file.exists():
+            queue_file.unlink()
+        return
+    with open(queue_file, 'w') as f:
+        json.dump({
+            'fdd_id': fdd_id,
+            'model': EMBEDDING_MODEL,
+            'chunk_indexes': sorted(chunk_indexes),
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }, f, indent=2)
+    print(f"  ⚠ {len(chunk_indexes)} chunks queued for repair: {queue_file}")
+    print(f"    Re-run with --repair to embed only those chunks")
+
+
+def load_retry_queue(output_path: Path, fdd_id: str) -> Optional[List[int]]:
+    """Chunk indexes queued by a previous run of this FDD, or None if there is no queue"""
+    queue_file = output_path / RETRY_QUEUE_FILE
+    if not queue_file.exists():
+        return None
+    with open(queue_file) as f:
+        queue = json.load(f)
+    if queue.get('fdd_id') != fdd_id or queue.get('model') != EMBEDDING_MODEL:
+        print(f"  ⚠ Ignoring {queue_file} (queued for {queue.get('fdd_id')} / {queue.get('model')})")
+        return None
+    return queue.get('chunk_indexes', [])
+
+
+def fetch_chunks_missing_embeddings(fdd_id: str, chunk_indexes: Optional[List[int]] = None,
+                                    page_size: int = 500) -> List[Dict]:
+    """
+    Rows of an FDD whose embedding is NULL or a zero vector, filtered server-side
+    and keyset-paged by chunk_index. With chunk_indexes, only those chunks are read.
+    """
+    missing = []
+    if chunk_indexes is not None:
+        indexes = sorted(set(chunk_indexes))
+        for i in range(0, len(indexes), page_size):
+            response = supabase.table('fdd_chunks') \
+                .select('id,chunk_index,chunk_text') \
+                .eq('fdd_id', fdd_id) \
+                .in_('chunk_index', indexes[i:i + page_size]) \
+                .or_(MISSING_EMBEDDING_FILTER) \
+                .order('chunk_index') \
+                .execute()
+            missing.extend(response.data or [])
+        return missing
+
+    last_index = -1
+    while True:
+        response = supabase.table('fdd_chunks') \
+            .select('id,chunk_index,chunk_text') \
+            .eq('fdd_id', fdd_id) \
+            .or_(MISSING_EMBEDDING_FILTER) \
+            .gt('chunk_index', last_index) \
+            .order('chunk_index') \
+            .limit(page_size) \
+            .execute()
+        rows = response.data or []
+        missing.extend(rows)
+        if len(rows) < page_size:
+            break
+        last_index = rows[-1]['chunk_index']
+    return missing
+
+
+def repair_missing_embeddings(pipeline_output_dir: str, fdd_id: str):
+    """
+    Re-embed only the chunks of an FDD that have no embedding in Supabase
+    (failed or zero-vector rows) and update those rows in place. When the
+    previous run left a retry queue, only the queued chunks are checked and
+    the queue is rewritten with those that still failed.
+    """
+    if supabase is None:
+        raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
+    output_path = Path(pipeline_output_dir)
+    
+    print(f"\n{'='*70}")
+    print(f"EMBEDDING REPAIR: {fdd_id}")
+    print(f"{'='*70}\n")
+    
+    queued = load_retry_queue(output_path, fdd_id)
+    if queued is not None:
+        print(f"  Retry queue: {len(queued)} chunks")
+    rows = fetch_chunks_missing_embeddings(fdd_id, queued)
+    if not rows:
+        print("  ✓ Every chunk already has an embedding")
+        save_retry_queue(output_path, fdd_id, [])
+        return
+    
+    print(f"  Found {len(rows)} chunks missing embeddings")
+    chunks = [{'chunk_text': row['chunk_text']} for row in rows]
+    chunks = generate_embeddings_batch(chunks)
+    
+    repaired = 0
+    still_missing = []
+    for row, chunk in zip(rows, chunks):
+        if chunk['embedding'] is None:
+            still_missing.append(row['chunk_index'])
+            continue
+        supabase.table('fdd_chunks').update({'embedding': to_pgvector_text(chunk['embedding'])}).eq('id', row['id']).execute()
+        repaired += 1
+    
+    print(f"\n  ✓ Repaired {repaired}/{len(rows)} embeddings")
+    save_retry_queue(output_path, fdd_id, still_missing)
+
+
+def chunk_content_hash(record: Dict) -> str:
+    """sha256 of a chunk record's content fields (everything except the embedding) and the model"""
+    content = {k: v for k, v in record.items() if k not in ('embedding', 'content_hash', 'updated_at')}
+    content['embedding_model'] = EMBEDDING_MODEL
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def fetch_existing_chunk_hashes(fdd_id: str, page_size: int = 1000) -> Dict[int, str]:
+    """chunk_index -> content_hash for an FDD's stored chunks that already have an embedding"""
+    existing = {}
+    last_index = -1
+    while True:
+        response = supabase.table('fdd_chunks') \
+            .select('chunk_index,content_hash') \
+            .eq('fdd_id', fdd_id) \
+            .not_.is_('embedding', 'null') \
+            .gt('chunk_index', last_index) \
+            .order('chunk_index') \
+            .limit(page_size) \
+            .execute()
+        rows = response.data or []
+        for row in rows:
+            existing[row['chunk_index']] = row.get('content_hash')
+        if len(rows) < page_size:
+            break
+        last_index = rows[-1]['chunk_index']
+    return existing
+
+
+def plan_upsert_batches(records: List[Dict], max_bytes: int = UPSERT_MAX_BATCH_BYTES,
+                        max_rows: int = UPSERT_MAX_BATCH_ROWS) -> List[List[Dict]]:
+    """Split records into request payloads bounded by serialized size and row count"""
+    batches = []
+    current: List[Dict] = []
+    current_bytes = 0
+    for record in records:
+        size = len(json.dumps(record))
+        if current and (len(current) >= max_rows or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(record)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def upsert_batch(records: List[Dict]) -> int:
+    """Upsert one batch of chunk records, retrying transient failures with backoff"""
+    for attempt in range(UPSERT_MAX_RETRIES):
+        try:
+            supabase.table('fdd_chunks').upsert(records, on_conflict='fdd_id,chunk_index').execute()
+            return len(records)
+        except Exception as e:
+            if attempt == UPSERT_MAX_RETRIES - 1:
+                raise
+            delay = 2 ** attempt
+            print(f"    ⚠ Upsert failed (attempt {attempt + 1}/{UPSERT_MAX_RETRIES}): {e}, retrying in {delay}s")
+            time.sleep(delay)
+
+
 def store_chunks_in_supabase(chunks: List[Dict], fdd_id: str):
     """
     Store chunks in your Supabase fdd_chunks table
+    
+    Upserts on (fdd_id, chunk_index), so re-running for the same FDD never
+    duplicates rows. Chunks whose content hash matches the stored row (and
+    which already have an embedding) are skipped, and rows past the new
+    chunk count are deleted.
     """
     print(f"\nStoring {len(chunks)} chunks in Supabase...")
     
+    now = datetime.now(timezone.utc).isoformat()
     chunk_records = []
     for idx, chunk in enumerate(chunks):
-        chunk_records.append({
+        record = {
             'fdd_id': fdd_id,
             'chunk_text': chunk['chunk_text'],
             'chunk_index': idx,
@@ -300,14 +708,38 @@ def store_chunks_in_supabase(chunks: List[Dict], fdd_id: str):
             'start_page': chunk['start_page'],
             'end_page': chunk['end_page'],
             'token_count': chunk['token_count'],
-            'embedding': chunk['embedding'],
+            # pgvector text with bounded precision (about half the size of a JSON float array); None is stored as NULL
+            'embedding': to_pgvector_text(chunk['embedding']) if chunk['embedding'] else None,
             'metadata': chunk['metadata']
-        })
+        }
+        record['content_hash'] = chunk_content_hash(record)
+        record['updated_at'] = now
+        chunk_records.append(record)
     
-    # Bulk insert
-    response = supabase.table('fdd_chunks').insert(chunk_records).execute()
+    existing = fetch_existing_chunk_hashes(fdd_id)
+    changed = [r for r in chunk_records if existing.get(r['chunk_index']) != r['content_hash']]
+    print(f"  {len(chunk_records) - len(changed)} unchanged, {len(changed)} new or changed")
     
-    print(f"  ✓ Stored {len(response.data)} chunks successfully")
+    stored = 0
+    failed = 0
+    batches = plan_upsert_batches(changed)
+    with ThreadPoolExecutor(max_workers=UPSERT_CONCURRENCY) as pool:
+        futures = {pool.submit(upsert_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                stored += future.result()
+            except Exception as e:
+                failed += len(futures[future])
+                print(f"    ✗ Error storing batch of {len(futures[future])} chunks: {e}")
+    
+    # Drop rows left over from a previous run that produced more chunks
+    stale = supabase.table('fdd_chunks').delete().eq('fdd_id', fdd_id).gte('chunk_index', len(chunk_records)).execute()
+    if stale.data:
+        print(f"  ✓ Removed {len(stale.data)} stale chunks")
+    
+    print(f"  ✓ Stored {stored} chunks successfully ({len(batches)} requests)")
+    if failed:
+        print(f"  ⚠ {failed} chunks failed to store - re-run to retry")
 
 
 def process_pipeline_output(
@@ -324,6 +756,9 @@ def process_pipeline_output(
         franchise_name: Override franchise name (optional)
     """
     
+    if supabase is None:
+        raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
+    
     output_path = Path(pipeline_output_dir)
     
     # Load your existing outputs
@@ -347,10 +782,15 @@ def process_pipeline_output(
     print("Loading page mappings...")
     page_mapping = load_page_mapping(page_mapping_file)
     print(f"  ✓ Found mappings for {len(page_mapping)} Items")
+    page_offsets = load_page_offsets(output_path)
+    if page_offsets:
+        print(f"  ✓ Found character offsets for {len(page_offsets[1])} pages")
+    else:
+        print("  ⚠ No page_offsets.json - chunks will use each Item's first page")
     
     # Create semantic chunks from individual Item files
     print("\nCreating semantic search chunks...")
-    chunks = create_semantic_chunks_from_items(items_dir, page_mapping, franchise_name)
+    chunks = create_semantic_chunks_from_items(items_dir, page_mapping, franchise_name, page_offsets)
     print(f"  ✓ Created {len(chunks)} chunks")
     print(f"  ✓ Avg tokens per chunk: {sum(c['token_count'] for c in chunks) / len(chunks):.0f}")
     
@@ -359,6 +799,7 @@ def process_pipeline_output(
     
     # Store in database
     store_chunks_in_supabase(chunks, fdd_id)
+    save_retry_queue(output_path, fdd_id, [idx for idx, c in enumerate(chunks) if c['embedding'] is None])
     
     # Save chunks locally for reference
     chunks_output = output_path / "semantic_search_chunks.json"
@@ -380,13 +821,17 @@ def process_pipeline_output(
 
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) < 3:
-        print("Usage: python enhanced_chunking_for_semantic_search.py <pipeline_output_dir> <fdd_id>")
-        sys.exit(1)
+    import argparse
     
-    pipeline_dir = sys.argv[1]
-    fdd_id = sys.argv[2]
+    parser = argparse.ArgumentParser(description="Chunk and embed pipeline output for semantic search")
+    parser.add_argument("pipeline_output_dir", help="pipeline_output/{franchise_name}/ directory")
+    parser.add_argument("fdd_id", help="UUID of the FDD in the database")
+    parser.add_argument("--repair", action="store_true",
+                        help="Only re-embed this FDD's chunks that have no embedding (NULL or zero vector); "
+                             "uses the retry queue from the previous run when there is one")
+    args = parser.parse_args()
     
-    process_pipeline_output(pipeline_dir, fdd_id)
+    if args.repair:
+        repair_missing_embeddings(args.pipeline_output_dir, args.fdd_id)
+    else:
+        process_pipeline_output(args.pipeline_output_dir, args.fdd_id)
@@ -0,0 +1,898 @@
+#!/usr/bin/env python3
+"""
+Fake Supabase (PostgREST + Auth admin + Storage) for Local Testing
+==================================================================
+In-process HTTP server backed by SQLite, so the sync and upload scripts can
+be exercised, benchmarked and regression-tested without a live project.
+Point SUPABASE_URL (or SUPABASE_URL_STAGING) at server.url.
+
+Implemented (what the scripts in this folder use):
+- /rest/v1/<table>  GET / POST / PATCH / DELETE
+    filters: eq neq gt gte lt lte like ilike is in, not.<op>, or=(...) / and=(...)
+    select=<columns>, order=<col>.asc|desc[.nullsfirst|.nullslast],
+    limit / offset / Range header, on_conflict=<cols>
+    Prefer: return=minimal|representation, resolution=merge-duplicates|ignore-duplicates, count=exact
+- gzip request bodies (Content-Encoding) and responses over 1 KB (Accept-Encoding)
+- /rest/v1/rpc/<name>  registered Python handlers (update_fdd_chunk_embeddings,
+    table_bucket_hashes and table_row_hashes built in)
+- /auth/v1/admin/users  list (page / per_page), create (with id), get, update (PUT), delete
+- /storage/v1/object/...  upload (raw or multipart, x-upsert), download, list, delete; /storage/v1/bucket
+
+Tables are schemaless: each row is a JSON document keyed by "id" (generated
+when missing). Like Supabase, a read without a limit returns at most
+max_rows rows (db-max-rows = 1000), bulk inserts must use the same keys
+in every object, and a duplicate id or unique key is a 409. Generated
+columns (chunk_tsv) are computed on every write, and a write that sets one
+is rejected like Postgres does (428C9).
+
+Comparisons follow the stored JSON type (numbers numerically, strings
+lexically), so timestamps compare correctly when written in one ISO format.
+
+Usage:
+    from fake_supabase import FakeSupabase
+
+    with FakeSupabase() as prod:
+        prod.insert('fdds', [{'id': '...', 'updated_at': '...'}])
+        os.environ['SUPABASE_URL'] = prod.url
+        ...
+        print(prod.stats)
+
+    python3 fake_supabase.py --port 54321 --db fake.sqlite   # standalone
+"""
+
+import re
+import gzip
+import json
+import hashlib
+import time
+import uuid
+import sqlite3
+import threading
+import urllib.parse
+from collections import Counter
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_MAX_ROWS = 1000  # Supabase db-max-rows
+DEFAULT_AUTH_PAGE_SIZE = 50  # GoTrue per_page default
+FAKE_KEY = "fake.service.role"  # JWT-shaped so supabase-py accepts it
+
+# Unique keys besides "id" (121-fdd-chunks-upsert-key.sql)
+DEFAULT_UNIQUE_KEYS: Dict[str, List[Tuple[str, ...]]] = {
+    'fdd_chunks': [('fdd_id', 'chunk_index')],
+}
+
+
+def tsvector_text(text: Optional[str]) -> str:
+    """Rough stand-in for to_tsvector('english', text)"""
+    return ' '.join(f"'{word}'" for word in sorted(set(re.findall(r'[a-z0-9]+', (text or '').lower()))))
+
+
+# GENERATED ALWAYS columns (122-hybrid-chunk-search.sql): column → value from the row
+GENERATED_COLUMNS: Dict[str, Dict[str, Callable[[Dict], Any]]] = {
+    'fdd_chunks': {'chunk_tsv': lambda row: tsvector_text(row.get('chunk_text'))},
+}
+
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+COLUMN_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+OPERATORS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+class RestError(Exception):
+    """Error returned to the client as a PostgREST-style JSON body"""
+
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ============================================================================
+# FILTER PARSING (PostgREST query syntax → SQLite over JSON documents)
+# ============================================================================
+
+def split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append(''.join(current))
+    return parts
+
+
+def unquote_value(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def column_sql(column: str) -> Tuple[str, str]:
+    """JSON path for a column (validated so it can be embedded safely)"""
+    if not COLUMN_PATTERN.match(column):
+        raise RestError(400, 'PGRST100', f'Invalid column name: {column}')
+    return f'$."{column}"', column
+
+
+def comparison_sql(column: str, op: str, raw: str) -> Tuple[str, List[Any]]:
+    """
+    column <op> value, comparing numbers numerically and booleans as 0/1
+    when the stored JSON value has that type, and as text otherwise.
+    """
+    path, _ = column_sql(column)
+    quoted = raw.startswith('"')
+    raw = unquote_value(raw)
+    number: Any = raw
+    if not quoted:
+        try:
+            number = int(raw)
+        except ValueError:
+            try:
+                number = float(raw)
+            except ValueError:
+                pass
+    boolean: Any = {'true': 1, 'false': 0}.get(raw, raw) if not quoted else raw
+    sql_op = OPERATORS[op]
+    sql = (f"(CASE WHEN json_type(data, ?) IN ('integer', 'real') THEN json_extract(data, ?) {sql_op} ? "
+           f"WHEN json_type(data, ?) IN ('true', 'false') THEN json_extract(data, ?) {sql_op} ? "
+           f"ELSE json_extract(data, ?) {sql_op} ? END)")
+    return sql, [path, path, number, path, path, boolean, path, raw]
+
+
+def filter_sql(column: str, expression: str) -> Tuple[str, List[Any]]:
+    """One column filter such as 'gte.5', 'in.(a,b)', 'not.is.null'"""
+    negate = False
+    if expression.startswith('not.'):
+        negate, expression = True, expression[4:]
+    op, _, value = expression.partition('.')
+    path, _ = column_sql(column)
+
+    if op in OPERATORS:
+        sql, params = comparison_sql(column, op, value)
+    elif op == 'in':
+        if not (value.startswith('(') and value.endswith(')')):
+            raise RestError(400, 'PGRST100', f'Invalid in filter: {expression}')
+        items = split_top_level(value[1:-1])
+        if not items:
+            sql, params = '0', []
+        else:
+            parts = [comparison_sql(column, 'eq', item) for item in items]
+            sql = '(' + ' OR '.join(p[0] for p in parts) + ')'
+            params = [v for p in parts for v in p[1]]
+    elif op == 'is':
+        if value == 'null':
+            sql, params = 'json_extract(data, ?) IS NULL', [path]
+        elif value in ('true', 'false'):
+            sql, params = 'json_type(data, ?) = ?', [path, value]
+        else:
+            raise RestError(400, 'PGRST100', f'Invalid is filter: {expression}')
+    elif op in ('like', 'ilike'):
+        pattern = unquote_value(value)
+        if op == 'like':
+            sql, params = 'json_extract(data, ?) GLOB ?', [path, pattern.replace('%', '*')]
+        else:
+            sql, params = 'json_extract(data, ?) LIKE ?', [path, pattern.replace('*', '%')]
+    else:
+        raise RestError(400, 'PGRST100', f'Unsupported operator: {op}')
+
+    if negate:
+        sql = f'NOT COALESCE({sql}, 0)'
+    return sql, params
+
+
+def logic_sql(operator: str, body: str) -> Tuple[str, List[Any]]:
+    """or=(...) / and=(...) with nested and(...) / or(...) / not.and(...) groups"""
+    if not (body.startswith('(') and body.endswith(')')):
+        raise RestError(400, 'PGRST100', f'Invalid logic tree: {body}')
+    clauses, params = [], []
+    for item in split_top_level(body[1:-1]):
+        negate = item.startswith('not.')
+        if negate:
+            item = item[4:]
+        match = re.match(r'^(and|or)(\(.*\))$', item)
+        if match:
+            sql, item_params = logic_sql(match.group(1), match.group(2))
+        else:
+            column, _, expression = item.partition('.')
+            sql, item_params = filter_sql(column, expression)
+        clauses.append(f'NOT COALESCE({sql}, 0)' if negate else sql)
+        params.extend(item_params)
+    joiner = ' OR ' if operator == 'or' else ' AND '
+    return '(' + joiner.join(clauses or ['1']) + ')', params
+
+
+def where_sql(query: List[Tuple[str, str]]) -> Tuple[str, List[Any]]:
+    """WHERE clause for every filter parameter in the query string"""
+    clauses, params = [], []
+    for key, value in query:
+        if key in RESERVED_PARAMS:
+            continue
+        if key in ('or', 'and'):
+            sql, item_params = logic_sql(key, value)
+        elif key in ('not.or', 'not.and'):
+            sql, item_params = logic_sql(key[4:], value)
+            sql = f'NOT COALESCE({sql}, 0)'
+        else:
+            sql, item_params = filter_sql(key, value)
+        clauses.append(sql)
+        params.extend(item_params)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def order_sql(order: Optional[str]) -> Tuple[str, List[Any]]:
+    """ORDER BY with Postgres NULL placement (NULLS LAST for asc, FIRST for desc)"""
+    if not order:
+        return ' ORDER BY rowid', []
+    terms, params = [], []
+    for part in order.split(','):
+        pieces = part.split('.')
+        path, _ = column_sql(pieces[0])
+        direction = 'DESC' if 'desc' in pieces[1:] else 'ASC'
+        nulls_first = 'nullsfirst' in pieces[1:] or (direction == 'DESC' and 'nullslast' not in pieces[1:])
+        terms.append(f"(json_extract(data, ?) IS NULL) {'DESC' if nulls_first else 'ASC'}, json_extract(data, ?) {direction}")
+        params.extend([path, path])
+    return ' ORDER BY ' + ', '.join(terms) + ', rowid', params
+
+
+def project(row: Dict, select: Optional[str]) -> Dict:
+    """Apply select=col1,col2 (no embedded resources)"""
+    if not select or select == '*':
+        return row
+    result = {}
+    for column in select.split(','):
+        column = column.strip()
+        if '(' in column:
+            raise RestError(400, 'PGRST100', f'Embedded resources are not supported: {column}')
+        alias, _, name = column.split('::')[0].rpartition(':')
+        result[alias or name] = row.get(name)
+    return result
+
+
+# ============================================================================
+# FAKE SERVER
+# ============================================================================
+
+class FakeSupabase:
+    """SQLite-backed PostgREST / Auth / Storage stand-in running on a local port"""
+
+    def __init__(self, db_path: str = ':memory:', max_rows: int = DEFAULT_MAX_ROWS, latency: float = 0.0,
+                 unique_keys: Optional[Dict[str, List[Tuple[str, ...]]]] = None,
+                 auth_page_size: int = DEFAULT_AUTH_PAGE_SIZE, host: str = '127.0.0.1', port: int = 0):
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS _auth_users (id TEXT PRIMARY KEY, email TEXT UNIQUE, data TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS _storage_buckets (id TEXT PRIMARY KEY, public INTEGER)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS _storage_objects '
+                        '(bucket TEXT, name TEXT, content BLOB, content_type TEXT, id TEXT, updated_at TEXT, '
+                        'PRIMARY KEY (bucket, name))')
+        self.lock = threading.RLock()
+        self.max_rows = max_rows
+        self.latency = latency
+        self.unique_keys = dict(DEFAULT_UNIQUE_KEYS if unique_keys is None else unique_keys)
+        self.auth_page_size = auth_page_size
+        self.rpcs: Dict[str, Callable[['FakeSupabase', Dict], Any]] = {
+            'update_fdd_chunk_embeddings': rpc_update_fdd_chunk_embeddings,
+            'table_bucket_hashes': rpc_table_bucket_hashes,
+            'table_row_hashes': rpc_table_row_hashes,
+        }
+        self.stats: Counter = Counter()  # (method, route) → requests; 'bytes_in' / 'bytes_out'
+        self.key = FAKE_KEY
+        self.server = ThreadingHTTPServer((host, port), make_handler(self))
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeSupabase':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'FakeSupabase':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def register_rpc(self, name: str, func: Callable[['FakeSupabase', Dict], Any]):
+        self.rpcs[name] = func
+
+    def reset_stats(self):
+        self.stats.clear()
+
+    @property
+    def request_count(self) -> int:
+        return sum(v for k, v in self.stats.items() if isinstance(k, tuple))
+
+    # ------------------------------------------------------------------
+    # Table storage
+    # ------------------------------------------------------------------
+
+    def _table(self, table: str) -> str:
+        if not COLUMN_PATTERN.match(table):
+            raise RestError(404, 'PGRST205', f'Invalid table: {table}')
+        name = f't_{table}'
+        self.db.execute(f'CREATE TABLE IF NOT EXISTS "{name}" (id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        # Expression index per unique key, so conflict checks are lookups rather than scans
+        for columns in self.unique_keys.get(table, []):
+            index = f'{name}__{"_".join(columns)}'
+            self.db.execute(f'CREATE INDEX IF NOT EXISTS "{index}" ON "{name}" ({", ".join(self._key_sql(columns))})')
+        return name
+
+    @staticmethod
+    def _key_sql(columns: Tuple[str, ...]) -> List[str]:
+        return [f"json_extract(data, '{column_sql(c)[0]}')" for c in columns]
+
+    @staticmethod
+    def _check_generated(table: str, rows: List[Dict]):
+        for column in GENERATED_COLUMNS.get(table, {}):
+            if any(column in row for row in rows):
+                raise RestError(400, '428C9', f'cannot insert a non-DEFAULT value into column "{column}"')
+
+    @staticmethod
+    def _generate(table: str, row: Dict) -> Dict:
+        for column, value in GENERATED_COLUMNS.get(table, {}).items():
+            row[column] = value(row)
+        return row
+
+    def select_rows(self, table: str, query: List[Tuple[str, str]], limit: Optional[int] = None,
+                    offset: int = 0) -> Tuple[List[Dict], int]:
+        """Rows matching the query's filters and order, plus the total match count"""
+        name = self._table(table)
+        params = dict(query)
+        where, where_params = where_sql(query)
+        order, order_params = order_sql(params.get('order'))
+        with self.lock:
+            total = self.db.execute(f'SELECT COUNT(*) FROM "{name}"{where}', where_params).fetchone()[0]
+            limit = self.max_rows if limit is None else min(limit, self.max_rows)
+            cursor = self.db.execute(f'SELECT data FROM "{name}"{where}{order} LIMIT ? OFFSET ?',
+                                     where_params + order_params + [limit, offset])
+            return [json.loads(data) for (data,) in cursor], total
+
+    def _find_conflict(self, name: str, row: Dict, columns: Tuple[str, ...]) -> Optional[Dict]:
+        if any(row.get(c) is None for c in columns):
+            return None
+        if columns == ('id',):
+            found = self.db.execute(f'SELECT data FROM "{name}" WHERE id = ?', [str(row['id'])]).fetchone()
+        else:
+            sql = ' AND '.join(f'{expr} = ?' for expr in self._key_sql(columns))
+            found = self.db.execute(f'SELECT data FROM "{name}" WHERE {sql} LIMIT 1',
+                                    [row[c] for c in columns]).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def _write(self, name: str, row: Dict, old_id: Optional[str] = None):
+        """Insert a new row, or replace the row stored under old_id (keeping its position)"""
+        if old_id is None:
+            self.db.execute(f'INSERT INTO "{name}" (id, data) VALUES (?, ?)', [str(row['id']), json.dumps(row)])
+        else:
+            self.db.execute(f'UPDATE "{name}" SET id = ?, data = ? WHERE id = ?', [str(row['id']), json.dumps(row), old_id])
+
+    def insert(self, table: str, rows: List[Dict], on_conflict: Optional[List[str]] = None,
+               resolution: Optional[str] = None) -> List[Dict]:
+        """
+        Insert rows (one transaction). resolution 'merge-duplicates' updates
+        the row matching on_conflict, 'ignore-duplicates' skips it, and
+        without a resolution a duplicate is a 409.
+        """
+        name = self._table(table)
+        conflict_target = tuple(on_conflict or ['id'])
+        unique_keys = [('id',)] + list(self.unique_keys.get(table, []))
+        self._check_generated(table, rows)
+        written = []
+        with self.lock:
+            try:
+                for row in rows:
+                    row = dict(row)
+                    existing = self._find_conflict(name, row, conflict_target) if resolution else None
+                    if existing and resolution == 'ignore-duplicates':
+                        continue
+                    if existing:
+                        merged = self._generate(table, {**existing, **row})
+                        self._check_unique(name, table, merged, unique_keys, ignore_id=existing['id'])
+                        self._write(name, merged, old_id=str(existing['id']))
+                        written.append(merged)
+                        continue
+                    row.setdefault('id', str(uuid.uuid4()))
+                    self._generate(table, row)
+                    self._check_unique(name, table, row, unique_keys)
+                    self._write(name, row)
+                    written.append(row)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+        return written
+
+    def _check_unique(self, name: str, table: str, row: Dict, unique_keys: List[Tuple[str, ...]],
+                      ignore_id: Optional[str] = None):
+        for columns in unique_keys:
+            found = self._find_conflict(name, row, columns)
+            if found and str(found['id']) != str(ignore_id):
+                raise RestError(409, '23505', f'duplicate key value violates unique constraint on {table} ({", ".join(columns)})')
+
+    def update(self, table: str, query: List[Tuple[str, str]], values: Dict) -> List[Dict]:
+        name = self._table(table)
+        self._check_generated(table, [values])
+        where, params = where_sql(query)
+        with self.lock:
+            rows = [json.loads(d) for (d,) in self.db.execute(f'SELECT data FROM "{name}"{where}', params)]
+            updated = []
+            for row in rows:
+                old_id = str(row['id'])
+                row.update(values)
+                self._generate(table, row)
+                self._write(name, row, old_id=old_id)
+                updated.append(row)
+            self.db.commit()
+        return updated
+
+    def delete(self, table: str, query: List[Tuple[str, str]]) -> List[Dict]:
+        name = self._table(table)
+        where, params = where_sql(query)
+        with self.lock:
+            rows = [json.loads(d) for (d,) in self.db.execute(f'SELECT data FROM "{name}"{where}', params)]
+            self.db.execute(f'DELETE FROM "{name}"{where}', params)
+            self.db.commit()
+        return rows
+
+    def rows(self, table: str) -> List[Dict]:
+        """Every row of a table in insertion order (test helper, ignores max_rows)"""
+        name = self._table(table)
+        with self.lock:
+            return [json.loads(d) for (d,) in self.db.execute(f'SELECT data FROM "{name}" ORDER BY rowid')]
+
+    def count(self, table: str) -> int:
+        name = self._table(table)
+        with self.lock:
+            return self.db.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Auth admin
+    # ------------------------------------------------------------------
+
+    def create_user(self, email: str, user_id: Optional[str] = None, **attributes) -> Dict:
+        user = {
+            'id': user_id or str(uuid.uuid4()),
+            'aud': 'authenticated',
+            'role': 'authenticated',
+            'email': email,
+            'created_at': now_iso(),
+            'user_metadata': attributes.get('user_metadata', {}),
+            'email_confirmed_at': now_iso() if attributes.get('email_confirm') else None,
+        }
+        with self.lock:
+            if self.db.execute('SELECT 1 FROM _auth_users WHERE email = ?', [email]).fetchone():
+                raise RestError(422, 'email_exists', 'A user with this email address has already been registered')
+            self.db.execute('INSERT INTO _auth_users (id, email, data) VALUES (?, ?, ?)',
+                            [user['id'], email, json.dumps(user)])
+            self.db.commit()
+        return user
+
+    def list_users(self, page: int = 1, per_page: Optional[int] = None) -> List[Dict]:
+        per_page = per_page or self.auth_page_size
+        with self.lock:
+            cursor = self.db.execute('SELECT data FROM _auth_users ORDER BY rowid LIMIT ? OFFSET ?',
+                                     [per_page, (page - 1) * per_page])
+            return [json.loads(d) for (d,) in cursor]
+
+    def update_user(self, user_id: str, **attributes) -> Optional[Dict]:
+        """Admin update (email, email_confirm, user_metadata); None when the user does not exist"""
+        with self.lock:
+            found = self.db.execute('SELECT data FROM _auth_users WHERE id = ?', [user_id]).fetchone()
+            if not found:
+                return None
+            user = json.loads(found[0])
+            email = attributes.get('email') or user['email']
+            if self.db.execute('SELECT 1 FROM _auth_users WHERE email = ? AND id != ?', [email, user_id]).fetchone():
+                raise RestError(422, 'email_exists', 'A user with this email address has already been registered')
+            user['email'] = email
+            if 'user_metadata' in attributes:
+                user['user_metadata'] = attributes['user_metadata']
+            if attributes.get('email_confirm'):
+                user['email_confirmed_at'] = user.get('email_confirmed_at') or now_iso()
+            self.db.execute('UPDATE _auth_users SET email = ?, data = ? WHERE id = ?', [email, json.dumps(user), user_id])
+            self.db.commit()
+        return user
+
+    def delete_user(self, user_id: str) -> bool:
+        with self.lock:
+            deleted = self.db.execute('DELETE FROM _auth_users WHERE id = ?', [user_id]).rowcount
+            self.db.commit()
+        return bool(deleted)
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def put_object(self, bucket: str, name: str, content: bytes, content_type: str, upsert: bool) -> Dict:
+        with self.lock:
+            self.db.execute('INSERT OR IGNORE INTO _storage_buckets (id, public) VALUES (?, 0)', [bucket])
+            exists = self.db.execute('SELECT id FROM _storage_objects WHERE bucket = ? AND name = ?',
+                                     [bucket, name]).fetchone()
+            if exists and not upsert:
+                raise RestError(409, 'Duplicate', 'The resource already exists')
+            object_id = exists[0] if exists else str(uuid.uuid4())
+            self.db.execute('INSERT OR REPLACE INTO _storage_objects VALUES (?, ?, ?, ?, ?, ?)',
+                            [bucket, name, content, content_type, object_id, now_iso()])
+            self.db.commit()
+        return {'Key': f'{bucket}/{name}', 'Id': object_id}
+
+    def get_object(self, bucket: str, name: str) -> Optional[Tuple[bytes, str]]:
+        with self.lock:
+            return self.db.execute('SELECT content, content_type FROM _storage_objects WHERE bucket = ? AND name = ?',
+                                   [bucket, name]).fetchone()
+
+    def list_objects(self, bucket: str, prefix: str = '', limit: int = 100, offset: int = 0) -> List[Dict]:
+        """Objects and folders directly under prefix, like storage.from_(bucket).list(prefix)"""
+        prefix = prefix.strip('/')
+        start = f'{prefix}/' if prefix else ''
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT name, id, length(content), content_type, updated_at FROM _storage_objects '
+                'WHERE bucket = ? AND substr(name, 1, ?) = ? ORDER BY name', [bucket, len(start), start]).fetchall()
+        entries, folders = [], set()
+        for name, object_id, size, content_type, updated_at in rows:
+            rest = name[len(start):]
+            if '/' in rest:
+                folder = rest.split('/', 1)[0]
+                if folder not in folders:
+                    folders.add(folder)
+                    entries.append({'name': folder, 'id': None, 'metadata': None})
+                continue
+            entries.append({'name': rest, 'id': object_id, 'updated_at': updated_at,
+                            'metadata': {'size': size, 'mimetype': content_type}})
+        return entries[offset:offset + limit]
+
+    def delete_objects(self, bucket: str, names: List[str]) -> List[Dict]:
+        deleted = []
+        with self.lock:
+            for name in names:
+                if self.db.execute('DELETE FROM _storage_objects WHERE bucket = ? AND name = ?', [bucket, name]).rowcount:
+                    deleted.append({'name': name, 'bucket_id': bucket})
+            self.db.commit()
+        return deleted
+
+
+def rpc_update_fdd_chunk_embeddings(fake: FakeSupabase, args: Dict) -> int:
+    """Python version of 124-bulk-update-chunk-embeddings.sql"""
+    ids, embeddings = args.get('chunk_ids') or [], args.get('embeddings') or []
+    if len(ids) != len(embeddings):
+        raise RestError(400, 'P0001', f'chunk_ids and embeddings must have the same length ({len(ids)} vs {len(embeddings)})')
+    name = fake._table('fdd_chunks')
+    updated = 0
+    with fake.lock:
+        for chunk_id, embedding in zip(ids, embeddings):
+            found = fake.db.execute(f'SELECT data FROM "{name}" WHERE id = ?', [chunk_id]).fetchone()
+            if found:
+                row = json.loads(found[0])
+                row['embedding'] = embedding
+                fake._write(name, row, old_id=chunk_id)
+                updated += 1
+        fake.db.commit()
+    return updated
+
+
+def _hashed_rows(fake: FakeSupabase, args: Dict) -> List[Tuple[str, str, str]]:
+    """(id, partition value, row hash) under args' prefix, sorted by id"""
+    partition = column_sql(args.get('p_partition') or 'id')[1]
+    prefix = args.get('p_prefix') or ''
+    only_value = args.get('p_value')
+    exclude = set(args.get('p_exclude') or [])
+    rows = []
+    for row in fake.rows(args['p_table']):
+        value = row.get(partition)
+        if value is None or not str(value).startswith(prefix):
+            continue
+        if only_value is not None and str(value) != only_value:
+            continue
+        content = json.dumps({k: v for k, v in row.items() if k not in exclude}, sort_keys=True)
+        rows.append((str(row['id']), str(value), hashlib.md5(content.encode()).hexdigest()))
+    return sorted(rows)
+
+
+def rpc_table_bucket_hashes(fake: FakeSupabase, args: Dict) -> List[Dict]:
+    """Python version of table_bucket_hashes (125-drift-hash-functions.sql); hashes differ from Postgres'"""
+    width = len(args.get('p_prefix') or '') + int(args.get('p_depth') or 1)
+    buckets: Dict[str, List[Tuple[str, str]]] = {}
+    for _, value, row_hash in _hashed_rows(fake, args):
+        buckets.setdefault(value[:width], []).append((value, row_hash))
+    return [{'bucket': bucket, 'row_count': len(rows), 'partition_count': len({v for v, _ in rows}),
+             'partition_value': min(v for v, _ in rows),
+             'bucket_hash': hashlib.md5(''.join(h for _, h in rows).encode()).hexdigest()}
+            for bucket, rows in sorted(buckets.items())]
+
+
+def rpc_table_row_hashes(fake: FakeSupabase, args: Dict) -> List[Dict]:
+    """Python version of table_row_hashes (125-drift-hash-functions.sql)"""
+    after, limit = args.get('p_after') or '', int(args.get('p_limit') or 1000)
+    rows = [r for r in _hashed_rows(fake, args) if r[0] > after][:limit]
+    return [{'id': row_id, 'partition_value': value, 'row_hash': row_hash} for row_id, value, row_hash in rows]
+
+
+# ============================================================================
+# HTTP HANDLER
+# ============================================================================
+
+def make_handler(fake: FakeSupabase):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        # --------------------------------------------------------------
+        # Plumbing
+        # --------------------------------------------------------------
+
+        def _body(self) -> bytes:
+            return self.raw_body
+
+        def _json_body(self) -> Any:
+            body = self._body()
+            if not body:
+                return None
+            try:
+                return json.loads(body)
+            except ValueError:
+                raise RestError(400, 'PGRST102', 'Invalid JSON body')
+
+        def _send(self, status: int, payload: Any = None, headers: Optional[Dict[str, str]] = None,
+                  raw: Optional[bytes] = None, content_type: str = 'application/json'):
+            body = raw if raw is not None else (b'' if payload is None else json.dumps(payload).encode('utf-8'))
+            gzipped = len(body) > 1024 and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+            if gzipped:
+                body = gzip.compress(body, compresslevel=5)
+            self.send_response(status)
+            if body or raw is not None:
+                self.send_header('Content-Type', content_type)
+            if gzipped:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            if body and self.command != 'HEAD':
+                self.wfile.write(body)
+            fake.stats['bytes_out'] += len(body)
+
+        def _prefer(self) -> Dict[str, str]:
+            prefer = {}
+            for part in (self.headers.get('Prefer') or '').split(','):
+                key, _, value = part.strip().partition('=')
+                if key:
+                    prefer[key] = value
+            return prefer
+
+        def _dispatch(self):
+            parsed = urllib.parse.urlsplit(self.path)
+            query = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+            parts = [urllib.parse.unquote(p) for p in parsed.path.strip('/').split('/')]
+            length = int(self.headers.get('Content-Length') or 0)
+            self.raw_body = self.rfile.read(length) if length else b''
+            fake.stats['bytes_in'] += len(self.raw_body)
+            if self.headers.get('Content-Encoding') == 'gzip':
+                self.raw_body = gzip.decompress(self.raw_body)
+            fake.stats[(self.command, '/'.join(parts[:4] if parts[2:3] == ['rpc'] else parts[:3]))] += 1
+            if fake.latency:
+                time.sleep(fake.latency)
+            try:
+                if not self.headers.get('apikey') and not self.headers.get('Authorization'):
+                    raise RestError(401, 'PGRST301', 'No API key found in request')
+                if parts[:2] == ['rest', 'v1'] and len(parts) >= 3:
+                    if parts[2] == 'rpc' and len(parts) == 4:
+                        self._rpc(parts[3])
+                    else:
+                        self._rest(parts[2], query)
+                elif parts[:3] == ['auth', 'v1', 'admin'] and parts[3:4] == ['users']:
+                    self._auth(parts[4] if len(parts) > 4 else None, dict(query))
+                elif parts[:2] == ['storage', 'v1']:
+                    self._storage(parts[2:])
+                else:
+                    raise RestError(404, 'PGRST000', f'Not found: {parsed.path}')
+            except RestError as e:
+                self._send(e.status, {'code': e.code, 'message': e.message, 'details': None, 'hint': None})
+            except Exception as e:
+                self._send(500, {'code': 'XX000', 'message': f'{type(e).__name__}: {e}', 'details': None, 'hint': None})
+
+        do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+        # --------------------------------------------------------------
+        # /rest/v1
+        # --------------------------------------------------------------
+
+        def _range(self, params: Dict[str, str]) -> Tuple[Optional[int], int, bool]:
+            limit = int(params['limit']) if 'limit' in params else None
+            offset = int(params.get('offset') or 0)
+            header = self.headers.get('Range')
+            if header and '-' in header:
+                start, _, end = header.partition('-')
+                offset = int(start or 0)
+                if end:
+                    limit = int(end) - offset + 1
+                return limit, offset, True
+            return limit, offset, False
+
+        def _rest(self, table: str, query: List[Tuple[str, str]]):
+            params = dict(query)
+            prefer = self._prefer()
+            representation = prefer.get('return') == 'representation'
+
+            if self.command in ('GET', 'HEAD'):
+                limit, offset, ranged = self._range(params)
+                rows, total = fake.select_rows(table, query, limit, offset)
+                rows = [project(r, params.get('select')) for r in rows]
+                end = offset + len(rows) - 1
+                count = str(total) if prefer.get('count') else '*'
+                content_range = f"{offset}-{end}/{count}" if rows else f"*/{count}"
+                status = 206 if ranged and total > offset + len(rows) else 200
+                self._send(status, rows, {'Content-Range': content_range})
+
+            elif self.command == 'POST':
+                body = self._json_body()
+                rows = body if isinstance(body, list) else [body] if isinstance(body, dict) else None
+                if rows is None:
+                    raise RestError(400, 'PGRST102', 'Expected a JSON object or array')
+                if 'columns' not in params and len({tuple(sorted(r)) for r in rows}) > 1:
+                    raise RestError(400, 'PGRST102', 'All object keys must match')
+                on_conflict = params['on_conflict'].split(',') if 'on_conflict' in params else None
+                written = fake.insert(table, rows, on_conflict, prefer.get('resolution'))
+                if representation:
+                    self._send(201, [project(r, params.get('select')) for r in written])
+                else:
+                    self._send(201)
+
+            elif self.command == 'PATCH':
+                values = self._json_body()
+                if not isinstance(values, dict):
+                    raise RestError(400, 'PGRST102', 'Expected a JSON object')
+                updated = fake.update(table, query, values)
+                if representation:
+                    self._send(200, [project(r, params.get('select')) for r in updated])
+                else:
+                    self._send(204)
+
+            elif self.command == 'DELETE':
+                deleted = fake.delete(table, query)
+                if representation:
+                    self._send(200, [project(r, params.get('select')) for r in deleted])
+                else:
+                    self._send(204)
+
+            else:
+                raise RestError(405, 'PGRST000', f'Method not allowed: {self.command}')
+
+        def _rpc(self, name: str):
+            args = self._json_body() or {}
+            if name not in fake.rpcs:
+                raise RestError(404, 'PGRST202', f'Could not find the function public.{name}')
+            self._send(200, fake.rpcs[name](fake, args))
+
+        # --------------------------------------------------------------
+        # /auth/v1/admin/users
+        # --------------------------------------------------------------
+
+        def _auth(self, user_id: Optional[str], params: Dict[str, str]):
+            if self.command == 'GET' and not user_id:
+                users = fake.list_users(int(params.get('page') or 1), int(params.get('per_page') or 0) or None)
+                self._send(200, {'users': users, 'aud': 'authenticated'})
+            elif self.command == 'GET':
+                found = [u for u in fake.list_users(1, 10 ** 9) if u['id'] == user_id]
+                if not found:
+                    raise RestError(404, 'user_not_found', 'User not found')
+                self._send(200, found[0])
+            elif self.command == 'POST' and not user_id:
+                body = self._json_body() or {}
+                if not body.get('email'):
+                    raise RestError(400, 'validation_failed', 'email is required')
+                user = fake.create_user(body['email'], body.get('id'), user_metadata=body.get('user_metadata', {}),
+                                        email_confirm=body.get('email_confirm'))
+                self._send(200, user)
+            elif self.command == 'PUT' and user_id:
+                user = fake.update_user(user_id, **(self._json_body() or {}))
+                if not user:
+                    raise RestError(404, 'user_not_found', 'User not found')
+                self._send(200, user)
+            elif self.command == 'DELETE' and user_id:
+                if not fake.delete_user(user_id):
+                    raise RestError(404, 'user_not_found', 'User not found')
+                self._send(200, {})
+            else:
+                raise RestError(405, 'PGRST000', f'Method not allowed: {self.command}')
+
+        # --------------------------------------------------------------
+        # /storage/v1
+        # --------------------------------------------------------------
+
+        def _upload_content(self) -> Tuple[bytes, str]:
+            content_type = self.headers.get('Content-Type') or 'application/octet-stream'
+            body = self._body()
+            if not content_type.startswith('multipart/form-data'):
+                return body, content_type
+            message = BytesParser(policy=HTTP).parsebytes(
+                f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8') + body)
+            for part in message.iter_parts():
+                if part.get_filename() is not None or part.get_param('name', header='content-disposition') == 'file':
+                    return part.get_payload(decode=True) or b'', part.get_content_type()
+            raise RestError(400, 'InvalidRequest', 'No file in multipart upload')
+
+        def _storage(self, parts: List[str]):
+            if parts == ['bucket'] and self.command == 'GET':
+                with fake.lock:
+                    buckets = fake.db.execute('SELECT id, public FROM _storage_buckets ORDER BY id').fetchall()
+                self._send(200, [{'id': b, 'name': b, 'public': bool(p)} for b, p in buckets])
+            elif parts == ['bucket'] and self.command == 'POST':
+                body = self._json_body() or {}
+                bucket = body.get('id') or body.get('name')
+                with fake.lock:
+                    fake.db.execute('INSERT OR IGNORE INTO _storage_buckets (id, public) VALUES (?, ?)',
+                                    [bucket, int(bool(body.get('public')))])
+                    fake.db.commit()
+                self._send(200, {'name': bucket})
+            elif parts[:2] == ['object', 'list'] and len(parts) == 3:
+                body = self._json_body() or {}
+                self._send(200, fake.list_objects(parts[2], body.get('prefix', ''),
+                                                  int(body.get('limit', 100)), int(body.get('offset', 0))))
+            elif parts[:1] == ['object'] and len(parts) == 2 and self.command == 'DELETE':
+                body = self._json_body() or {}
+                self._send(200, fake.delete_objects(parts[1], body.get('prefixes', [])))
+            elif parts[:1] == ['object'] and len(parts) >= 3:
+                if parts[1] in ('public', 'authenticated', 'sign'):
+                    parts = parts[1:]
+                bucket, name = parts[1], '/'.join(parts[2:])
+                if self.command in ('POST', 'PUT'):
+                    content, content_type = self._upload_content()
+                    upsert = self.command == 'PUT' or (self.headers.get('x-upsert') or '').lower() == 'true'
+                    self._send(200, fake.put_object(bucket, name, content, content_type, upsert))
+                elif self.command in ('GET', 'HEAD'):
+                    found = fake.get_object(bucket, name)
+                    if not found:
+                        raise RestError(404, 'not_found', 'Object not found')
+                    self._send(200, raw=found[0], content_type=found[1])
+                else:
+                    raise RestError(405, 'PGRST000', f'Method not allowed: {self.command}')
+            else:
+                raise RestError(404, 'not_found', f"Not found: /storage/v1/{'/'.join(parts)}")
+
+    return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake Supabase (PostgREST + Auth + Storage) server")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--db", default=":memory:", help="SQLite file (default: in memory)")
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every request")
+    args = parser.parse_args()
+
+    fake = FakeSupabase(args.db, max_rows=args.max_rows, latency=args.latency_ms / 1000, port=args.port)
+    print(f"✓ Fake Supabase at {fake.url} (key: {fake.key})")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Hybrid Lexical + Vector Search
+==============================
+Local implementation of hybrid_match_fdd_chunks (122-hybrid-chunk-search.sql)
+for testing: BM25 over chunk_text fused with vector similarity via
+reciprocal rank fusion (RRF). Exact-term queries such as "royalty",
+"Item 19 median" or "$70,000" rank well even when cosine similarity alone
+does not.
+
+With lexical_prefilter, vector scoring only runs over the BM25 candidates,
+which narrows the scan when the lexical match is selective.
+
+Usage:
+    python3 hybrid_search.py "pipeline_output/Ace Handyman FDD (2025)" --query "royalty fee"
+    python3 hybrid_search.py "pipeline_output/Ace Handyman FDD (2025)" --questions chunking_benchmark_questions.json
+"""
+
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from local_vector_search import VectorIndex, SearchResult, top_k
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60  # same default as the SQL function
+MATCH_THRESHOLD = 0.3  # minimum cosine similarity for the vector leg, as in the SQL function
+CANDIDATE_COUNT = 50
+
+# Numbers keep their separators so "$70,000" and "6.5" stay single terms
+TOKEN_PATTERN = re.compile(r"[a-z]+|\d+(?:[.,]\d+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "which", "who", "will", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word and number terms without stopwords"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts with an inverted index"""
+
+    def __init__(self, chunks: List[Dict], k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(chunks)
+        self.doc_lengths = np.zeros(self.n_docs, dtype=np.float32)
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for row, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk['chunk_text']))
+            self.doc_lengths[row] = sum(terms.values())
+            for term, tf in terms.items():
+                postings[term].append((row, tf))
+        self.avg_length = float(self.doc_lengths.mean()) if self.n_docs else 0.0
+
+        # term -> (rows, term frequencies) as arrays for vectorized scoring
+        self.postings = {
+            term: (np.array([r for r, _ in p], dtype=np.int64), np.array([tf for _, tf in p], dtype=np.float32))
+            for term, p in postings.items()
+        }
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for the query"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.avg_length, 1e-9))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            rows, tf = self.postings[term]
+            idf = math.log(1 + (self.n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + length_norm[rows])
+        return scores
+
+    def search(self, query: str, k: int = CANDIDATE_COUNT, mask: Optional[np.ndarray] = None) -> List[SearchResult]:
+        """Top-k chunks with a non-zero BM25 score"""
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores > 0)
+        best = top_k(scores[matched], k)
+        return [(int(matched[i]), float(scores[matched[i]])) for i in best]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], rrf_k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Fuse ranked row lists: each list contributes 1 / (rrf_k + rank)"""
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, 1):
+            fused[row] += 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+class HybridRetriever:
+    """BM25 + vector retrieval fused with RRF over the same chunk rows"""
+
+    def __init__(self, index: VectorIndex, rrf_k: int = RRF_K, candidate_count: int = CANDIDATE_COUNT):
+        self.index = index
+        self.bm25 = BM25Index(index.chunks)
+        self.rrf_k = rrf_k
+        self.candidate_count = candidate_count
+
+    def lexical_search(self, query_text: str, k: int, item_numbers: Optional[Iterable[int]] = None,
+                       fdds: Optional[Iterable[str]] = None) -> List[SearchResult]:
+        return self.bm25.search(query_text, k, self.index.filter_mask(item_numbers, fdds))
+
+    def search(self, query_text: str, query_vector: Sequence[float], k: int = 5,
+               item_numbers: Optional[Iterable[int]] = None, fdds: Optional[Iterable[str]] = None,
+               lexical_prefilter: bool = False,
+               match_threshold: float = MATCH_THRESHOLD) -> List[Tuple[int, float]]:
+        """Top-k (row, rrf_score) for the query; vector candidates need similarity > match_threshold"""
+        mask = self.index.filter_mask(item_numbers, fdds)
+        lexical = self.bm25.search(query_text, self.candidate_count, mask)
+
+        if lexical_prefilter and lexical:
+            rows = np.array([row for row, _ in lexical])
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            scores = self.index.vectors[rows] @ query
+            semantic = [int(rows[i]) for i in top_k(scores, self.candidate_count) if scores[i] > match_threshold]
+        else:
+            semantic = [row for row, score in self.index.search(query_vector, self.candidate_count, item_numbers, fdds)
+                        if score > match_threshold]
+
+        fused = reciprocal_rank_fusion([[row for row, _ in lexical], semantic], self.rrf_k)
+        return fused[:k]
+
+
+# ============================================================================
+# EVALUATION
+# ============================================================================
+
+def compare_retrievers(retriever: HybridRetriever, questions: List[Dict], query_vectors: List[List[float]],
+                       ks: Sequence[int] = (1, 3, 5, 10)):
+    """Recall@k, MRR and latency of vector-only, BM25-only and hybrid search"""
+    from chunking_benchmark import is_relevant
+
+    max_k = max(ks)
+    methods = {
+        "vector": lambda q, v: [r for r, _ in retriever.index.search(v, max_k, fdds=[q['fdd']])],
+        "bm25": lambda q, v: [r for r, _ in retriever.lexical_search(q['question'], max_k, fdds=[q['fdd']])],
+        "hybrid": lambda q, v: [r for r, _ in retriever.search(q['question'], v, max_k, fdds=[q['fdd']])],
+        "hybrid+prefilter": lambda q, v: [r for r, _ in retriever.search(q['question'], v, max_k, fdds=[q['fdd']],
+                                                                          lexical_prefilter=True)],
+    }
+
+    recall_headers = " ".join(f"{'R@' + str(k):>6}" for k in ks)
+    print(f"\n  {'method':<18} {'ms/q':>6} {'MRR':>6} {recall_headers}")
+    for name, method in methods.items():
+        started = time.perf_counter()
+        rankings = [method(q, v) for q, v in zip(questions, query_vectors)]
+        ms = (time.perf_counter() - started) / len(questions) * 1000
+
+        first_hits = []
+        for question, rows in zip(questions, rankings):
+            ranks = [i for i, row in enumerate(rows, 1) if is_relevant(retriever.index.chunks[row], question)]
+            first_hits.append(ranks[0] if ranks else None)
+        mrr = sum(1.0 / r for r in first_hits if r) / len(questions)
+        recalls = " ".join(f"{sum(1 for r in first_hits if r and r <= k) / len(questions):>6.2f}" for k in ks)
+        print(f"  {name:<18} {ms:>6.2f} {mrr:>6.3f} {recalls}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from local_vector_search import build_index, embed_query, get_cache, load_chunks
+
+    parser = argparse.ArgumentParser(description="Hybrid BM25 + vector search over FDD chunks")
+    parser.add_argument("pipeline_output_dirs", nargs="+", help="pipeline_output/{franchise_name}/ directories")
+    parser.add_argument("--query", help="Search query")
+    parser.add_argument("--questions", help="Labeled question set to compare vector / BM25 / hybrid")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--prefilter", action="store_true", help="Only vector-score BM25 candidates")
+    args = parser.parse_args()
+
+    cache = get_cache()
+    index = build_index(load_chunks(args.pipeline_output_dirs), cache)
+    retriever = HybridRetriever(index)
+
+    if args.questions:
+        with open(args.questions, 'r') as f:
+            questions = json.load(f)
+        compare_retrievers(retriever, questions, [embed_query(q['question'], cache) for q in questions])
+
+    if args.query:
+        results = retriever.search(args.query, embed_query(args.query, cache), args.k,
+                                   lexical_prefilter=args.prefilter)
+        print(f"\nTop {len(results)} for: {args.query}")
+        for row, score in results:
+            chunk = index.chunks[row]
+            print(f"  {score:.4f}  {chunk['fdd']} | Item {chunk['item_number']} "
+                  f"p.{chunk['start_page']}-{chunk['end_page']} | {chunk['chunk_text'][:80]!r}")
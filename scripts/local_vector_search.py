@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Local Vector Search
+===================
+Offline stand-in for Supabase's match_fdd_chunks RPC. Loads
+semantic_search_chunks.json from one or more pipeline output folders plus
+their vectors from the local embedding cache into a NumPy matrix, so
+retrieval can be evaluated and tuned without a database.
+
+- VectorIndex: exact search (normalized dot product = cosine similarity),
+  vectorized top-k with optional item_number / FDD filters
+- IVFIndex:    approximate search with k-means inverted lists, the same
+  scheme as the production pgvector IVFFlat index (lists = 100, probes)
+
+Usage:
+    python3 local_vector_search.py "pipeline_output/Ace Handyman FDD (2025)" --query "royalty fee"
+    python3 local_vector_search.py pipeline_output/* --benchmark
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+# Must match enhanced_chunking_for_semantic_search.py so cached vectors are found
+EMBEDDING_MODEL = "text-embedding-004"
+DOCUMENT_TASK_TYPE = "RETRIEVAL_DOCUMENT"
+QUERY_TASK_TYPE = "RETRIEVAL_QUERY"
+EMBEDDING_DIMENSIONS = 768
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", str(Path(__file__).parent / "embedding_cache"))
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+
+CHUNKS_FILE = "semantic_search_chunks.json"
+DEFAULT_N_LISTS = 100  # production IVFFlat setting
+DEFAULT_N_PROBE = 10
+
+SearchResult = Tuple[int, float]  # (chunk row, cosine similarity)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so dot products are cosine similarities"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    if len(scores) <= k:
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+# ============================================================================
+# INDEXES
+# ============================================================================
+
+class VectorIndex:
+    """Exact cosine search over a dense matrix of chunk embeddings"""
+
+    def __init__(self, vectors: np.ndarray, chunks: List[Dict]):
+        if len(vectors) != len(chunks):
+            raise ValueError(f"{len(vectors)} vectors for {len(chunks)} chunks")
+        self.vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        self.chunks = chunks
+        self.item_numbers = np.array([c.get('item_number') or 0 for c in chunks], dtype=np.int32)
+        self.fdds = np.array([c.get('fdd', '') for c in chunks])
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes
+
+    def filter_mask(self, item_numbers: Optional[Iterable[int]] = None,
+                    fdds: Optional[Iterable[str]] = None) -> Optional[np.ndarray]:
+        """Boolean row mask for the filters, or None when unfiltered"""
+        mask = None
+        if item_numbers is not None:
+            mask = np.isin(self.item_numbers, list(item_numbers))
+        if fdds is not None:
+            fdd_mask = np.isin(self.fdds, list(fdds))
+            mask = fdd_mask if mask is None else mask & fdd_mask
+        return mask
+
+    def search(self, query: Sequence[float], k: int = 5, item_numbers: Optional[Iterable[int]] = None,
+               fdds: Optional[Iterable[str]] = None) -> List[SearchResult]:
+        """Top-k chunks by cosine similarity to the query"""
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        mask = self.filter_mask(item_numbers, fdds)
+        rows = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        scores = self.vectors[rows] @ query
+        best = top_k(scores, k)
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+
+class IVFIndex:
+    """
+    Approximate search: vectors are clustered with spherical k-means and
+    each query scans only the n_probe lists with the closest centroids.
+    """
+
+    def __init__(self, index: VectorIndex, n_lists: int = DEFAULT_N_LISTS, n_iter: int = 10, seed: int = 0):
+        self.index = index
+        vectors = index.vectors
+        n_lists = max(1, min(n_lists, len(vectors)))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)]
+
+        for _ in range(n_iter):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = vectors[assignments == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+            centroids = normalize_rows(centroids)
+
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignments == list_id) for list_id in range(n_lists)]
+
+    @property
+    def nbytes(self) -> int:
+        return self.index.nbytes + self.centroids.nbytes + sum(l.nbytes for l in self.lists)
+
+    def search(self, query: Sequence[float], k: int = 5, n_probe: int = DEFAULT_N_PROBE,
+               item_numbers: Optional[Iterable[int]] = None,
+               fdds: Optional[Iterable[str]] = None) -> List[SearchResult]:
+        """Top-k chunks among the n_probe closest lists"""
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        probes = top_k(self.centroids @ query, n_probe)
+        rows = np.concatenate([self.lists[p] for p in probes])
+        mask = self.index.filter_mask(item_numbers, fdds)
+        if mask is not None:
+            rows = rows[mask[rows]]
+        scores = self.index.vectors[rows] @ query
+        best = top_k(scores, k)
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+def get_cache() -> EmbeddingCache:
+    return EmbeddingCache(Path(EMBEDDING_CACHE_DIR), EMBEDDING_DIMENSIONS, EMBEDDING_CACHE_DTYPE)
+
+
+def load_chunks(pipeline_output_dirs: Iterable[str]) -> List[Dict]:
+    """Chunks from each folder's semantic_search_chunks.json, tagged with 'fdd' = folder name"""
+    chunks = []
+    for output_dir in pipeline_output_dirs:
+        chunks_file = Path(output_dir) / CHUNKS_FILE
+        if not chunks_file.exists():
+            print(f"  ⚠ No {CHUNKS_FILE} in {output_dir}, skipping")
+            continue
+        with open(chunks_file, 'r', encoding='utf-8') as f:
+            for chunk in json.load(f):
+                chunk['fdd'] = Path(output_dir).name
+                chunks.append(chunk)
+    return chunks
+
+
+def build_index(chunks: List[Dict], cache: EmbeddingCache) -> VectorIndex:
+    """Exact index over the chunks whose embeddings are in the cache"""
+    embeddings = cache.get_many(EMBEDDING_MODEL, DOCUMENT_TASK_TYPE, [c['chunk_text'] for c in chunks])
+    found = [(c, e) for c, e in zip(chunks, embeddings) if e is not None]
+    if len(found) < len(chunks):
+        print(f"  ⚠ {len(chunks) - len(found)}/{len(chunks)} chunks have no cached embedding "
+              f"(run enhanced_chunking_for_semantic_search.py first)")
+    if not found:
+        raise ValueError("No cached embeddings for these chunks")
+    return VectorIndex(np.array([e for _, e in found], dtype=np.float32), [c for c, _ in found])
+
+
+def embed_query(text: str, cache: Optional[EmbeddingCache] = None) -> List[float]:
+    """Embed a search query (RETRIEVAL_QUERY task type), using the cache when possible"""
+    if cache is not None:
+        cached = cache.get_many(EMBEDDING_MODEL, QUERY_TASK_TYPE, [text])[0]
+        if cached is not None:
+            return cached
+
+    # Imported lazily: the chunking module connects to Supabase on import
+    from enhanced_chunking_for_semantic_search import embed_texts, get_access_token
+    headers = {"Authorization": f"Bearer {get_access_token()}", "Content-Type": "application/json"}
+    embedding = embed_texts([text], headers, task_type=QUERY_TASK_TYPE)[0]
+    if cache is not None:
+        cache.put_many(EMBEDDING_MODEL, QUERY_TASK_TYPE, [text], [embedding])
+        cache.flush()
+    return embedding
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_ivf(index: VectorIndex, n_queries: int = 200, k: int = 10, n_lists: int = DEFAULT_N_LISTS,
+                  n_probes: Sequence[int] = (1, 5, 10, 20), seed: int = 0):
+    """
+    Recall@k and latency of IVF search against exact search. Queries are
+    stored chunk vectors with noise added, so no API calls are needed.
+    """
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(index), min(n_queries, len(index)), replace=False)
+    queries = index.vectors[sample] + rng.normal(0, 0.02, (len(sample), index.vectors.shape[1])).astype(np.float32)
+
+    started = time.perf_counter()
+    truth = [set(int(r) for r, _ in index.search(q, k)) for q in queries]
+    exact_ms = (time.perf_counter() - started) / len(queries) * 1000
+
+    started = time.perf_counter()
+    ivf = IVFIndex(index, n_lists=n_lists)
+    build_s = time.perf_counter() - started
+
+    print(f"\n{len(index)} chunks, {index.vectors.shape[1]} dims, {index.nbytes / 1e6:.1f} MB")
+    print(f"  Exact:  recall@{k} 1.000  {exact_ms:.2f} ms/query")
+    print(f"  IVF ({len(ivf.lists)} lists, built in {build_s:.1f}s)")
+    for n_probe in n_probes:
+        started = time.perf_counter()
+        results = [ivf.search(q, k, n_probe=n_probe) for q in queries]
+        ms = (time.perf_counter() - started) / len(queries) * 1000
+        recall = np.mean([len(truth_set & {r for r, _ in res}) / len(truth_set)
+                          for truth_set, res in zip(truth, results)])
+        print(f"    n_probe={n_probe:<3} recall@{k} {recall:.3f}  {ms:.2f} ms/query")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search FDD chunks locally with cached embeddings")
+    parser.add_argument("pipeline_output_dirs", nargs="+", help="pipeline_output/{franchise_name}/ directories")
+    parser.add_argument("--query", help="Search query (embedded with RETRIEVAL_QUERY)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--item", type=int, action="append", help="Only search this Item (repeatable)")
+    parser.add_argument("--n-probe", type=int, default=0, help="Use the IVF index with this many probes")
+    parser.add_argument("--benchmark", action="store_true", help="Compare IVF recall/latency with exact search")
+    args = parser.parse_args()
+
+    cache = get_cache()
+    chunks = load_chunks(args.pipeline_output_dirs)
+    print(f"Loaded {len(chunks)} chunks from {len(args.pipeline_output_dirs)} folders")
+    index = build_index(chunks, cache)
+
+    if args.benchmark:
+        benchmark_ivf(index, k=args.k)
+
+    if args.query:
+        query_vector = embed_query(args.query, cache)
+        if args.n_probe:
+            results = IVFIndex(index).search(query_vector, args.k, n_probe=args.n_probe, item_numbers=args.item)
+        else:
+            results = index.search(query_vector, args.k, item_numbers=args.item)
+        print(f"\nTop {len(results)} for: {args.query}")
+        for row, score in results:
+            chunk = index.chunks[row]
+            print(f"  {score:.3f}  {chunk['fdd']} | Item {chunk['item_number']} "
+                  f"p.{chunk['start_page']}-{chunk['end_page']} | {chunk['chunk_text'][:80]!r}")
@@ -1,6 +1,8 @@
 import os
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 from openai import OpenAI
 import base64
@@ -99,6 +101,20 @@ CHECKPOINT_FILE = "./fdd_processing_checkpoint.json"
 ANALYSIS_MODEL = "o1-mini"  # Recommended for quality + cost balance
 EXTRACTION_MODEL = "gpt-4-turbo-preview"  # Standard model is fine for extraction
 
+# Pipeline concurrency: step 2 for FDD N overlaps step 1 for FDDs N+1..N+k.
+# Each stage has its own worker pool so slow o1 analysis calls never hold up
+# the cheap extraction calls (and vice versa).
+ANALYSIS_CONCURRENCY = 3
+EXTRACTION_CONCURRENCY = 6
+
+# Requests-per-minute budget per model (tune to your OpenAI tier)
+MODEL_RATE_LIMITS = {
+    "o1-mini": 20,
+    "o1-preview": 10,
+    "gpt-4-turbo-preview": 60,
+}
+DEFAULT_RATE_LIMIT = 30
+
 # Create output directories
 Path(OUTPUT_DIRECTORY).mkdir(exist_ok=True)
 Path(f"{OUTPUT_DIRECTORY}/analyses").mkdir(exist_ok=True)
@@ -120,6 +136,32 @@ def save_checkpoint(checkpoint):
     with open(CHECKPOINT_FILE, 'w') as f:
         json.dump(checkpoint, f, indent=2)
 
+class RateLimiter:
+    """Spaces out calls so a model never exceeds its requests-per-minute budget"""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(model):
+    """Return the shared rate limiter for a model (one budget per model, across stages)"""
+    with _rate_limiters_lock:
+        if model not in _rate_limiters:
+            _rate_limiters[model] = RateLimiter(MODEL_RATE_LIMITS.get(model, DEFAULT_RATE_LIMIT))
+        return _rate_limiters[model]
+
 def extract_text_from_pdf(pdf_path):
     """Extract text from PDF for analysis"""
     # Note: You'll need to install PyPDF2: pip install PyPDF2
@@ -146,6 +188,8 @@ def step1_analyze_fdd(pdf_path, franchise_name):
     if len(fdd_text) > max_chars:
         fdd_text = fdd_text[:max_chars] + "\n\n[Document truncated due to length]"
     
+    get_rate_limiter(ANALYSIS_MODEL).wait()
+    
     if ANALYSIS_MODEL.startswith("o1"):
         # o1 models don't support system messages or temperature
         response = client.chat.completions.create(
@@ -183,6 +227,8 @@ def step2_extract_structured_data(analysis_text, franchise_name):
     """Step 2: Extract structured JSON from analysis"""
     print(f"  [Step 2] Extracting structured data with {EXTRACTION_MODEL}...")
     
+    get_rate_limiter(EXTRACTION_MODEL).wait()
+    
     response = client.chat.completions.create(
         model=EXTRACTION_MODEL,
         messages=[
@@ -203,21 +249,32 @@ def step2_extract_structured_data(analysis_text, franchise_name):
     structured_data = json.loads(response.choices[0].message.content)
     return structured_data
 
-def process_single_fdd(pdf_path, franchise_name):
-    """Process a single FDD through both steps"""
+def run_analysis_stage(pdf_path, franchise_name):
+    """Pipeline stage 1: analyze the FDD and save the narrative analysis"""
     try:
-        # Step 1: Generate analysis
         analysis = step1_analyze_fdd(pdf_path, franchise_name)
         
-        # Save analysis
         analysis_file = f"{OUTPUT_DIRECTORY}/analyses/{franchise_name}.txt"
         with open(analysis_file, 'w', encoding='utf-8') as f:
             f.write(analysis)
         
-        # Step 2: Extract structured data
+        return {
+            "success": True,
+            "analysis": analysis,
+            "analysis_file": analysis_file
+        }
+        
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Step 1: {e}"
+        }
+
+def run_extraction_stage(analysis, analysis_file, franchise_name):
+    """Pipeline stage 2: extract structured data from a saved analysis"""
+    try:
         structured_data = step2_extract_structured_data(analysis, franchise_name)
         
-        # Save structured data
         json_file = f"{OUTPUT_DIRECTORY}/structured/{franchise_name}.json"
         with open(json_file, 'w', encoding='utf-8') as f:
             json.dump(structured_data, f, indent=2)
@@ -232,9 +289,47 @@ def process_single_fdd(pdf_path, franchise_name):
     except Exception as e:
         return {
             "success": False,
-            "error": str(e)
+            "error": f"Step 2: {e}"
         }
 
+def process_single_fdd(pdf_path, franchise_name):
+    """Process a single FDD through both steps"""
+    result = run_analysis_stage(pdf_path, franchise_name)
+    if not result["success"]:
+        return result
+    return run_extraction_stage(result["analysis"], result["analysis_file"], franchise_name)
+
+def run_pipeline(pdf_files):
+    """
+    Run the two steps as a pipelined executor.
+    
+    Analysis and extraction each get their own worker pool. As soon as an
+    FDD finishes step 1 it is handed to the extraction pool, so extraction
+    for FDD N runs while later FDDs are still being analyzed.
+    
+    Yields (franchise_name, result) as each FDD finishes or fails.
+    """
+    with ThreadPoolExecutor(max_workers=ANALYSIS_CONCURRENCY) as analysis_pool, \
+         ThreadPoolExecutor(max_workers=EXTRACTION_CONCURRENCY) as extraction_pool:
+        pending = {}
+        for pdf_path in pdf_files:
+            future = analysis_pool.submit(run_analysis_stage, str(pdf_path), pdf_path.stem)
+            pending[future] = ("analysis", pdf_path.stem)
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, franchise_name = pending.pop(future)
+                result = future.result()
+                
+                if stage == "analysis" and result["success"]:
+                    next_future = extraction_pool.submit(
+                        run_extraction_stage, result["analysis"], result["analysis_file"], franchise_name
+                    )
+                    pending[next_future] = ("extraction", franchise_name)
+                else:
+                    yield franchise_name, result
+
 # ============================================
 # MAIN PROCESSING LOOP
 # ============================================
@@ -269,10 +364,11 @@ def main():
     if processed_count > 0:
         print(f"Resuming from checkpoint: {processed_count} already processed")
     
-    # Process each FDD
+    # Load already-processed FDDs, queue the rest
     all_structured_data = []
+    pending_files = []
     
-    for pdf_path in tqdm(pdf_files, desc="Processing FDDs"):
+    for pdf_path in pdf_files:
         franchise_name = pdf_path.stem  # Filename without extension
         
         # Skip if already processed
@@ -284,26 +380,27 @@ def main():
                     all_structured_data.append(json.load(f))
             continue
         
-        print(f"\nProcessing: {franchise_name}")
-        
-        # Process FDD
-        result = process_single_fdd(str(pdf_path), franchise_name)
-        
-        if result["success"]:
-            checkpoint["processed"].append(franchise_name)
-            all_structured_data.append(result["data"])
-            print(f"  ✓ Success")
-        else:
-            checkpoint["failed"].append({
-                "name": franchise_name,
-                "error": result["error"]
-            })
-            print(f"  ✗ Failed: {result['error']}")
-        
-        # Save checkpoint
-        save_checkpoint(checkpoint)
-        
-        time.sleep(3 if ANALYSIS_MODEL.startswith("o1") else 2)
+        pending_files.append(pdf_path)
+    
+    print(f"Pipeline: {ANALYSIS_CONCURRENCY} analysis workers, {EXTRACTION_CONCURRENCY} extraction workers")
+    
+    # Process FDDs through the pipelined executor
+    with tqdm(total=len(pending_files), desc="Processing FDDs") as progress:
+        for franchise_name, result in run_pipeline(pending_files):
+            if result["success"]:
+                checkpoint["processed"].append(franchise_name)
+                all_structured_data.append(result["data"])
+                print(f"  ✓ {franchise_name}")
+            else:
+                checkpoint["failed"].append({
+                    "name": franchise_name,
+                    "error": result["error"]
+                })
+                print(f"  ✗ {franchise_name} failed: {result['error']}")
+            
+            # Save checkpoint
+            save_checkpoint(checkpoint)
+            progress.update(1)
     
     # Save combined output
     combined_file = f"{OUTPUT_DIRECTORY}/all_franchises.json"
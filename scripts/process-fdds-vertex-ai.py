@@ -1,12 +1,14 @@
 import os
 import json
 import time
+import argparse
 import requests
 from pathlib import Path
 from typing import Dict, List, Optional
 from google.auth import default
 from google.auth.transport.requests import Request
 from tqdm import tqdm
+from batch_prediction import get_batch_backend, make_request, run_batch_job, DEFAULT_POLL_INTERVAL
 
 # Configuration
 PROJECT_ID = "fddadvisor-fdd-processing"
@@ -17,6 +19,8 @@ CHECKPOINT_FILE = "./processing_checkpoint.json"
 
 API_ENDPOINT = f"https://{LOCATION}-aiplatform.googleapis.com/v1/projects/{PROJECT_ID}/locations/{LOCATION}/endpoints/openapi/chat/completions"
 MODEL_NAME = "deepseek-ai/deepseek-r1-0528-maas"
+MAX_TOKENS = 16000
+TEMPERATURE = 0.7  # shared by the online calls and batch requests
 
 # Step 1: Analytical Prompt (produces narrative analysis)
 ANALYTICAL_PROMPT = """
@@ -401,8 +405,8 @@ def call_deepseek_api(prompt: str, max_retries: int = 3) -> Optional[str]:
             {"role": "user", "content": prompt}
         ],
         "stream": False,
-        "max_tokens": 16000,
-        "temperature": 0.7
+        "max_tokens": MAX_TOKENS,
+        "temperature": TEMPERATURE
     }
     
     for attempt in range(max_retries):
@@ -433,12 +437,9 @@ def step1_analyze_fdd(fdd_text: str, fdd_name: str) -> Optional[str]:
         return None
 
 
-def step2_extract_structured_data(analysis: str, fdd_name: str) -> Optional[Dict]:
-    """Step 2: Extract structured JSON from analysis"""
+def parse_structured_response(json_text: Optional[str], fdd_name: str) -> Optional[Dict]:
+    """Parse the step 2 model response into structured JSON"""
     try:
-        prompt = f"{EXTRACTION_PROMPT}\n\nAnalysis:\n{analysis}"
-        json_text = call_deepseek_api(prompt)
-        
         if not json_text:
             return None
         
@@ -478,6 +479,36 @@ def step2_extract_structured_data(analysis: str, fdd_name: str) -> Optional[Dict
         return None
 
 
+def step2_extract_structured_data(analysis: str, fdd_name: str) -> Optional[Dict]:
+    """Step 2: Extract structured JSON from analysis"""
+    try:
+        prompt = f"{EXTRACTION_PROMPT}\n\nAnalysis:\n{analysis}"
+        json_text = call_deepseek_api(prompt)
+        return parse_structured_response(json_text, fdd_name)
+        
+    except Exception as e:
+        print(f"Error extracting data from {fdd_name}: {e}")
+        return None
+
+
+def save_analysis(output_dir: Path, fdd_name: str, analysis: str) -> Path:
+    """Save a step 1 narrative analysis"""
+    analysis_file = output_dir / "analyses" / f"{fdd_name}_analysis.txt"
+    analysis_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(analysis_file, 'w', encoding='utf-8') as f:
+        f.write(analysis)
+    return analysis_file
+
+
+def save_structured_data(output_dir: Path, fdd_name: str, structured_data: Dict) -> Path:
+    """Save step 2 structured data"""
+    json_file = output_dir / "structured_data" / f"{fdd_name}.json"
+    json_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(structured_data, f, indent=2)
+    return json_file
+
+
 def process_single_fdd(txt_path: Path, output_dir: Path) -> bool:
     """Process a single FDD through both steps"""
     fdd_name = txt_path.stem
@@ -497,10 +528,7 @@ def process_single_fdd(txt_path: Path, output_dir: Path) -> bool:
     if not analysis:
         return False
     
-    analysis_file = output_dir / "analyses" / f"{fdd_name}_analysis.txt"
-    analysis_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(analysis_file, 'w', encoding='utf-8') as f:
-        f.write(analysis)
+    analysis_file = save_analysis(output_dir, fdd_name, analysis)
     print(f"✓ Analysis saved to {analysis_file}")
     
     print("Step 2: Extracting structured data...")
@@ -508,17 +536,119 @@ def process_single_fdd(txt_path: Path, output_dir: Path) -> bool:
     if not structured_data:
         return False
     
-    json_file = output_dir / "structured_data" / f"{fdd_name}.json"
-    json_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(structured_data, f, indent=2)
+    json_file = save_structured_data(output_dir, fdd_name, structured_data)
     print(f"✓ Structured data saved to {json_file}")
     
     return True
 
 
+def process_fdds_online(txt_files: List[Path], output_dir: Path, checkpoint: Dict, failed: set):
+    """Process FDDs one at a time with online API calls"""
+    for txt_file in tqdm(txt_files, desc="Processing FDDs"):
+        fdd_name = txt_file.stem
+        
+        if fdd_name in failed:
+            print(f"Skipping {fdd_name} (previously failed)")
+            continue
+        
+        success = process_single_fdd(txt_file, output_dir)
+        
+        if success:
+            checkpoint["completed"].append(fdd_name)
+            print(f"✓ Successfully processed {fdd_name}")
+        else:
+            checkpoint["failed"].append(fdd_name)
+            print(f"✗ Failed to process {fdd_name}")
+        
+        save_checkpoint(checkpoint)
+        
+        time.sleep(2)
+
+
+def process_fdds_batch(txt_files: List[Path], output_dir: Path, checkpoint: Dict, backend_name: str,
+                       batch_model: Optional[str] = None, poll_interval: int = DEFAULT_POLL_INTERVAL):
+    """
+    Process many FDDs as two provider-native batch jobs (analysis, then
+    extraction) instead of two online calls per FDD. Trades latency for
+    throughput and batch pricing on bulk backfills.
+
+    The local backend answers with the online DeepSeek-R1 call, so its
+    results match the online path. vertex / anthropic batch jobs cannot run
+    DeepSeek-R1 MaaS and use batch_model instead (same prompts and
+    generation config, different model).
+    """
+    batch_dir = output_dir / "batch_jobs" / time.strftime('%Y%m%d-%H%M%S')
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    if backend_name == "local":
+        backend = get_batch_backend(backend_name, batch_dir, responder=lambda prompt, max_tokens: call_deepseek_api(prompt))
+    else:
+        backend = get_batch_backend(backend_name, batch_dir, model=batch_model)
+        print(f"⚠ Batch model {backend.model} differs from the online model {MODEL_NAME}; results will not match online runs")
+    
+    # Step 1: one batch job for every narrative analysis
+    names = {}
+    analysis_requests = []
+    for index, txt_file in enumerate(txt_files):
+        fdd_text = read_text_file(str(txt_file))
+        if not fdd_text:
+            checkpoint["failed"].append(txt_file.stem)
+            continue
+        custom_id = f"fdd-{index:05d}"
+        names[custom_id] = txt_file.stem
+        analysis_requests.append(make_request(
+            custom_id, f"{ANALYTICAL_PROMPT}\n\nFDD Content:\n{fdd_text[:100000]}", max_tokens=MAX_TOKENS, temperature=TEMPERATURE
+        ))
+    
+    if not analysis_requests:
+        save_checkpoint(checkpoint)
+        return
+    
+    print(f"Step 1: Submitting {len(analysis_requests)} analyses as one batch job...")
+    analyses = run_batch_job(backend, analysis_requests, batch_dir, label="analysis", poll_interval=poll_interval)
+    
+    extraction_requests = []
+    for custom_id, analysis in analyses.items():
+        if not analysis:
+            checkpoint["failed"].append(names[custom_id])
+            continue
+        save_analysis(output_dir, names[custom_id], analysis)
+        extraction_requests.append(make_request(
+            custom_id, f"{EXTRACTION_PROMPT}\n\nAnalysis:\n{analysis}", max_tokens=MAX_TOKENS, temperature=TEMPERATURE
+        ))
+    save_checkpoint(checkpoint)
+    
+    if not extraction_requests:
+        return
+    
+    # Step 2: one batch job for every structured extraction
+    print(f"Step 2: Submitting {len(extraction_requests)} extractions as one batch job...")
+    extractions = run_batch_job(backend, extraction_requests, batch_dir, label="extraction", poll_interval=poll_interval)
+    
+    for custom_id, json_text in extractions.items():
+        fdd_name = names[custom_id]
+        structured_data = parse_structured_response(json_text, fdd_name)
+        if structured_data:
+            save_structured_data(output_dir, fdd_name, structured_data)
+            checkpoint["completed"].append(fdd_name)
+        else:
+            checkpoint["failed"].append(fdd_name)
+    save_checkpoint(checkpoint)
+
+
 def main():
     """Main processing function"""
+    parser = argparse.ArgumentParser(description="Two-step FDD processing via Vertex AI")
+    parser.add_argument("--batch-backend", type=str, choices=["local", "vertex", "anthropic"],
+                        help="Run both steps as provider-native batch jobs instead of online calls")
+    parser.add_argument("--batch-model", type=str,
+                        help="Model for vertex / anthropic batch jobs (required; they cannot run DeepSeek-R1)")
+    parser.add_argument("--poll-interval", type=int, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between batch job status checks")
+    args = parser.parse_args()
+    if args.batch_backend in ("vertex", "anthropic") and not (
+            args.batch_model or os.getenv(f"BATCH_{args.batch_backend.upper()}_MODEL")):
+        parser.error(f"--batch-backend {args.batch_backend} needs --batch-model (online runs use {MODEL_NAME})")
+    
     output_dir = Path(OUTPUT_DIRECTORY)
     output_dir.mkdir(exist_ok=True)
     
@@ -550,25 +680,12 @@ def main():
         print("All FDDs have been processed!")
         return
     
-    for txt_file in tqdm(remaining_files, desc="Processing FDDs"):
-        fdd_name = txt_file.stem
-        
-        if fdd_name in failed:
-            print(f"Skipping {fdd_name} (previously failed)")
-            continue
-        
-        success = process_single_fdd(txt_file, output_dir)
-        
-        if success:
-            checkpoint["completed"].append(fdd_name)
-            print(f"✓ Successfully processed {fdd_name}")
-        else:
-            checkpoint["failed"].append(fdd_name)
-            print(f"✗ Failed to process {fdd_name}")
-        
-        save_checkpoint(checkpoint)
-        
-        time.sleep(2)
+    if args.batch_backend:
+        remaining_files = [f for f in remaining_files if f.stem not in failed]
+        process_fdds_batch(remaining_files, output_dir, checkpoint, args.batch_backend, args.batch_model,
+                           args.poll_interval)
+    else:
+        process_fdds_online(remaining_files, output_dir, checkpoint, failed)
     
     print(f"\n{'='*60}")
     print(f"PROCESSING COMPLETE")
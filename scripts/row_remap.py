@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Streaming UUID Remapping
+========================
+Rewrites foreign-key columns (production user UUID -> staging user UUID) in
+rows on their way from production to staging, without copying them:
+
+- Works on one page at a time, so a table is never held in memory whole
+- Column by column: one dict lookup per value, assignment only for values
+  that actually change; other rows are not touched
+- The lookup keeps only ids that differ between environments. When the user
+  sync preserved every UUID (sync_data_v7.py) it is empty and a page passes
+  through without being read
+- Unwritable columns (e.g. generated ones) are popped in the same pass
+
+Rows are changed in place; the caller must not need the production values.
+
+Usage:
+    from row_remap import UuidRemapper
+
+    remap = UuidRemapper(uuid_map, ['user_id'], skip_columns=['chunk_tsv'])
+    for rows in remap.stream(pages):
+        insert(rows)
+
+    python3 row_remap.py --rows 200000   # compare with copying per row
+"""
+
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+
+class UuidRemapper:
+    """In-place FK remap for pages of rows from one table"""
+
+    def __init__(self, uuid_map: Dict[str, str], fields: Sequence[str], skip_columns: Sequence[str] = ()):
+        self.lookup: Dict[str, str] = {old: new for old, new in uuid_map.items() if new and old != new}
+        self.fields: List[str] = list(fields) if self.lookup else []
+        self.skip_columns: List[str] = list(skip_columns)
+        self.remapped = 0  # values rewritten so far
+
+    def __call__(self, rows: List[Dict]) -> List[Dict]:
+        """Remap one page in place and return it"""
+        for column in self.skip_columns:
+            for row in rows:
+                row.pop(column, None)
+        get = self.lookup.get
+        for field in self.fields:
+            for row in rows:
+                new = get(row.get(field))
+                if new is not None:
+                    row[field] = new
+                    self.remapped += 1
+        return rows
+
+    def stream(self, pages: Iterable[List[Dict]]) -> Iterator[List[Dict]]:
+        """Remap pages as they are read"""
+        for rows in pages:
+            yield self(rows)
+
+
+def remap_uuids(rows: List[Dict], uuid_map: Dict[str, str], fields: Sequence[str]) -> List[Dict]:
+    """One-off in-place remap of rows (returns the same list)"""
+    return UuidRemapper(uuid_map, fields)(rows)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def copy_per_row(rows: List[Dict], uuid_map: Dict[str, str], fields: Sequence[str]) -> List[Dict]:
+    """The previous approach (sync_data_v6/v7 map_uuids), for comparison"""
+    mapped = []
+    for row in rows:
+        new_row = row.copy()
+        for field in fields:
+            if field in new_row and new_row[field] in uuid_map:
+                new_row[field] = uuid_map[new_row[field]]
+        mapped.append(new_row)
+    return mapped
+
+
+def main():
+    import time
+    import uuid
+    import random
+    import argparse
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Benchmark in-place UUID remapping against copying rows")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--changed", type=float, default=0.1, help="Fraction of users whose UUID differs")
+    args = parser.parse_args()
+
+    users = [str(uuid.uuid4()) for _ in range(args.users)]
+    uuid_map = {u: (str(uuid.uuid4()) if random.random() < args.changed else u) for u in users}
+
+    def make_rows():
+        return [{'id': str(uuid.uuid4()), 'user_id': random.choice(users), 'event_type': 'fdd_view',
+                 'metadata': {'page': i % 40}, 'created_at': '2026-01-01T00:00:00+00:00'}
+                for i in range(args.rows)]
+
+    print(f"=== UUID remap: {args.rows} rows, {args.users} users, {args.changed:.0%} remapped ===\n")
+    for name, remap in [('copy per row', copy_per_row), ('in place', remap_uuids)]:
+        rows = make_rows()
+        tracemalloc.start()
+        start = time.perf_counter()
+        remap(rows, uuid_map, ['user_id'])
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {name:<14} {elapsed * 1000:8.1f} ms   peak extra memory {peak / 1e6:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
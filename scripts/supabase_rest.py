@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Shared Supabase REST Client
+===========================
+One HTTP client for the scripts that talk to PostgREST, Auth admin and
+Storage directly (instead of through supabase-py):
+
+- Keep-alive connection pool per project (http.client, no extra dependencies),
+  safe to share between threads
+- Connect/read timeout on every request
+- Retries with exponential backoff: always for 429/503 and refused
+  connections, and for timeouts, dropped connections, 502 and 504 when the
+  request is safe to repeat (not a plain POST insert)
+- gzip responses (Accept-Encoding); gzip request bodies above
+  REST_GZIP_MIN_BYTES when REST_GZIP_REQUESTS=1 (the API gateway must accept
+  Content-Encoding: gzip, so this is opt-in)
+- Prefer: return=minimal on table writes unless the caller asks otherwise
+
+Responses come back as (status, body): parsed JSON ([] when empty) for
+successes, the raw text for errors, like the per-script helpers it replaces.
+
+Usage:
+    from supabase_rest import get_client
+
+    client = get_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    status, rows = client.request('GET', '/rest/v1/fdds?select=id&limit=10')
+    status, _ = client.request('POST', '/rest/v1/fdds?on_conflict=id', rows,
+                               prefer='resolution=merge-duplicates')
+"""
+
+import os
+import json
+import gzip
+import time
+import queue
+import socket
+import threading
+import http.client
+import urllib.parse
+from collections import Counter
+from typing import Dict, Optional, Tuple, Union
+
+REQUEST_TIMEOUT = float(os.getenv("REST_TIMEOUT_SECONDS", "120"))
+MAX_RETRIES = int(os.getenv("REST_MAX_RETRIES", "4"))
+BACKOFF_SECONDS = float(os.getenv("REST_BACKOFF_SECONDS", "1"))  # 1, 2, 4, ... seconds
+POOL_SIZE = int(os.getenv("REST_POOL_SIZE", "8"))  # idle connections kept per project
+GZIP_REQUESTS = os.getenv("REST_GZIP_REQUESTS", "0") == "1"
+GZIP_MIN_BYTES = int(os.getenv("REST_GZIP_MIN_BYTES", "16384"))
+
+RETRY_ALWAYS_STATUSES = {429, 503}  # not processed, safe to resend anything
+RETRY_IDEMPOTENT_STATUSES = {502, 504}  # may have been processed
+WRITE_METHODS = {'POST', 'PATCH', 'PUT', 'DELETE'}
+
+# A pooled keep-alive connection the server already closed fails on first use
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class SupabaseRest:
+    """Pooled, retrying client for one Supabase project"""
+
+    def __init__(self, base_url: str, key: str, timeout: float = REQUEST_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, pool_size: int = POOL_SIZE,
+                 gzip_requests: bool = GZIP_REQUESTS):
+        parsed = urllib.parse.urlsplit(base_url.rstrip('/'))
+        self.scheme = parsed.scheme or 'https'
+        self.host = parsed.netloc
+        self.base_path = parsed.path
+        self.key = key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.gzip_requests = gzip_requests
+        self.pool: queue.LifoQueue = queue.LifoQueue(maxsize=pool_size)
+        self.stats: Counter = Counter()  # requests, retries, connections, bytes_sent, bytes_received
+        self.stats_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> http.client.HTTPConnection:
+        self._count('connections')
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """(connection, reused)"""
+        try:
+            return self.pool.get_nowait(), True
+        except queue.Empty:
+            return self._connect(), False
+
+    def _release(self, conn: http.client.HTTPConnection):
+        try:
+            self.pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _count(self, name: str, amount: int = 1):
+        with self.stats_lock:
+            self.stats[name] += amount
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    def headers(self, method: str, path: str, prefer: Optional[str], content_type: str) -> Dict[str, str]:
+        headers = {
+            'apikey': self.key,
+            'Authorization': f'Bearer {self.key}',
+            'Content-Type': content_type,
+            'Accept-Encoding': 'gzip',
+        }
+        if method in WRITE_METHODS and path.startswith('/rest/v1/') and not path.startswith('/rest/v1/rpc/'):
+            if not prefer:
+                prefer = 'return=minimal'
+            elif 'return=' not in prefer:
+                prefer = f'{prefer},return=minimal'
+        if prefer:
+            headers['Prefer'] = prefer
+        return headers
+
+    def request(self, method: str, path: str, data: Union[None, bytes, Dict, list] = None,
+                prefer: Optional[str] = None, content_type: str = 'application/json',
+                headers: Optional[Dict[str, str]] = None, idempotent: Optional[bool] = None) -> Tuple[int, object]:
+        """
+        Send a request (path relative to the project URL) and return
+        (status, body). dict / list data is sent as JSON, bytes as-is.
+        idempotent overrides the default (every method but POST, and
+        upserts) for retrying after ambiguous failures, e.g. for RPCs.
+        Raises the last connection error when every attempt failed.
+        """
+        all_headers = self.headers(method, path, prefer, content_type)
+        all_headers.update(headers or {})
+        body = json.dumps(data).encode('utf-8') if data is not None and not isinstance(data, bytes) else data
+        if body and self.gzip_requests and len(body) >= GZIP_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=5)
+            all_headers['Content-Encoding'] = 'gzip'
+        repeatable = idempotent if idempotent is not None else (
+            method != 'POST' or 'resolution=' in all_headers.get('Prefer', ''))
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, raw, encoding = self._send(method, self.base_path + path, body, all_headers)
+            except (socket.timeout, ConnectionError, http.client.HTTPException, OSError) as e:
+                refused = isinstance(e, ConnectionRefusedError)
+                if attempt >= self.max_retries or not (refused or repeatable):
+                    raise
+                self._backoff(attempt, f"{type(e).__name__}")
+                continue
+
+            if attempt < self.max_retries and (
+                    status in RETRY_ALWAYS_STATUSES or (repeatable and status in RETRY_IDEMPOTENT_STATUSES)):
+                self._backoff(attempt, f"HTTP {status}")
+                continue
+            return status, self._decode(status, raw, encoding)
+
+    def _send(self, method: str, path: str, body: Optional[bytes],
+              headers: Dict[str, str]) -> Tuple[int, bytes, Optional[str]]:
+        conn, reused = self._acquire()
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # Server closed the idle connection: the request never arrived
+                conn.close()
+                conn = self._connect()
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+            raw = response.read()
+        except Exception:
+            conn.close()
+            raise
+
+        self._count('requests')
+        self._count('bytes_sent', len(body or b''))
+        self._count('bytes_received', len(raw))
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return response.status, raw, response.getheader('Content-Encoding')
+
+    def _backoff(self, attempt: int, reason: str):
+        delay = BACKOFF_SECONDS * 2 ** attempt
+        self._count('retries')
+        print(f"  ⚠ {reason} from {self.host}, retrying in {delay:.0f}s ({attempt + 1}/{self.max_retries})")
+        time.sleep(delay)
+
+    @staticmethod
+    def _decode(status: int, raw: bytes, encoding: Optional[str]) -> object:
+        if encoding == 'gzip':
+            raw = gzip.decompress(raw)
+        text = raw.decode('utf-8')
+        if status >= 400:
+            return text
+        if not text:
+            return []
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+
+_clients: Dict[Tuple[str, str], SupabaseRest] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url: str, key: str) -> SupabaseRest:
+    """Shared client (and connection pool) for a project URL + key"""
+    with _clients_lock:
+        client = _clients.get((base_url, key))
+        if client is None:
+            client = _clients[(base_url, key)] = SupabaseRest(base_url, key)
+        return client
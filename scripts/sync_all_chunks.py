@@ -1,7 +1,12 @@
 import os
-import json
-import urllib.request
-import urllib.error
+import queue
+import hashlib
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from chunk_reader import iter_fdd_chunk_pages
+from supabase_rest import get_client
 
 # Environment variables
 PROD_URL = os.environ.get("SUPABASE_URL")
@@ -9,75 +14,30 @@ PROD_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 STAGING_URL = os.environ.get("SUPABASE_URL_STAGING")
 STAGING_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY_STAGING")
 
-def make_request(url, headers, method="GET", data=None):
-    req = urllib.request.Request(url, headers=headers, method=method)
-    if data:
-        req.data = json.dumps(data).encode('utf-8')
-    try:
-        with urllib.request.urlopen(req) as response:
-            body = response.read().decode('utf-8')
-            return response.status, json.loads(body) if body else []
-    except urllib.error.HTTPError as e:
-        body = e.read().decode('utf-8')
-        return e.code, body
+SYNC_CONCURRENCY = int(os.getenv("CHUNK_SYNC_CONCURRENCY", "4"))  # FDDs synced at once
+PREFETCH_PAGES = int(os.getenv("CHUNK_SYNC_PREFETCH_PAGES", "2"))  # prod pages read ahead of the staging insert
+INSERT_BATCH_SIZE = int(os.getenv("CHUNK_INSERT_BATCH_SIZE", "100"))
 
 def fetch_all_chunks_for_fdd(fdd_id, url, key):
-    """Fetch ALL chunks for a specific FDD with pagination"""
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json"
-    }
-    
-    all_chunks = []
-    offset = 0
-    limit = 1000
-    
-    while True:
-        endpoint = f"{url}/rest/v1/fdd_chunks?fdd_id=eq.{fdd_id}&select=*&order=chunk_index&offset={offset}&limit={limit}"
-        status, data = make_request(endpoint, headers)
-        
-        if status != 200 or not data:
-            break
-            
-        all_chunks.extend(data)
-        
-        if len(data) < limit:
-            break
-        offset += limit
-    
-    return all_chunks
+    """Yield pages of chunks for a specific FDD (keyset pagination on chunk_index)"""
+    for page in iter_fdd_chunk_pages(url, key, fdd_id):
+        # chunk_tsv is a generated column and cannot be inserted
+        yield [{k: v for k, v in chunk.items() if k != 'chunk_tsv'} for chunk in page]
 
 def delete_chunks_for_fdd(fdd_id, url, key):
     """Delete all chunks for a specific FDD in staging"""
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json"
-    }
-    
-    endpoint = f"{url}/rest/v1/fdd_chunks?fdd_id=eq.{fdd_id}"
-    status, _ = make_request(endpoint, headers, method="DELETE")
+    status, _ = get_client(url, key).request("DELETE", f"/rest/v1/fdd_chunks?fdd_id=eq.{fdd_id}")
     return status in [200, 204]
 
 def insert_chunks_batch(chunks, url, key):
     """Insert chunks in batches"""
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal"
-    }
-    
-    endpoint = f"{url}/rest/v1/fdd_chunks"
-    
-    # Insert in batches of 100
-    batch_size = 100
+    client = get_client(url, key)
+    batch_size = INSERT_BATCH_SIZE
     inserted = 0
     
     for i in range(0, len(chunks), batch_size):
         batch = chunks[i:i+batch_size]
-        status, response = make_request(endpoint, headers, method="POST", data=batch)
+        status, response = client.request("POST", "/rest/v1/fdd_chunks", batch)
         
         if status in [200, 201]:
             inserted += len(batch)
@@ -86,43 +46,147 @@ def insert_chunks_batch(chunks, url, key):
     
     return inserted
 
-def main():
-    if not all([PROD_URL, PROD_KEY, STAGING_URL, STAGING_KEY]):
-        print("Missing environment variables!")
-        return
+def chunk_fingerprints(url, key):
+    """
+    {fdd_id: (chunk count, checksum)} over (chunk_index, id, content_hash) of every chunk.
+    Only production-owned columns are read: content_hash (migration 121) catches content
+    changes, while updated_at is rewritten by staging's trigger on any update.
+    """
+    digests, counts = {}, {}
+    for page in iter_fdd_chunk_pages(url, key, select='id,content_hash'):
+        for chunk in page:
+            fdd_id = chunk['fdd_id']
+            if fdd_id not in digests:
+                digests[fdd_id], counts[fdd_id] = hashlib.md5(), 0
+            digests[fdd_id].update(f"{chunk['chunk_index']}|{chunk['id']}|{chunk.get('content_hash')}\n".encode())
+            counts[fdd_id] += 1
+    return {fdd_id: (counts[fdd_id], digest.hexdigest()) for fdd_id, digest in digests.items()}
+
+def find_drifted_fdds():
+    """[(fdd_id, prod count, staging count)] for FDDs whose staging chunks differ from production"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        prod_future = executor.submit(chunk_fingerprints, PROD_URL, PROD_KEY)
+        staging_future = executor.submit(chunk_fingerprints, STAGING_URL, STAGING_KEY)
+        prod, staging = prod_future.result(), staging_future.result()
     
-    print("=== Syncing ALL FDD Chunks ===\n")
+    drifted = []
+    for fdd_id, (count, checksum) in prod.items():
+        staging_count, staging_checksum = staging.get(fdd_id, (0, None))
+        if checksum != staging_checksum:
+            drifted.append((fdd_id, count, staging_count))
     
-    # FDDs that need syncing (from comparison)
-    fdds_to_sync = [
-        ("7b0089c2-ac92-4d48-b88e-a6331ccb6586", "Ace Handyman Services"),
-        ("859b5f97-0cfb-45a0-95f8-0aade7c4f8f8", "Elements Massage"),
-        ("7312de7c-2538-4ed3-96b2-dd70df339d72", "Fitness Together"),
-        ("12e7cdc4-9936-4c41-987b-5cf8e64ea5e3", "Radiant Waxing"),
-    ]
+    only_staging = [fdd_id for fdd_id in staging if fdd_id not in prod]
+    if only_staging:
+        print(f"  ⚠ {len(only_staging)} FDDs have chunks only in staging (left untouched)")
+    return drifted
+
+def prefetch(pages, depth=PREFETCH_PAGES):
+    """Iterate pages while a background thread reads up to depth pages ahead"""
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+    done = object()
     
-    for fdd_id, name in fdds_to_sync:
-        print(f"Processing: {name}")
-        
-        # Fetch from production
-        print(f"  Fetching from production...")
-        prod_chunks = fetch_all_chunks_for_fdd(fdd_id, PROD_URL, PROD_KEY)
-        print(f"  Found {len(prod_chunks)} chunks in production")
-        
-        if not prod_chunks:
-            print(f"  Skipping - no chunks in production")
-            continue
+    def put(item):
+        """Hand item to the consumer; False once it has stopped reading"""
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        try:
+            for page in itertools.chain(pages, [done]):
+                if not put(page):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            if hasattr(pages, 'close'):
+                pages.close()
+    
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+def sync_fdd_chunks(fdd_id):
+    """Replace one FDD's staging chunks, inserting each production page while the next is fetched"""
+    pages = prefetch(fetch_all_chunks_for_fdd(fdd_id, PROD_URL, PROD_KEY))
+    try:
+        first_page = next(pages, None)
+        if not first_page:
+            return 0, 0
         
-        # Delete existing in staging
-        print(f"  Deleting existing staging chunks...")
-        delete_chunks_for_fdd(fdd_id, STAGING_URL, STAGING_KEY)
+        if not delete_chunks_for_fdd(fdd_id, STAGING_URL, STAGING_KEY):
+            raise RuntimeError("could not delete existing staging chunks")
         
-        # Insert all chunks to staging
-        print(f"  Inserting to staging...")
-        inserted = insert_chunks_batch(prod_chunks, STAGING_URL, STAGING_KEY)
-        print(f"  Inserted {inserted} chunks\n")
+        found = inserted = 0
+        for page in itertools.chain([first_page], pages):
+            found += len(page)
+            inserted += insert_chunks_batch(page, STAGING_URL, STAGING_KEY)
+        return found, inserted
+    finally:
+        pages.close()  # stops the prefetch thread reading pages nobody will insert
+
+def run_chunk_sync(fdd_ids=None, dry_run=False, max_workers=SYNC_CONCURRENCY):
+    """Sync the given FDDs (default: every FDD whose chunks drifted), several at a time; returns chunks inserted"""
+    if fdd_ids is None:
+        print("Comparing chunk counts and checksums...")
+        drifted = find_drifted_fdds()
+        print(f"  {len(drifted)} FDDs out of sync")
+        for fdd_id, prod_count, staging_count in drifted:
+            print(f"    {fdd_id}: production {prod_count} chunks, staging {staging_count}")
+        fdd_ids = [fdd_id for fdd_id, _, _ in drifted]
+    
+    if dry_run or not fdd_ids:
+        return 0
+    
+    print(f"\nSyncing {len(fdd_ids)} FDDs, {max_workers} at a time...")
+    total_inserted = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(sync_fdd_chunks, fdd_id): fdd_id for fdd_id in fdd_ids}
+        for future in as_completed(futures):
+            fdd_id = futures[future]
+            try:
+                found, inserted = future.result()
+            except Exception as e:
+                print(f"  ✗ {fdd_id}: {e}")
+                continue
+            total_inserted += inserted
+            if not found:
+                print(f"  ⚠ {fdd_id}: no chunks in production, skipped")
+            else:
+                mark = "✓" if inserted == found else "✗"
+                print(f"  {mark} {fdd_id}: inserted {inserted}/{found} chunks")
+    
+    return total_inserted
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Sync fdd_chunks for FDDs that drifted from production")
+    parser.add_argument("--fdd", action="append", help="Sync this FDD id instead of discovering drift (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Only list out-of-sync FDDs")
+    parser.add_argument("--workers", type=int, default=SYNC_CONCURRENCY, help="FDDs synced at once")
+    args = parser.parse_args()
+    
+    if not all([PROD_URL, PROD_KEY, STAGING_URL, STAGING_KEY]):
+        print("Missing environment variables!")
+        return
     
-    print("=== Sync Complete ===")
+    print("=== Syncing FDD Chunks ===\n")
+    inserted = run_chunk_sync(args.fdd, args.dry_run, args.workers)
+    print(f"\n=== Sync Complete ({inserted} chunks inserted) ===")
 
 if __name__ == "__main__":
     main()
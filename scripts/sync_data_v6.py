@@ -10,12 +10,16 @@ import json
 import urllib.request
 import urllib.error
 
+from row_remap import UuidRemapper
+
 # Environment variables
 PROD_URL = os.environ.get('SUPABASE_URL', '')
 PROD_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY', '')
 STAGING_URL = os.environ.get('SUPABASE_URL_STAGING', '')
 STAGING_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY_STAGING', '')
 
+PAGE_SIZE = 1000  # db-max-rows
+
 def make_request(url, method='GET', data=None, headers=None):
     """Make HTTP request and return response."""
     if headers is None:
@@ -45,18 +49,27 @@ def get_auth_users(base_url, key):
         return data.get('users', [])
     return []
 
-def fetch_table(base_url, key, table, select='*'):
-    """Fetch all rows from a table."""
+def fetch_pages(base_url, key, table, select='*', page_size=PAGE_SIZE):
+    """Yield pages of rows from a table (keyset pagination on id). Raises RuntimeError if a page can't be read."""
     headers = {
         'apikey': key,
         'Authorization': f'Bearer {key}',
         'Content-Type': 'application/json'
     }
-    url = f'{base_url}/rest/v1/{table}?select={select}'
-    status, body = make_request(url, headers=headers)
-    if status == 200 and body:
-        return json.loads(body)
-    return []
+    last_id = None
+    while True:
+        url = f'{base_url}/rest/v1/{table}?select={select}&order=id.asc&limit={page_size}'
+        if last_id:
+            url += f'&id=gt.{last_id}'
+        status, body = make_request(url, headers=headers)
+        if status != 200:
+            raise RuntimeError(f"read failed ({status}): {body[:100]}")
+        rows = json.loads(body) if body else []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['id']
 
 def delete_table(base_url, key, table):
     """Delete all rows from a table."""
@@ -88,16 +101,25 @@ def insert_table(base_url, key, table, rows):
     else:
         return False, body
 
-def map_uuids(rows, uuid_map, fields):
-    """Replace UUIDs in rows using the mapping."""
-    mapped_rows = []
-    for row in rows:
-        new_row = row.copy()
-        for field in fields:
-            if field in new_row and new_row[field] in uuid_map:
-                new_row[field] = uuid_map[new_row[field]]
-        mapped_rows.append(new_row)
-    return mapped_rows
+def copy_table(table, uuid_map, fields=None, select='*'):
+    """Copy a table page by page, remapping UUID fields in place. Returns rows synced."""
+    remap = UuidRemapper(uuid_map, fields or [])
+    total = 0
+    try:
+        for rows in remap.stream(fetch_pages(PROD_URL, PROD_KEY, table, select)):
+            success, result = insert_table(STAGING_URL, STAGING_KEY, table, rows)
+            if not success:
+                print(f"  {table}: FAILED - {result[:100]}")
+                return total
+            total += result
+    except RuntimeError as e:
+        print(f"  {table}: FAILED after {total} rows - {str(e)[:100]}")
+        return total
+    if total:
+        print(f"  {table}: {total} rows synced")
+    else:
+        print(f"  {table}: No data")
+    return total
 
 def main():
     print("=" * 60)
@@ -194,117 +216,42 @@ def main():
     
     # Step 5: Sync franchises first (has franchisor_id -> user UUID)
     print("\n--- Step 5: Syncing franchises ---")
-    rows = fetch_table(PROD_URL, PROD_KEY, 'franchises')
-    if rows:
-        mapped = map_uuids(rows, uuid_map, ['franchisor_id'])
-        success, result = insert_table(STAGING_URL, STAGING_KEY, 'franchises', mapped)
-        if success:
-            print(f"  franchises: {result} rows synced")
-            total_synced += result
-        else:
-            print(f"  franchises: FAILED - {result[:100]}")
-    else:
-        print("  franchises: No data")
+    total_synced += copy_table('franchises', uuid_map, ['franchisor_id'])
     
     # Step 6: Sync fdds (depends on franchises)
     print("\n--- Step 6: Syncing fdds ---")
-    rows = fetch_table(PROD_URL, PROD_KEY, 'fdds')
-    if rows:
-        success, result = insert_table(STAGING_URL, STAGING_KEY, 'fdds', rows)
-        if success:
-            print(f"  fdds: {result} rows synced")
-            total_synced += result
-        else:
-            print(f"  fdds: FAILED - {result[:100]}")
-    else:
-        print("  fdds: No data")
+    total_synced += copy_table('fdds', uuid_map)
     
     # Step 7: Sync tables with user_id
     print("\n--- Step 7: Syncing user-related tables ---")
     for table, fields in user_id_tables:
-        rows = fetch_table(PROD_URL, PROD_KEY, table)
-        if rows:
-            mapped = map_uuids(rows, uuid_map, fields)
-            success, result = insert_table(STAGING_URL, STAGING_KEY, table, mapped)
-            if success:
-                print(f"  {table}: {result} rows synced")
-                total_synced += result
-            else:
-                print(f"  {table}: FAILED - {result[:100]}")
-        else:
-            print(f"  {table}: No data")
+        total_synced += copy_table(table, uuid_map, fields)
     
     # Step 8: Sync tables with franchisor_id
     print("\n--- Step 8: Syncing franchisor-related tables ---")
     for table, fields in franchisor_id_tables:
         if table == 'franchises':
             continue  # Already synced
-        rows = fetch_table(PROD_URL, PROD_KEY, table)
-        if rows:
-            mapped = map_uuids(rows, uuid_map, fields)
-            success, result = insert_table(STAGING_URL, STAGING_KEY, table, mapped)
-            if success:
-                print(f"  {table}: {result} rows synced")
-                total_synced += result
-            else:
-                print(f"  {table}: FAILED - {result[:100]}")
-        else:
-            print(f"  {table}: No data")
+        total_synced += copy_table(table, uuid_map, fields)
     
     # Step 9: Sync fdd-related tables
     print("\n--- Step 9: Syncing fdd-related tables ---")
     for table in ['fdd_item_page_mappings', 'fdd_question_answers']:
-        rows = fetch_table(PROD_URL, PROD_KEY, table)
-        if rows:
-            success, result = insert_table(STAGING_URL, STAGING_KEY, table, rows)
-            if success:
-                print(f"  {table}: {result} rows synced")
-                total_synced += result
-            else:
-                print(f"  {table}: FAILED - {result[:100]}")
-        else:
-            print(f"  {table}: No data")
+        total_synced += copy_table(table, uuid_map)
     
     # Step 10: Sync fdd_chunks without embeddings
     print("\n--- Step 10: Syncing fdd_chunks (without embeddings) ---")
-    rows = fetch_table(PROD_URL, PROD_KEY, 'fdd_chunks', 
-                       'id,fdd_id,item_number,chunk_index,content,page_start,page_end,created_at')
-    if rows:
-        success, result = insert_table(STAGING_URL, STAGING_KEY, 'fdd_chunks', rows)
-        if success:
-            print(f"  fdd_chunks: {result} rows synced")
-            total_synced += result
-        else:
-            print(f"  fdd_chunks: FAILED - {result[:100]}")
-    else:
-        print("  fdd_chunks: No data")
+    total_synced += copy_table('fdd_chunks', uuid_map,
+                               select='id,fdd_id,item_number,chunk_index,content,page_start,page_end,created_at')
     
     # Step 11: Sync fdd_buyer_invitations
     print("\n--- Step 11: Syncing fdd_buyer_invitations ---")
-    rows = fetch_table(PROD_URL, PROD_KEY, 'fdd_buyer_invitations')
-    if rows:
-        success, result = insert_table(STAGING_URL, STAGING_KEY, 'fdd_buyer_invitations', rows)
-        if success:
-            print(f"  fdd_buyer_invitations: {result} rows synced")
-            total_synced += result
-        else:
-            print(f"  fdd_buyer_invitations: FAILED - {result[:100]}")
-    else:
-        print("  fdd_buyer_invitations: No data")
+    total_synced += copy_table('fdd_buyer_invitations', uuid_map)
     
     # Step 12: Sync standalone tables
     print("\n--- Step 12: Syncing standalone tables ---")
     for table in standalone_tables:
-        rows = fetch_table(PROD_URL, PROD_KEY, table)
-        if rows:
-            success, result = insert_table(STAGING_URL, STAGING_KEY, table, rows)
-            if success:
-                print(f"  {table}: {result} rows synced")
-                total_synced += result
-            else:
-                print(f"  {table}: FAILED - {result[:100]}")
-        else:
-            print(f"  {table}: No data")
+        total_synced += copy_table(table, uuid_map)
     
     print(f"\n--- Complete: {total_synced} total rows synced ---")
     print("\nNote: Users in staging have temporary password 'TempPassword123!'")
@@ -1,7 +1,9 @@
 import os
-import json
-import urllib.request
-import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+from row_remap import UuidRemapper
+from supabase_rest import get_client
+from sync_engine import PAGE_SIZE, PAGE_SIZES, SKIP_COLUMNS, iter_table_pages
 
 # Environment variables
 PROD_URL = os.environ.get('SUPABASE_URL')
@@ -17,53 +19,33 @@ if not all([PROD_URL, PROD_KEY, STAGING_URL, STAGING_KEY]):
     print(f"  SUPABASE_SERVICE_ROLE_KEY_STAGING: {'SET' if STAGING_KEY else 'MISSING'}")
     exit(1)
 
-def make_request(url, headers, method='GET', data=None):
-    """Make HTTP request and return response"""
-    req = urllib.request.Request(url, headers=headers, method=method)
-    if data:
-        req.data = json.dumps(data).encode('utf-8')
-    try:
-        with urllib.request.urlopen(req) as response:
-            body = response.read().decode('utf-8')
-            if body:
-                return json.loads(body), response.status
-            return [], response.status
-    except urllib.error.HTTPError as e:
-        body = e.read().decode('utf-8')
-        return body, e.code
+AUTH_PAGE_SIZE = 1000
+AUTH_CONCURRENCY = int(os.getenv("AUTH_SYNC_CONCURRENCY", "8"))  # admin API calls in flight
 
 def get_auth_users(base_url, key):
-    """Get all auth users via Admin API"""
-    url = f"{base_url}/auth/v1/admin/users"
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json'
-    }
-    result, status = make_request(url, headers)
-    if status == 200 and isinstance(result, dict):
-        return result.get('users', [])
-    return []
+    """Get all auth users via Admin API (every page)"""
+    users = []
+    page = 1
+    while True:
+        status, result = get_client(base_url, key).request(
+            'GET', f'/auth/v1/admin/users?page={page}&per_page={AUTH_PAGE_SIZE}')
+        if status != 200 or not isinstance(result, dict):
+            print(f"  Failed to list users (page {page}): {status} {str(result)[:200]}")
+            break
+        batch = result.get('users', [])
+        users.extend(batch)
+        if len(batch) < AUTH_PAGE_SIZE:
+            break
+        page += 1
+    return users
 
 def delete_auth_user(base_url, key, user_id):
     """Delete an auth user"""
-    url = f"{base_url}/auth/v1/admin/users/{user_id}"
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json'
-    }
-    result, status = make_request(url, headers, method='DELETE')
+    status, _ = get_client(base_url, key).request('DELETE', f'/auth/v1/admin/users/{user_id}')
     return status in [200, 204]
 
 def create_auth_user(base_url, key, email, user_id):
     """Create auth user with specific UUID"""
-    url = f"{base_url}/auth/v1/admin/users"
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json'
-    }
     data = {
         'email': email,
         'password': 'TempPassword123!',
@@ -71,33 +53,44 @@ def create_auth_user(base_url, key, email, user_id):
         'user_metadata': {'synced_from_production': True},
         'id': user_id  # Try to set the UUID
     }
-    result, status = make_request(url, headers, method='POST', data=data)
+    status, result = get_client(base_url, key).request('POST', '/auth/v1/admin/users', data)
     return result, status
 
-def fetch_table(base_url, key, table, select='*'):
-    """Fetch all rows from a table"""
-    url = f"{base_url}/rest/v1/{table}?select={select}"
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json',
-        'Prefer': 'return=representation'
-    }
-    result, status = make_request(url, headers)
-    if status == 200 and isinstance(result, list):
-        return result
-    return []
+def update_auth_user(base_url, key, user_id, email):
+    """Set an existing auth user's email (confirmed)"""
+    data = {'email': email, 'email_confirm': True}
+    status, result = get_client(base_url, key).request('PUT', f'/auth/v1/admin/users/{user_id}', data)
+    return result, status
+
+def plan_auth_sync(prod_users, staging_users):
+    """
+    Staging changes that leave it with production's user ids and emails:
+    users with the right id are kept (or get their email updated), the rest
+    of staging is deleted and missing production users are created.
+    """
+    staging_by_id = {u['id']: u for u in staging_users}
+    plan = {'keep': [], 'update': [], 'create': [], 'delete': []}
+    for user in prod_users:
+        existing = staging_by_id.get(user['id'])
+        if not existing:
+            plan['create'].append(user)
+        elif existing.get('email') != user.get('email') or not existing.get('email_confirmed_at'):
+            plan['update'].append(user)
+        else:
+            plan['keep'].append(user)
+    prod_ids = {u['id'] for u in prod_users}
+    plan['delete'] = [u for u in staging_users if u['id'] not in prod_ids]
+    return plan
+
+def run_concurrently(func, items):
+    """func(item) for every item, AUTH_CONCURRENCY at a time, results in order"""
+    with ThreadPoolExecutor(max_workers=AUTH_CONCURRENCY) as executor:
+        return list(executor.map(func, items))
 
 def clear_table(base_url, key, table):
     """Delete all rows from a table"""
-    url = f"{base_url}/rest/v1/{table}?id=neq.00000000-0000-0000-0000-000000000000"
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json',
-        'Prefer': 'return=minimal'
-    }
-    result, status = make_request(url, headers, method='DELETE')
+    status, _ = get_client(base_url, key).request(
+        'DELETE', f'/rest/v1/{table}?id=neq.00000000-0000-0000-0000-000000000000')
     return status in [200, 204]
 
 def insert_rows(base_url, key, table, rows):
@@ -105,14 +98,8 @@ def insert_rows(base_url, key, table, rows):
     if not rows:
         return 0, None
     
-    url = f"{base_url}/rest/v1/{table}"
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json',
-        'Prefer': 'return=minimal,resolution=ignore-duplicates'
-    }
-    result, status = make_request(url, headers, method='POST', data=rows)
+    status, result = get_client(base_url, key).request(
+        'POST', f'/rest/v1/{table}', rows, prefer='return=minimal,resolution=ignore-duplicates')
     if status in [200, 201]:
         return len(rows), None
     return 0, result
@@ -130,23 +117,35 @@ print(f"Found {len(prod_users)} users in production")
 for u in prod_users:
     print(f"  {u.get('email')}: {u.get('id')}")
 
-# Step 2: Delete all staging users and recreate with same UUIDs
-print("\n--- Step 2: Recreating staging users with production UUIDs ---")
+# Step 2: Bring staging users in line with production (same UUIDs), changing only what differs
+print("\n--- Step 2: Syncing staging users to production UUIDs ---")
 staging_users = get_auth_users(STAGING_URL, STAGING_KEY)
 print(f"Found {len(staging_users)} existing users in staging")
 
-# Delete existing staging users
-for user in staging_users:
-    delete_auth_user(STAGING_URL, STAGING_KEY, user['id'])
-    print(f"  Deleted: {user.get('email')}")
+plan = plan_auth_sync(prod_users, staging_users)
+print(f"  Plan: {len(plan['keep'])} unchanged, {len(plan['update'])} to update, "
+      f"{len(plan['create'])} to create, {len(plan['delete'])} to delete")
+
+# Deletes first: a deleted user may hold an email that a created or updated user needs
+deleted = run_concurrently(lambda u: delete_auth_user(STAGING_URL, STAGING_KEY, u['id']), plan['delete'])
+for user, ok in zip(plan['delete'], deleted):
+    print(f"  {'Deleted' if ok else 'Failed to delete'}: {user.get('email')}")
+
+uuid_mapping = {user['id']: user['id'] for user in plan['keep']}
+
+updated = run_concurrently(lambda u: update_auth_user(STAGING_URL, STAGING_KEY, u['id'], u.get('email')), plan['update'])
+for user, (result, status) in zip(plan['update'], updated):
+    if status == 200:
+        uuid_mapping[user['id']] = user['id']
+        print(f"  Updated {user.get('email')}: {user['id']}")
+    else:
+        print(f"  Failed to update {user.get('email')}: {result}")
 
 # Create users with production UUIDs
-uuid_mapping = {}
-for user in prod_users:
+created = run_concurrently(lambda u: create_auth_user(STAGING_URL, STAGING_KEY, u.get('email'), u['id']), plan['create'])
+for user, (result, status) in zip(plan['create'], created):
     email = user.get('email')
     prod_id = user.get('id')
-    result, status = create_auth_user(STAGING_URL, STAGING_KEY, email, prod_id)
-    
     if status in [200, 201] and isinstance(result, dict):
         new_id = result.get('id')
         uuid_mapping[prod_id] = new_id
@@ -182,41 +181,26 @@ for table in tables_to_clear:
     else:
         print(f"  Failed to clear {table}")
 
-def map_uuids(rows, uuid_mapping, fields):
-    """Replace production UUIDs with staging UUIDs in specified fields"""
-    mapped = []
-    for row in rows:
-        new_row = row.copy()
-        for field in fields:
-            if field in new_row and new_row[field]:
-                old_id = new_row[field]
-                if old_id in uuid_mapping:
-                    new_row[field] = uuid_mapping[old_id]
-        mapped.append(new_row)
-    return mapped
-
 def sync_table(table, uuid_fields=None, skip_columns=None):
-    """Sync a single table from production to staging"""
-    rows = fetch_table(PROD_URL, PROD_KEY, table)
-    if not rows:
+    """Stream a table from production to staging page by page, remapping user UUIDs in place"""
+    # Generated columns (SKIP_COLUMNS) cannot be written, whatever the caller skips
+    remap = UuidRemapper(uuid_mapping, uuid_fields or [], (skip_columns or []) + SKIP_COLUMNS.get(table, []))
+    pages = iter_table_pages(PROD_URL, PROD_KEY, table, page_size=PAGE_SIZES.get(table, PAGE_SIZE))
+    count = 0
+    try:
+        for rows in remap.stream(pages):
+            inserted, error = insert_rows(STAGING_URL, STAGING_KEY, table, rows)
+            if error:
+                print(f"  {table}: FAILED after {count} rows - {error[:100]}")
+                return count
+            count += inserted
+    except RuntimeError as e:
+        print(f"  {table}: FAILED after {count} rows - {str(e)[:100]}")
+        return count
+    if not count:
         print(f"  {table}: No data")
         return 0
-    
-    # Remove skipped columns
-    if skip_columns:
-        for row in rows:
-            for col in skip_columns:
-                row.pop(col, None)
-    
-    # Map UUIDs if needed
-    if uuid_fields and uuid_mapping:
-        rows = map_uuids(rows, uuid_mapping, uuid_fields)
-    
-    count, error = insert_rows(STAGING_URL, STAGING_KEY, table, rows)
-    if error:
-        print(f"  {table}: FAILED - {error[:100]}")
-        return 0
-    print(f"  {table}: {count} rows synced")
+    print(f"  {table}: {count} rows synced ({remap.remapped} UUIDs remapped)")
     return count
 
 total = 0
@@ -258,7 +242,7 @@ total += sync_table('fdd_buyer_invitations', ['buyer_id'])
 
 # Step 11: Sync fdd_chunks (skip embeddings due to dimension mismatch)
 print("\n--- Step 11: Syncing fdd_chunks (without embeddings) ---")
-total += sync_table('fdd_chunks', skip_columns=['embedding'])
+total += sync_table('fdd_chunks', skip_columns=['embedding'])  # chunk_tsv is generated, dropped via SKIP_COLUMNS
 
 # Step 12: Sync remaining tables
 print("\n--- Step 12: Syncing remaining tables ---")
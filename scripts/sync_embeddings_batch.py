@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 """
 Fast batch sync for missing embeddings.
-Updates embeddings in batches instead of one at a time.
+Updates embeddings in batches instead of one at a time: each request sends
+arrays of (id, vector) to the update_fdd_chunk_embeddings RPC
+(124-bulk-update-chunk-embeddings.sql), several requests in parallel.
+FDDs are found with drift_detector.py (migration 125), or given with --fdd.
 """
 
 import os
-import json
-import urllib.request
-import urllib.error
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from chunk_reader import iter_fdd_chunk_pages
+from drift_detector import fdds_with_changed_chunks
+from supabase_rest import get_client
+from vector_format import copy_vector_text
 
 # Environment variables
 PROD_URL = os.environ.get("SUPABASE_URL", "").rstrip("/")
@@ -15,146 +22,102 @@ PROD_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
 STAGING_URL = os.environ.get("SUPABASE_URL_STAGING", "").rstrip("/")
 STAGING_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY_STAGING", "")
 
-# FDDs missing embeddings
-MISSING_FDDS = [
-    ("amazing-lash-studio", "4ebb1dd1-babb-4b11-af1c-d6e6aa6490c2"),
-    ("blo-blow-dry-bar", "eff20a3f-1730-4cf5-8b28-fe0ce9eb89d2"),
-    ("drybar", "7c038124-9cb9-43e0-ac82-e5e8f1be8b93"),
-]
-
-def make_request(url, key, method="GET", data=None):
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal"
-    }
-    
-    req = urllib.request.Request(url, headers=headers, method=method)
-    if data:
-        req.data = json.dumps(data).encode()
-    
-    try:
-        with urllib.request.urlopen(req, timeout=120) as response:
-            if response.status in [200, 201, 204]:
-                try:
-                    return json.loads(response.read().decode())
-                except:
-                    return True
-            return None
-    except urllib.error.HTTPError as e:
-        print(f"  HTTP Error {e.code}: {e.read().decode()[:200]}")
-        return None
-    except Exception as e:
-        print(f"  Error: {e}")
-        return None
+UPDATE_MAX_BATCH_BYTES = int(os.getenv("EMBEDDING_UPDATE_MAX_BATCH_BYTES", "1000000"))  # ~100 768-dim vectors
+UPDATE_CONCURRENCY = int(os.getenv("EMBEDDING_UPDATE_CONCURRENCY", "4"))
+UPDATE_MAX_RETRIES = 3
 
 def fetch_all_chunks_with_embeddings(fdd_id):
-    """Fetch all chunks with embeddings from production"""
-    all_chunks = []
-    offset = 0
-    batch_size = 500
-    
-    while True:
-        url = f"{PROD_URL}/rest/v1/fdd_chunks?fdd_id=eq.{fdd_id}&select=id,embedding&embedding=not.is.null&offset={offset}&limit={batch_size}"
-        chunks = make_request(url, PROD_KEY)
-        
-        if not chunks:
-            break
-            
-        all_chunks.extend(chunks)
-        print(f"  Fetched {len(all_chunks)} chunks with embeddings...")
-        
-        if len(chunks) < batch_size:
-            break
-        offset += batch_size
-    
-    return all_chunks
+    """Yield pages of chunks with embeddings from production (keyset pagination)"""
+    fetched = 0
+    for chunks in iter_fdd_chunk_pages(PROD_URL, PROD_KEY, fdd_id, select='id,embedding',
+                                       with_embeddings=True, page_size=500):
+        fetched += len(chunks)
+        print(f"  Fetched {fetched} chunks with embeddings...")
+        yield chunks
 
-def update_embeddings_via_sql(fdd_id, chunks):
-    """Update embeddings using raw SQL for speed"""
-    if not chunks:
-        return 0
-    
-    # Build CASE statement for batch update
-    case_statements = []
-    ids = []
-    
+def plan_update_batches(chunks, max_bytes=UPDATE_MAX_BATCH_BYTES):
+    """Split (id, pgvector text) pairs into RPC payloads bounded by size"""
+    batches = []
+    current = {"chunk_ids": [], "embeddings": []}
+    current_bytes = 0
     for chunk in chunks:
-        chunk_id = chunk['id']
-        embedding = chunk['embedding']
-        if embedding:
-            # Format embedding as PostgreSQL array
-            embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-            case_statements.append(f"WHEN id = '{chunk_id}' THEN '{embedding_str}'::vector(768)")
-            ids.append(f"'{chunk_id}'")
-    
-    if not case_statements:
-        return 0
-    
-    # Execute in batches of 50 to avoid SQL size limits
-    batch_size = 50
-    updated = 0
-    
-    for i in range(0, len(case_statements), batch_size):
-        batch_cases = case_statements[i:i+batch_size]
-        batch_ids = ids[i:i+batch_size]
-        
-        sql = f"""
-        UPDATE fdd_chunks 
-        SET embedding = CASE {' '.join(batch_cases)} END
-        WHERE id IN ({','.join(batch_ids)})
-        """
-        
-        url = f"{STAGING_URL}/rest/v1/rpc/exec_sql"
-        result = make_request(url, STAGING_KEY, "POST", {"query": sql})
-        
-        if result is not None:
-            updated += len(batch_cases)
-            print(f"  Updated {updated}/{len(case_statements)} embeddings...")
-    
-    return updated
+        if not chunk.get('embedding'):
+            continue
+        embedding = copy_vector_text(chunk['embedding'])  # as stored in production, so the row hashes match
+        size = len(chunk['id']) + len(embedding) + 6  # quotes and commas
+        if current["chunk_ids"] and current_bytes + size > max_bytes:
+            batches.append(current)
+            current = {"chunk_ids": [], "embeddings": []}
+            current_bytes = 0
+        current["chunk_ids"].append(chunk['id'])
+        current["embeddings"].append(embedding)
+        current_bytes += size
+    if current["chunk_ids"]:
+        batches.append(current)
+    return batches
+
+def update_embeddings_batch(batch):
+    """Update one batch via update_fdd_chunk_embeddings, retrying with backoff"""
+    client = get_client(STAGING_URL, STAGING_KEY)
+    for attempt in range(UPDATE_MAX_RETRIES):
+        try:
+            status, result = client.request("POST", "/rest/v1/rpc/update_fdd_chunk_embeddings", batch, idempotent=True)
+        except Exception as e:
+            status, result = None, e
+        if status == 200:
+            return result if isinstance(result, int) else len(batch["chunk_ids"])
+        print(f"  Error {status}: {str(result)[:200]}")
+        if attempt < UPDATE_MAX_RETRIES - 1:
+            delay = 2 ** attempt
+            print(f"  ⚠ Batch of {len(batch['chunk_ids'])} failed (attempt {attempt + 1}/{UPDATE_MAX_RETRIES}), retrying in {delay}s")
+            time.sleep(delay)
+    return 0
 
-def update_embeddings_direct(fdd_id, chunks):
-    """Update embeddings one batch at a time via PATCH"""
-    if not chunks:
+def update_embeddings_bulk(chunks):
+    """Update staging embeddings in concurrent, size-bounded RPC batches (see 124-bulk-update-chunk-embeddings.sql)"""
+    batches = plan_update_batches(chunks)
+    if not batches:
         return 0
     
     updated = 0
-    batch_size = 20  # Update 20 at a time
-    
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i:i+batch_size]
-        
-        for chunk in batch:
-            chunk_id = chunk['id']
-            embedding = chunk['embedding']
-            
-            url = f"{STAGING_URL}/rest/v1/fdd_chunks?id=eq.{chunk_id}"
-            result = make_request(url, STAGING_KEY, "PATCH", {"embedding": embedding})
-            
-            if result is not None:
-                updated += 1
-        
-        print(f"  Updated {updated}/{len(chunks)} embeddings...")
+    with ThreadPoolExecutor(max_workers=UPDATE_CONCURRENCY) as executor:
+        futures = [executor.submit(update_embeddings_batch, batch) for batch in batches]
+        for future in as_completed(futures):
+            updated += future.result()
+            print(f"  Updated {updated} embeddings...")
     
     return updated
 
-print("=== Fast Batch Embedding Sync ===\n")
+def sync_fdd_embeddings(fdd_id):
+    """Stream chunks with embeddings from production and update staging page by page"""
+    total = updated = 0
+    for chunks in fetch_all_chunks_with_embeddings(fdd_id):
+        total += len(chunks)
+        updated += update_embeddings_bulk(chunks)
+    return total, updated
 
-for slug, fdd_id in MISSING_FDDS:
-    print(f"=== {slug} (FDD: {fdd_id}) ===")
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Batch-sync embeddings for FDDs whose staging chunks drifted")
+    parser.add_argument("--fdd", action="append", help="Sync this FDD id instead of detecting drift (repeatable)")
+    args = parser.parse_args()
     
-    # Fetch all chunks with embeddings from production
-    chunks = fetch_all_chunks_with_embeddings(fdd_id)
-    print(f"  Total chunks with embeddings: {len(chunks)}")
+    print("=== Fast Batch Embedding Sync ===\n")
     
-    if not chunks:
-        print("  No embeddings to sync")
-        continue
+    for fdd_id in args.fdd or fdds_with_changed_chunks():
+        print(f"=== FDD: {fdd_id} ===")
+        
+        total, updated = sync_fdd_embeddings(fdd_id)
+        print(f"  Total chunks with embeddings: {total}")
+        
+        if not total:
+            print("  No embeddings to sync")
+            continue
+        
+        print(f"  Done! Updated {updated} embeddings\n")
     
-    # Update in staging
-    updated = update_embeddings_direct(fdd_id, chunks)
-    print(f"  Done! Updated {updated} embeddings\n")
+    print("\n=== Sync Complete ===")
 
-print("\n=== Sync Complete ===")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Incremental Production → Staging Sync
+=====================================
+Replaces the clear-and-reinsert approach of sync_data*.py, sync_all_chunks.py
+and sync_embeddings*.py. Nothing in staging is cleared:
+
+- Watermark: rows whose updated_at (or created_at) is past the table's last
+  synced value are read in keyset pages and upserted by primary key
+- Primary-key diff (--id-diff): id lists from both sides find rows missing
+  in staging (upserted) and rows deleted in production (deleted from staging).
+  It pages every id of every table on both sides, so it is opt-in for
+  periodic runs; drift_detector.py --repair finds the same rows from
+  bucket hashes
+
+Tables form an FK dependency graph (task_dag.TaskGraph): independent tables
+sync concurrently, children start once their parents finish. Each table
+streams page by page and is written in row- and byte-bounded batches.
+
+Per-table high-water marks persist in sync_state.json, so a nightly refresh
+only moves what changed. fdd_chunks is synced with its embeddings.
+
+The first run (or --reset) has no watermark and copies every row.
+
+Usage:
+    python3 sync_engine.py
+    python3 sync_engine.py --tables fdds fdd_chunks
+    python3 sync_engine.py --dry-run
+    python3 sync_engine.py --id-diff      # also copy missed rows and apply deletes
+    python3 sync_engine.py --reset
+"""
+
+import os
+import json
+import threading
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from row_remap import UuidRemapper
+from supabase_rest import get_client
+from task_dag import TaskGraph
+
+# Environment variables
+PROD_URL = os.environ.get('SUPABASE_URL', '').rstrip('/')
+PROD_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY', '')
+STAGING_URL = os.environ.get('SUPABASE_URL_STAGING', '').rstrip('/')
+STAGING_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY_STAGING', '')
+
+STATE_FILE = Path(os.getenv("SYNC_STATE_FILE", str(Path(__file__).parent / "sync_state.json")))
+PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+CHUNK_PAGE_SIZE = int(os.getenv("SYNC_CHUNK_PAGE_SIZE", "200"))  # fdd_chunks rows carry ~8 KB of embedding text
+UPSERT_BATCH_SIZE = int(os.getenv("SYNC_UPSERT_BATCH_SIZE", "200"))
+UPSERT_MAX_BATCH_BYTES = int(os.getenv("SYNC_UPSERT_MAX_BATCH_BYTES", "2000000"))
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", "4"))  # tables synced at once
+# Optionally re-read this far behind the watermark, for rows committed late
+# with an earlier updated_at (re-upserting them is harmless). With 0 the next
+# run resumes strictly after the last synced (updated_at, id).
+WATERMARK_LOOKBACK_SECONDS = int(os.getenv("SYNC_WATERMARK_LOOKBACK_SECONDS", "0"))
+ID_FILTER_BATCH = 100  # ids per id=in.(...) filter, keeps URLs short
+
+WATERMARK_COLUMNS = ['updated_at', 'created_at']
+
+# ============================================================================
+# TABLES
+# ============================================================================
+
+# Same grouping as sync_data_v6.py: (table, user UUID columns to remap).
+# The groups also give the FK edges used to order the sync (see table_parents).
+USER_ID_TABLES: List[Tuple[str, List[str]]] = [
+    ('buyer_profiles', ['user_id']),
+    ('franchisor_profiles', ['user_id']),
+    ('franchisor_users', ['user_id']),
+    ('fdd_engagements', ['user_id']),
+    ('fdd_search_queries', ['user_id']),
+    ('fdd_buyer_consents', ['user_id']),
+    ('fdd_franchisescore_consents', ['user_id']),
+    ('engagement_events', ['user_id']),
+    ('notifications', ['user_id']),
+    ('user_notes', ['user_id']),
+]
+
+# franchisor_id references franchisor_profiles, buyer_id buyer_profiles
+FRANCHISOR_ID_TABLES: List[Tuple[str, List[str]]] = [
+    ('franchises', ['franchisor_id']),
+    ('leads', ['franchisor_id', 'buyer_id']),
+    ('lead_invitations', ['franchisor_id', 'buyer_id']),
+    ('lead_fdd_access', ['franchisor_id', 'buyer_id']),
+    ('shared_access', ['franchisor_id', 'shared_with_user_id']),
+    ('closed_deals', ['franchisor_id', 'buyer_id']),
+    ('white_label_settings', ['franchisor_id']),
+]
+
+FRANCHISE_FK_TABLES = ['fdds', 'fdd_buyer_invitations']
+
+FDD_FK_TABLES = ['fdd_chunks', 'fdd_item_page_mappings', 'fdd_question_answers']
+
+STANDALONE_TABLES = ['lender_profiles']
+
+# FKs the groups above do not capture (docs/DATABASE-SCHEMA.md, Key Relationships)
+EXTRA_PARENTS: Dict[str, List[str]] = {
+    'franchisor_users': ['franchises'],
+    'leads': ['franchises'],
+    'lead_invitations': ['franchises'],
+    'lead_fdd_access': ['franchises', 'lead_invitations'],
+    'white_label_settings': ['franchises'],
+    'fdd_engagements': ['fdds'],
+    'fdd_buyer_consents': ['fdds'],
+    'user_notes': ['fdds'],
+    'engagement_events': ['leads'],
+    'closed_deals': ['leads'],
+}
+
+UUID_FIELDS: Dict[str, List[str]] = dict(USER_ID_TABLES + FRANCHISOR_ID_TABLES)
+ALL_TABLES: List[str] = (
+    [t for t, _ in USER_ID_TABLES] + [t for t, _ in FRANCHISOR_ID_TABLES]
+    + FRANCHISE_FK_TABLES + FDD_FK_TABLES + STANDALONE_TABLES
+)
+
+
+def table_parents(table: str) -> Set[str]:
+    """Tables that must be synced before this one"""
+    parents = set(EXTRA_PARENTS.get(table, []))
+    fields = UUID_FIELDS.get(table, [])
+    if 'franchisor_id' in fields:
+        parents.add('franchisor_profiles')
+    if 'buyer_id' in fields:
+        parents.add('buyer_profiles')
+    if table in FRANCHISE_FK_TABLES:
+        parents.add('franchises')
+    if table in FDD_FK_TABLES:
+        parents.add('fdds')
+    parents.discard(table)
+    return parents
+
+
+# Generated columns cannot be written (chunk_tsv: 122-hybrid-chunk-search.sql)
+SKIP_COLUMNS: Dict[str, List[str]] = {
+    'fdd_chunks': ['chunk_tsv'],
+}
+
+PAGE_SIZES: Dict[str, int] = {
+    'fdd_chunks': CHUNK_PAGE_SIZE,
+}
+
+
+# ============================================================================
+# REST
+# ============================================================================
+
+def make_request(base_url: str, key: str, path: str, method: str = 'GET', data=None,
+                 prefer: Optional[str] = None) -> Tuple[int, object]:
+    """Make a PostgREST / Auth request (shared pooled client) and return (status, parsed body)"""
+    return get_client(base_url, key).request(method, path, data, prefer=prefer)
+
+
+def rest_path(table: str, params: List[Tuple[str, str]]) -> str:
+    return f"/rest/v1/{table}?{urllib.parse.urlencode(params, quote_via=urllib.parse.quote, safe=',.()*')}"
+
+
+def get_auth_users(base_url: str, key: str) -> List[Dict]:
+    """All auth users via the Admin API (paged)"""
+    users = []
+    page = 1
+    while True:
+        status, result = make_request(base_url, key, f"/auth/v1/admin/users?page={page}&per_page=1000")
+        if status != 200 or not isinstance(result, dict):
+            break
+        batch = result.get('users', [])
+        users.extend(batch)
+        if len(batch) < 1000:
+            break
+        page += 1
+    return users
+
+
+def build_uuid_map() -> Dict[str, str]:
+    """Production user UUID → staging user UUID, matched by email"""
+    staging_by_email = {u.get('email'): u['id'] for u in get_auth_users(STAGING_URL, STAGING_KEY)}
+    uuid_map = {}
+    for user in get_auth_users(PROD_URL, PROD_KEY):
+        staging_id = staging_by_email.get(user.get('email'))
+        if staging_id:
+            uuid_map[user['id']] = staging_id
+    return uuid_map
+
+
+# ============================================================================
+# READS
+# ============================================================================
+
+def detect_watermark_column(table: str) -> Optional[str]:
+    """First of updated_at / created_at that the production table has"""
+    for column in WATERMARK_COLUMNS:
+        status, _ = make_request(PROD_URL, PROD_KEY, rest_path(table, [('select', column), ('limit', '1')]))
+        if status == 200:
+            return column
+    return None
+
+
+def fetch_changed_rows(table: str, column: str, cursor: Optional[Tuple[str, str]], since: Optional[str],
+                       page_size: int) -> Iterator[List[Dict]]:
+    """
+    Pages of production rows after the (column, id) cursor, or with
+    column >= since when re-reading a lookback window, ordered by (column, id).
+    Keyset pagination: each page starts after the last (column, id) seen,
+    so rows updated mid-scan cannot shift pages the way offsets do.
+    """
+    while True:
+        params = [('select', '*'), ('order', f'{column}.asc,id.asc'), ('limit', str(page_size))]
+        if cursor and not since:
+            value, last_id = cursor
+            params.append(('or', f'({column}.gt."{value}",and({column}.eq."{value}",id.gt.{last_id}))'))
+        elif since:
+            params.append((column, f'gte.{since}'))
+        else:
+            params.append((column, 'not.is.null'))
+
+        status, rows = make_request(PROD_URL, PROD_KEY, rest_path(table, params))
+        if status != 200:
+            raise RuntimeError(f"{table}: read failed ({status}): {str(rows)[:200]}")
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        cursor = (rows[-1][column], rows[-1]['id'])
+        since = None
+
+
+def iter_table_pages(base_url: str, key: str, table: str, select: str = '*',
+                     page_size: int = PAGE_SIZE) -> Iterator[List[Dict]]:
+    """Pages of a whole table, keyset paged on id (select must include id)"""
+    last_id = None
+    while True:
+        params = [('select', select), ('order', 'id.asc'), ('limit', str(page_size))]
+        if last_id:
+            params.append(('id', f'gt.{last_id}'))
+        status, rows = make_request(base_url, key, rest_path(table, params))
+        if status != 200:
+            raise RuntimeError(f"{table}: read failed ({status}): {str(rows)[:200]}")
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['id']
+
+
+def fetch_ids(base_url: str, key: str, table: str, page_size: int = PAGE_SIZE * 5) -> Set[str]:
+    """Every primary key in the table (keyset paged on id)"""
+    ids: Set[str] = set()
+    for rows in iter_table_pages(base_url, key, table, 'id', page_size):
+        ids.update(row['id'] for row in rows)
+    return ids
+
+
+def fetch_rows_by_id(table: str, ids: List[str]) -> Iterator[List[Dict]]:
+    """Production rows for the given ids, ID_FILTER_BATCH at a time"""
+    for i in range(0, len(ids), ID_FILTER_BATCH):
+        batch = ids[i:i + ID_FILTER_BATCH]
+        params = [('select', '*'), ('id', f"in.({','.join(batch)})")]
+        status, rows = make_request(PROD_URL, PROD_KEY, rest_path(table, params))
+        if status != 200:
+            raise RuntimeError(f"{table}: read by id failed ({status}): {str(rows)[:200]}")
+        yield rows
+
+
+# ============================================================================
+# WRITES
+# ============================================================================
+
+def prepare_rows(table: str, rows: List[Dict], uuid_fields: List[str], uuid_map: Dict[str, str]) -> List[Dict]:
+    """Drop unwritable columns and remap user UUIDs to their staging ids (in place, see row_remap.py)"""
+    return UuidRemapper(uuid_map, uuid_fields, SKIP_COLUMNS.get(table, []))(rows)
+
+
+def plan_batches(rows: List[Dict]) -> List[List[Dict]]:
+    """Split rows into requests of at most UPSERT_BATCH_SIZE rows / UPSERT_MAX_BATCH_BYTES of JSON"""
+    batches: List[List[Dict]] = []
+    current: List[Dict] = []
+    current_bytes = 0
+    for row in rows:
+        size = len(json.dumps(row))
+        if current and (len(current) >= UPSERT_BATCH_SIZE or current_bytes + size > UPSERT_MAX_BATCH_BYTES):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(row)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def upsert_rows(table: str, rows: List[Dict]) -> Tuple[int, Optional[str]]:
+    """Insert or update staging rows by primary key"""
+    written = 0
+    for batch in plan_batches(rows):
+        status, result = make_request(
+            STAGING_URL, STAGING_KEY, rest_path(table, [('on_conflict', 'id')]), method='POST',
+            data=batch, prefer='resolution=merge-duplicates,return=minimal'
+        )
+        if status not in [200, 201, 204]:
+            return written, str(result)
+        written += len(batch)
+    return written, None
+
+
+def delete_rows(table: str, ids: List[str]) -> Tuple[int, Optional[str]]:
+    """Delete staging rows by primary key"""
+    deleted = 0
+    for i in range(0, len(ids), ID_FILTER_BATCH):
+        batch = ids[i:i + ID_FILTER_BATCH]
+        status, result = make_request(
+            STAGING_URL, STAGING_KEY, rest_path(table, [('id', f"in.({','.join(batch)})")]),
+            method='DELETE', prefer='return=minimal'
+        )
+        if status not in [200, 204]:
+            return deleted, str(result)
+        deleted += len(batch)
+    return deleted, None
+
+
+# ============================================================================
+# STATE
+# ============================================================================
+
+def load_state() -> Dict:
+    """Watermarks for this production → staging pair (empty if none or for another pair)"""
+    fresh = {'source': PROD_URL, 'target': STAGING_URL, 'tables': {}}
+    if not STATE_FILE.exists():
+        return fresh
+    with open(STATE_FILE, 'r') as f:
+        state = json.load(f)
+    if state.get('source') != PROD_URL or state.get('target') != STAGING_URL:
+        print(f"  ⚠ {STATE_FILE.name} is for {state.get('source')} → {state.get('target')}, starting fresh")
+        return fresh
+    return state
+
+
+_state_lock = threading.Lock()
+
+
+def save_state(state: Dict):
+    """Write the state file atomically (tables finish on several threads; sync_table only changes state under the lock)"""
+    with _state_lock:
+        tmp = STATE_FILE.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(state, f, indent=2)
+        tmp.replace(STATE_FILE)
+
+
+def parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def lookback(watermark: Optional[str]) -> Optional[str]:
+    """Lower bound for the next read when a lookback window is configured"""
+    if not watermark or WATERMARK_LOOKBACK_SECONDS <= 0:
+        return None
+    return (parse_timestamp(watermark) - timedelta(seconds=WATERMARK_LOOKBACK_SECONDS)).isoformat()
+
+
+# ============================================================================
+# SYNC
+# ============================================================================
+
+def sync_table(table: str, state: Dict, uuid_map: Dict[str, str],
+               id_diff: bool = False, dry_run: bool = False) -> Dict:
+    """
+    Upsert changed and missing rows for one table. Returns counts and the
+    staging ids to delete (deleted later, children first).
+    """
+    uuid_fields = UUID_FIELDS.get(table, [])
+    # Worked on as a copy and published under the lock: save_state may be writing the file from another thread
+    with _state_lock:
+        table_state = dict(state['tables'].get(table, {}))
+    column = table_state.get('column') or detect_watermark_column(table)
+    table_state['column'] = column
+    page_size = PAGE_SIZES.get(table, PAGE_SIZE)
+    stats = {'changed': 0, 'missing': 0, 'stale_ids': [], 'column': column, 'error': None}
+
+    # 1. Rows past the watermark (every row when there is no watermark column)
+    seen: Set[str] = set()
+    watermark = table_state.get('watermark')
+    cursor = (watermark, table_state['last_id']) if watermark and table_state.get('last_id') else None
+    if column:
+        pages = fetch_changed_rows(table, column, cursor, lookback(watermark), page_size)
+    else:
+        pages = fetch_rows_by_id(table, sorted(fetch_ids(PROD_URL, PROD_KEY, table)))
+    for rows in pages:
+        seen.update(row['id'] for row in rows)
+        if not dry_run:
+            written, error = upsert_rows(table, prepare_rows(table, rows, uuid_fields, uuid_map))
+            stats['changed'] += written
+            if error:
+                stats['error'] = error
+                return stats
+        else:
+            stats['changed'] += len(rows)
+        # Pages are ordered, so the last row is the new high-water mark
+        if column and rows[-1].get(column):
+            last = rows[-1]
+            if not cursor or (parse_timestamp(last[column]), last['id']) > (parse_timestamp(cursor[0]), cursor[1]):
+                cursor = (last[column], last['id'])
+
+    # 2. Primary-key diff: rows staging lacks (outside the watermark window) and rows gone from production
+    if id_diff:
+        prod_ids = fetch_ids(PROD_URL, PROD_KEY, table)
+        staging_ids = fetch_ids(STAGING_URL, STAGING_KEY, table)
+        missing = sorted(prod_ids - staging_ids - seen)
+        stats['stale_ids'] = sorted(staging_ids - prod_ids)
+        for rows in fetch_rows_by_id(table, missing):
+            if dry_run:
+                stats['missing'] += len(rows)
+                continue
+            written, error = upsert_rows(table, prepare_rows(table, rows, uuid_fields, uuid_map))
+            stats['missing'] += written
+            if error:
+                stats['error'] = error
+                return stats
+
+    if not dry_run:
+        table_state['watermark'], table_state['last_id'] = cursor if cursor else (None, None)
+        table_state['synced_at'] = datetime.now(timezone.utc).isoformat()
+        with _state_lock:
+            state['tables'][table] = table_state
+    return stats
+
+
+def build_sync_graph(tables: List[str], state: Dict, uuid_map: Dict[str, str],
+                     id_diff: bool, dry_run: bool) -> TaskGraph:
+    """
+    One task per table; each task's inputs are its selected parent tables,
+    so independent tables run concurrently and children wait for parents.
+    A task whose parent failed is skipped.
+    """
+    graph = TaskGraph()
+
+    def make_task(table: str, parents: List[str]):
+        def task(**parent_stats):
+            failed = [p for p in parents if parent_stats.get(p) is None]
+            if failed:
+                raise RuntimeError(f"{table}: skipped, parent failed ({', '.join(failed)})")
+            stats = sync_table(table, state, uuid_map, id_diff, dry_run)
+            column = stats['column'] or 'full scan'
+            line = (f"{table}: {stats['changed']} changed, {stats['missing']} missing, "
+                    f"{len(stats['stale_ids'])} stale [{column}]")
+            if stats['error']:
+                raise RuntimeError(f"{line} - FAILED: {stats['error'][:100]}")
+            print(f"  ✓ {line}")
+            if not dry_run:
+                save_state(state)
+            return stats
+        return task
+
+    for table in tables:
+        parents = sorted(table_parents(table) & set(tables))
+        graph.add_task(table, make_task(table, parents), inputs=parents, outputs=[table])
+    return graph
+
+
+def run_sync(tables: Optional[List[str]] = None, reset: bool = False, id_diff: bool = False,
+             dry_run: bool = False, max_workers: int = SYNC_CONCURRENCY) -> bool:
+    """Sync the selected tables parents-first in parallel, then apply deletes children-first"""
+    selected = [t for t in ALL_TABLES if not tables or t in tables]
+    state = load_state()
+    if reset:
+        for table in selected:
+            state['tables'].pop(table, None)
+
+    print("\n--- Mapping user UUIDs by email ---")
+    uuid_map = build_uuid_map()
+    unchanged = sum(1 for prod_id, staging_id in uuid_map.items() if prod_id == staging_id)
+    print(f"  {len(uuid_map)} users matched ({unchanged} with identical UUIDs)")
+
+    print(f"\n--- Upserting changed rows{' (dry run)' if dry_run else ''}, {max_workers} tables at a time ---")
+    graph = build_sync_graph(selected, state, uuid_map, id_diff, dry_run)
+    results = graph.run(max_workers=max_workers)
+    graph.print_report()
+    ok = not any(task.error for task in graph.tasks.values())
+
+    stale = [(t, results[t]['stale_ids']) for t in graph.topological_order() if results.get(t) and results[t]['stale_ids']]
+    if stale and not dry_run:
+        print("\n--- Deleting rows removed from production ---")
+        for table, ids in reversed(stale):
+            deleted, error = delete_rows(table, ids)
+            if error:
+                print(f"  ✗ {table}: {deleted}/{len(ids)} deleted - FAILED: {error[:100]}")
+                ok = False
+            else:
+                print(f"  ✓ {table}: {deleted} deleted")
+
+    return ok
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incremental production → staging sync")
+    parser.add_argument("--tables", nargs="+", help="Only sync these tables")
+    parser.add_argument("--reset", action="store_true", help="Forget watermarks and re-copy every row")
+    parser.add_argument("--id-diff", action="store_true",
+                        help="Also diff primary keys on both sides: copy rows the watermark missed and "
+                             "delete rows removed from production (reads every id; run periodically)")
+    parser.add_argument("--dry-run", action="store_true", help="Count changes without writing")
+    parser.add_argument("--workers", type=int, default=SYNC_CONCURRENCY, help="Tables synced concurrently")
+    args = parser.parse_args()
+
+    if not all([PROD_URL, PROD_KEY, STAGING_URL, STAGING_KEY]):
+        print("ERROR: Missing environment variables")
+        print(f"  SUPABASE_URL: {'SET' if PROD_URL else 'MISSING'}")
+        print(f"  SUPABASE_SERVICE_ROLE_KEY: {'SET' if PROD_KEY else 'MISSING'}")
+        print(f"  SUPABASE_URL_STAGING: {'SET' if STAGING_URL else 'MISSING'}")
+        print(f"  SUPABASE_SERVICE_ROLE_KEY_STAGING: {'SET' if STAGING_KEY else 'MISSING'}")
+        exit(1)
+
+    unknown = set(args.tables or []) - set(ALL_TABLES)
+    if unknown:
+        parser.error(f"Unknown tables: {', '.join(sorted(unknown))}")
+
+    print("=" * 60)
+    print("PRODUCTION TO STAGING INCREMENTAL SYNC")
+    print("=" * 60)
+    print(f"\nProduction: {PROD_URL}")
+    print(f"Staging: {STAGING_URL}")
+    print(f"State: {STATE_FILE}")
+
+    ok = run_sync(args.tables, args.reset, args.id_diff, args.dry_run, args.workers)
+    print(f"\n--- {'Complete' if ok else 'Completed with errors (watermarks not advanced for failed tables)'} ---")
+    if not ok:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Sync / Upload Load Test
+=======================
+Runs each sync and upload path against fake_supabase.py servers (one
+"production", one "staging") seeded with synthetic FDD data, and reports
+rows/second, requests and bytes per path, plus whether staging ended up
+matching production.
+
+Paths:
+- sync_engine          sync_engine.run_sync, first run (copies everything)
+- sync_engine_incr     sync_engine.run_sync again after touching --changed of the chunks
+- sync_data_v7         legacy clear-and-reinsert script (run as a subprocess)
+- sync_all_chunks      checksum drift discovery, then concurrent per-FDD delete + reinsert of fdd_chunks
+- embeddings_bulk      sync_embeddings_batch.py (update_fdd_chunk_embeddings RPC)
+- embeddings_patch     sync_missing_embeddings.py (one PATCH per chunk)
+- upload_to_supabase   upload_to_supabase.upload_franchise (needs supabase-py)
+- store_in_supabase    vertex_complete_pipeline.store_in_supabase (needs the pipeline's dependencies)
+
+--latency-ms adds a fixed delay to every request, to approximate the round
+trip to a hosted project (per-request overhead dominates the legacy paths).
+
+Usage:
+    python3 sync_load_test.py
+    python3 sync_load_test.py --fdds 8 --chunks 600 --latency-ms 20
+    python3 sync_load_test.py --paths embeddings_bulk embeddings_patch --output load_test.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import struct
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fake_supabase import FakeSupabase
+from vector_format import parse_vector
+
+SCRIPTS_DIR = Path(__file__).parent
+EMBEDDING_DIMENSIONS = 768
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+PATHS = ['sync_engine', 'sync_engine_incr', 'sync_data_v7', 'sync_all_chunks',
+         'embeddings_bulk', 'embeddings_patch', 'upload_to_supabase', 'store_in_supabase']
+
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+
+def timestamp(offset_seconds: float) -> str:
+    return (BASE_TIME + timedelta(seconds=offset_seconds)).isoformat()
+
+
+def random_embedding(rng: random.Random) -> str:
+    """pgvector text at full float4 precision, as PostgREST returns it"""
+    values = struct.unpack(f"<{EMBEDDING_DIMENSIONS}f",
+                           struct.pack(f"<{EMBEDDING_DIMENSIONS}f", *(rng.uniform(-0.1, 0.1) for _ in range(EMBEDDING_DIMENSIONS))))
+    return '[' + ','.join(f"{v:.9g}" for v in values) + ']'
+
+
+def seed_production(prod: FakeSupabase, n_fdds: int, chunks_per_fdd: int, n_users: int, seed: int = 0) -> Dict:
+    """Users, profiles, franchises, fdds, leads and embedded fdd_chunks"""
+    rng = random.Random(seed)
+    users = [prod.create_user(f"user{i}@example.com", str(uuid.UUID(int=rng.getrandbits(128))))
+             for i in range(n_users)]
+    buyer_profiles = [{'id': str(uuid.uuid4()), 'user_id': u['id'], 'updated_at': timestamp(i)}
+                      for i, u in enumerate(users)]
+    franchises = [{'id': str(uuid.uuid4()), 'name': f"Franchise {i}", 'updated_at': timestamp(i)} for i in range(n_fdds)]
+    fdds = [{'id': str(uuid.uuid4()), 'franchise_id': f['id'], 'updated_at': timestamp(i)} for i, f in enumerate(franchises)]
+    leads = [{'id': str(uuid.uuid4()), 'franchise_id': rng.choice(franchises)['id'],
+              'buyer_id': rng.choice(users)['id'], 'updated_at': timestamp(i)} for i in range(n_users * 2)]
+    chunks = []
+    for fdd_index, fdd in enumerate(fdds):
+        for chunk_index in range(chunks_per_fdd):
+            chunks.append({
+                'id': str(uuid.uuid4()),
+                'fdd_id': fdd['id'],
+                'chunk_index': chunk_index,
+                'item_number': chunk_index % 23 + 1,
+                'chunk_text': f"Item {chunk_index % 23 + 1} text " * 60,
+                'page_number': chunk_index // 2 + 1,
+                'start_page': chunk_index // 2 + 1,
+                'end_page': chunk_index // 2 + 1,
+                'token_count': 600,
+                'embedding': random_embedding(rng),
+                'metadata': {'franchise_name': f"Franchise {fdd_index}"},
+                'updated_at': timestamp(fdd_index * chunks_per_fdd + chunk_index),
+            })
+
+    for table, rows in [('buyer_profiles', buyer_profiles), ('franchises', franchises), ('fdds', fdds),
+                        ('leads', leads), ('fdd_chunks', chunks)]:
+        prod.insert(table, rows)
+    return {'users': users, 'fdds': fdds, 'franchises': franchises}
+
+
+def copy_chunks_without_embeddings(prod: FakeSupabase, staging: FakeSupabase):
+    """Staging state the embedding sync scripts start from"""
+    rows = [{k: v for k, v in c.items() if k != 'chunk_tsv'} for c in prod.rows('fdd_chunks')]
+    staging.insert('fdd_chunks', [{**c, 'embedding': None} for c in rows])
+
+
+# ============================================================================
+# HARNESS
+# ============================================================================
+
+def point_module(module, prod: FakeSupabase, staging: FakeSupabase):
+    """Aim a sync script's module-level URL / key constants at the fake servers"""
+    for name, value in [('PROD_URL', prod.url), ('PROD_KEY', prod.key),
+                        ('STAGING_URL', staging.url), ('STAGING_KEY', staging.key)]:
+        if hasattr(module, name):
+            setattr(module, name, value)
+
+
+def fake_env(prod: FakeSupabase, staging: FakeSupabase) -> Dict[str, str]:
+    return {
+        'SUPABASE_URL': prod.url, 'SUPABASE_SERVICE_ROLE_KEY': prod.key,
+        'SUPABASE_URL_STAGING': staging.url, 'SUPABASE_SERVICE_ROLE_KEY_STAGING': staging.key,
+    }
+
+
+def run_path(name: str, func: Callable[[], int], servers: List[FakeSupabase], verbose: bool,
+             check: Callable[[], Tuple[bool, str]]) -> Dict:
+    """Time one path; func returns the number of rows it wrote"""
+    for server in servers:
+        server.reset_stats()
+    output = io.StringIO()
+    started = time.perf_counter()
+    error = None
+    rows = 0
+    try:
+        if verbose:
+            rows = func()
+        else:
+            with redirect_stdout(output):
+                rows = func()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - started
+
+    consistent, detail = check() if not error else (False, error)
+    return {
+        'path': name,
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else 0.0,
+        'requests': sum(s.request_count for s in servers),
+        'mb_transferred': sum(s.stats['bytes_in'] + s.stats['bytes_out'] for s in servers) / 1e6,
+        'consistent': consistent,
+        'detail': detail,
+    }
+
+
+def same_vector(a, b) -> bool:
+    """Equal at float4 resolution (scripts may re-format pgvector text)"""
+    if a is None or b is None:
+        return a is b
+    x, y = parse_vector(a), parse_vector(b)
+    return len(x) == len(y) and all(abs(p - q) <= 1e-6 * max(1.0, abs(p)) for p, q in zip(x, y))
+
+
+def chunks_match(prod: FakeSupabase, staging: FakeSupabase, with_embeddings: bool = True) -> Tuple[bool, str]:
+    prod_chunks = {c['id']: c for c in prod.rows('fdd_chunks')}
+    staging_chunks = {c['id']: c for c in staging.rows('fdd_chunks')}
+    missing = len(set(prod_chunks) - set(staging_chunks))
+    wrong = sum(1 for i, c in staging_chunks.items()
+                if with_embeddings and i in prod_chunks
+                and not same_vector(c.get('embedding'), prod_chunks[i].get('embedding')))
+    if missing or wrong:
+        return False, f"{missing} chunks missing, {wrong} embeddings differ"
+    return True, f"{len(staging_chunks)} chunks"
+
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+def scenario_sync_engine(args, prod: FakeSupabase, incremental: bool) -> Dict:
+    import sync_engine
+
+    with FakeSupabase(latency=args.latency) as staging, tempfile.TemporaryDirectory() as tmp:
+        point_module(sync_engine, prod, staging)
+        sync_engine.STATE_FILE = Path(tmp) / "sync_state.json"
+
+        def tables_written() -> int:
+            return sum(staging.count(t) for t in sync_engine.ALL_TABLES)
+
+        if not incremental:
+            return run_path('sync_engine', lambda: (sync_engine.run_sync(), tables_written())[1],
+                            [prod, staging], args.verbose, lambda: chunks_match(prod, staging))
+
+        with redirect_stdout(io.StringIO()):
+            sync_engine.run_sync()
+        # Touch a fraction of the chunks (re-embedded) after the first sync
+        rng = random.Random(1)
+        chunks = prod.rows('fdd_chunks')
+        touched = rng.sample(chunks, max(1, int(len(chunks) * args.changed)))
+        for i, chunk in enumerate(touched):
+            prod.update('fdd_chunks', [('id', f"eq.{chunk['id']}")],
+                        {'embedding': random_embedding(rng), 'updated_at': timestamp(10 ** 7 + i)})
+        return run_path('sync_engine_incr', lambda: (sync_engine.run_sync(), len(touched))[1],
+                        [prod, staging], args.verbose, lambda: chunks_match(prod, staging))
+
+
+def scenario_sync_data_v7(args, prod: FakeSupabase) -> Dict:
+    with FakeSupabase(latency=args.latency) as staging:
+        def run() -> int:
+            result = subprocess.run([sys.executable, str(SCRIPTS_DIR / "sync_data_v7.py")],
+                                    env={**os.environ, **fake_env(prod, staging)},
+                                    capture_output=not args.verbose, text=True, timeout=3600)
+            if result.returncode != 0:
+                raise RuntimeError(f"sync_data_v7.py exited {result.returncode}: {(result.stderr or '')[-200:]}")
+            return sum(staging.count(t) for t in ['buyer_profiles', 'franchises', 'fdds', 'leads', 'fdd_chunks'])
+
+        # v7 skips embeddings, so only row presence is checked
+        return run_path('sync_data_v7', run, [prod, staging], args.verbose,
+                        lambda: chunks_match(prod, staging, with_embeddings=False))
+
+
+def scenario_sync_all_chunks(args, prod: FakeSupabase) -> Dict:
+    import sync_all_chunks
+
+    with FakeSupabase(latency=args.latency) as staging:
+        point_module(sync_all_chunks, prod, staging)
+        return run_path('sync_all_chunks', sync_all_chunks.run_chunk_sync, [prod, staging], args.verbose,
+                        lambda: chunks_match(prod, staging))
+
+
+def scenario_embeddings(args, prod: FakeSupabase, fdds: List[Dict], bulk: bool) -> Dict:
+    with FakeSupabase(latency=args.latency) as staging:
+        copy_chunks_without_embeddings(prod, staging)
+        if bulk:
+            import sync_embeddings_batch as module
+
+            def run() -> int:
+                return sum(module.sync_fdd_embeddings(fdd['id'])[1] for fdd in fdds)
+        else:
+            import sync_missing_embeddings as module
+
+            def run() -> int:
+                return sum(module.sync_embeddings_for_fdd(fdd['id'][:8], fdd['id']) for fdd in fdds)
+
+        point_module(module, prod, staging)
+        return run_path('embeddings_bulk' if bulk else 'embeddings_patch', run, [prod, staging], args.verbose,
+                        lambda: chunks_match(prod, staging))
+
+
+def analysis_documents(n: int) -> List[Dict]:
+    return [{
+        'franchise_name': f"Load Test Franchise {i}",
+        'description': "Synthetic analysis for load testing",
+        'industry': "Services",
+        'franchise_score': 400 + i % 100,
+        'franchise_score_breakdown': {},
+        'opportunities': [],
+        'concerns': [],
+        'states': ['CA', 'TX'],
+    } for i in range(n)]
+
+
+def scenario_upload(args, name: str) -> Optional[Dict]:
+    try:
+        if name == 'upload_to_supabase':
+            from upload_to_supabase import upload_franchise
+        else:
+            import vertex_complete_pipeline
+    except ImportError as e:
+        print(f"  ⚠ {name}: skipped ({e})")
+        return None
+
+    documents = analysis_documents(args.uploads)
+    with FakeSupabase(latency=args.latency) as target, tempfile.TemporaryDirectory() as tmp:
+        if name == 'upload_to_supabase':
+            paths = []
+            for i, doc in enumerate(documents):
+                path = Path(tmp) / f"analysis_{i}.json"
+                path.write_text(json.dumps(doc))
+                paths.append(path)
+
+            def run() -> int:
+                for path in paths:
+                    upload_franchise(str(path), target.url, target.key)
+                return len(paths)
+        else:
+            vertex_complete_pipeline.SUPABASE_URL = target.url
+            vertex_complete_pipeline.SUPABASE_KEY = target.key
+
+            def run() -> int:
+                return sum(1 for doc in documents
+                           if vertex_complete_pipeline.store_in_supabase(doc, doc['franchise_name']))
+
+        def check() -> Tuple[bool, str]:
+            count = target.count('franchises')
+            return count == len(documents), f"{count}/{len(documents)} franchises"
+
+        return run_path(name, run, [target], args.verbose, check)
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def print_results(results: List[Dict]):
+    print(f"\n{'='*88}")
+    print("SYNC / UPLOAD LOAD TEST")
+    print(f"{'='*88}\n")
+    print(f"  {'path':<20} {'rows':>7} {'seconds':>8} {'rows/s':>9} {'requests':>9} {'MB':>7}  result")
+    for r in results:
+        mark = '✓' if r['consistent'] else '✗'
+        print(f"  {r['path']:<20} {r['rows']:>7} {r['seconds']:>8.2f} {r['rows_per_second']:>9.0f} "
+              f"{r['requests']:>9} {r['mb_transferred']:>7.1f}  {mark} {r['detail']}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load-test sync and upload paths against a fake Supabase")
+    parser.add_argument("--fdds", type=int, default=4)
+    parser.add_argument("--chunks", type=int, default=500, help="Chunks per FDD")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--uploads", type=int, default=50, help="Analyses for the upload paths")
+    parser.add_argument("--changed", type=float, default=0.01, help="Fraction of chunks touched before sync_engine_incr")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every fake request")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=PATHS)
+    parser.add_argument("--verbose", action="store_true", help="Show each script's own output")
+    parser.add_argument("--output", help="Also write results to this JSON file")
+    args = parser.parse_args()
+    args.latency = args.latency_ms / 1000
+
+    print(f"Seeding production: {args.fdds} FDDs × {args.chunks} chunks, {args.users} users...")
+    with FakeSupabase(latency=args.latency) as prod:
+        seeded = seed_production(prod, args.fdds, args.chunks, args.users)
+
+        results = []
+        for path in args.paths:
+            print(f"  Running {path}...")
+            if path in ('sync_engine', 'sync_engine_incr'):
+                result = scenario_sync_engine(args, prod, incremental=path == 'sync_engine_incr')
+            elif path == 'sync_data_v7':
+                result = scenario_sync_data_v7(args, prod)
+            elif path == 'sync_all_chunks':
+                result = scenario_sync_all_chunks(args, prod)
+            elif path in ('embeddings_bulk', 'embeddings_patch'):
+                result = scenario_embeddings(args, prod, seeded['fdds'], bulk=path == 'embeddings_bulk')
+            else:
+                result = scenario_upload(args, path)
+            if result:
+                results.append(result)
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
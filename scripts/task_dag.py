@@ -0,0 +1,212 @@
+"""
+Task DAG Scheduler
+==================
+Small dependency-aware scheduler for the FDD pipelines. Each task declares
+the artifacts it reads (inputs) and writes (outputs); edges are derived from
+those names. Independent tasks run concurrently on a thread pool, per-task
+timings are recorded, and the critical path can be reported after a run.
+
+A subset of tasks can be re-run: the scheduler recomputes only those tasks
+and their transitive dependents, reading every other input from the
+artifacts passed in (e.g. previously saved Item analyses).
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+
+class Task:
+    """
+    A node in the DAG.
+
+    func receives the input artifacts as keyword arguments (artifact names
+    must be valid identifiers). A single-output task returns the value; a
+    multi-output task returns a dict keyed by output name.
+    """
+
+    def __init__(self, name: str, func: Callable[..., Any], inputs: List[str], outputs: List[str]):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+class TaskGraph:
+    """Collection of tasks with artifact-based dependencies"""
+
+    def __init__(self):
+        self.tasks: Dict[str, Task] = {}
+        self.producers: Dict[str, str] = {}  # artifact name -> task name
+        self.wall_time = 0.0
+
+    def add_task(self, name: str, func: Callable[..., Any], inputs: Iterable[str], outputs: Iterable[str]) -> Task:
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        task = Task(name, func, list(inputs), list(outputs))
+        for artifact in task.outputs:
+            if artifact in self.producers:
+                raise ValueError(f"Artifact '{artifact}' produced by both {self.producers[artifact]} and {name}")
+            self.producers[artifact] = name
+        self.tasks[name] = task
+        return task
+
+    # ------------------------------------------------------------------
+    # Graph structure
+    # ------------------------------------------------------------------
+
+    def upstream(self, name: str) -> Set[str]:
+        """Tasks that produce this task's inputs (direct dependencies)"""
+        return {self.producers[a] for a in self.tasks[name].inputs if a in self.producers}
+
+    def downstream(self, name: str) -> Set[str]:
+        """Tasks that consume this task's outputs (direct dependents)"""
+        outputs = set(self.tasks[name].outputs)
+        return {t.name for t in self.tasks.values() if outputs.intersection(t.inputs)}
+
+    def dependents(self, names: Iterable[str]) -> Set[str]:
+        """Given tasks plus everything transitively downstream of them"""
+        result = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name in result:
+                continue
+            if name not in self.tasks:
+                raise KeyError(f"Unknown task: {name}")
+            result.add(name)
+            stack.extend(self.downstream(name))
+        return result
+
+    def topological_order(self) -> List[str]:
+        """Task names in dependency order (raises on cycles)"""
+        remaining = {name: set(self.upstream(name)) for name in self.tasks}
+        order = []
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise ValueError(f"Cycle detected among tasks: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def run(self, artifacts: Optional[Dict[str, Any]] = None, rerun: Optional[Iterable[str]] = None,
+            max_workers: int = 4) -> Dict[str, Any]:
+        """
+        Execute the graph and return the artifact store.
+
+        artifacts: pre-existing artifacts (source inputs and, for re-runs,
+                   previously computed outputs).
+        rerun:     task names to recompute; only they and their dependents
+                   run. Defaults to every task.
+
+        A task whose inputs include a missing artifact (e.g. an Item that
+        was not found in the PDF) still runs and receives None for it. A
+        failed task records its error and its outputs are set to None.
+        """
+        store = dict(artifacts or {})
+        selected = self.dependents(rerun) if rerun is not None else set(self.tasks)
+        self.topological_order()  # validate acyclic before starting
+
+        for task in self.tasks.values():
+            task.started_at = task.finished_at = None
+            task.error = None
+        for name in selected:
+            for artifact in self.tasks[name].outputs:
+                store.pop(artifact, None)
+
+        pending_deps = {name: self.upstream(name) & selected for name in selected}
+        done_tasks: Set[str] = set()
+        started = time.monotonic()
+
+        def execute(task: Task):
+            kwargs = {artifact: store.get(artifact) for artifact in task.inputs}
+            task.started_at = time.monotonic()
+            try:
+                result = task.func(**kwargs)
+                if len(task.outputs) == 1:
+                    return {task.outputs[0]: result}
+                return result or {}
+            except Exception as e:
+                task.error = str(e)
+                print(f"  ✗ Task {task.name} failed: {e}")
+                return {artifact: None for artifact in task.outputs}
+            finally:
+                task.finished_at = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            running = {}
+            while len(done_tasks) < len(selected):
+                for name in sorted(selected - done_tasks - set(running.values())):
+                    if pending_deps[name] <= done_tasks:
+                        running[pool.submit(execute, self.tasks[name])] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    for artifact in self.tasks[name].outputs:
+                        store[artifact] = future.result().get(artifact)
+                    done_tasks.add(name)
+
+        self.wall_time = time.monotonic() - started
+        return store
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def critical_path(self) -> List[str]:
+        """Longest chain of executed tasks by measured duration"""
+        best: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name in self.topological_order():
+            task = self.tasks[name]
+            if task.started_at is None:
+                continue
+            upstream = [u for u in self.upstream(name) if u in best]
+            parent = max(upstream, key=lambda u: best[u]) if upstream else None
+            best[name] = task.duration + (best[parent] if parent else 0.0)
+            previous[name] = parent
+
+        if not best:
+            return []
+        path = []
+        node: Optional[str] = max(best, key=lambda n: best[n])
+        while node:
+            path.append(node)
+            node = previous[node]
+        return list(reversed(path))
+
+    def print_report(self):
+        """Print per-task timings and the critical path of the last run"""
+        executed = [t for t in self.tasks.values() if t.started_at is not None]
+        if not executed:
+            print("  No tasks executed")
+            return
+        busy_time = sum(t.duration for t in executed)
+        path = self.critical_path()
+        path_time = sum(self.tasks[n].duration for n in path)
+        failed = [t.name for t in executed if t.error]
+
+        print(f"\n  DAG: {len(executed)} tasks, wall time {self.wall_time:.1f}s, "
+              f"summed task time {busy_time:.1f}s")
+        print(f"  Critical path ({path_time:.1f}s): {' → '.join(path)}")
+        for name in path:
+            print(f"    {name:<20} {self.tasks[name].duration:6.1f}s")
+        if failed:
+            print(f"  ⚠ Failed tasks: {', '.join(failed)}")
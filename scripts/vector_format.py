@@ -0,0 +1,108 @@
+"""
+Vector Wire Format
+==================
+Shared serialization for embedding vectors sent to Supabase.
+
+json.dumps prints every float with full repr precision (~17-20 chars per
+value), although pgvector stores float4 (~7 significant digits). Writing
+vectors as pgvector text with bounded precision ("[0.0123457,-0.0456789,...]")
+halves the payload and is accepted anywhere PostgREST or SQL expects a
+vector. That rounding is only for vectors computed locally: a vector copied
+from another database is passed through as stored (copy_vector_text), since
+re-rounding float4 values changes them. Base64 float32 is provided for compact local storage and transport
+between scripts; it is not a format PostgREST can ingest directly.
+
+Benchmark:
+    python3 vector_format.py [--dim 768] [--count 2000]
+"""
+
+import base64
+import json
+import struct
+from functools import lru_cache
+from typing import List, Sequence, Union
+
+VECTOR_PRECISION = 7  # significant digits - float4 resolution
+
+Vector = Union[Sequence[float], str]
+
+
+@lru_cache(maxsize=8)
+def _text_template(dim: int, precision: int) -> str:
+    return "[" + ",".join([f"%.{precision}g"] * dim) + "]"
+
+
+def parse_vector(value: Vector) -> List[float]:
+    """Vector as a list of floats (accepts a list or pgvector text as returned by PostgREST)"""
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value)
+
+
+def to_pgvector_text(value: Vector, precision: int = VECTOR_PRECISION) -> str:
+    """pgvector text literal with bounded precision"""
+    values = parse_vector(value) if isinstance(value, str) else value
+    return _text_template(len(values), precision) % tuple(values)
+
+
+def copy_vector_text(value: Vector) -> str:
+    """pgvector text for a vector read from the database, unchanged (no re-rounding)"""
+    return value if isinstance(value, str) else json.dumps(list(value), separators=(",", ":"))
+
+
+def to_base64_f32(value: Vector) -> str:
+    """Base64 of the little-endian float32 bytes"""
+    values = parse_vector(value) if isinstance(value, str) else value
+    return base64.b64encode(struct.pack(f"<{len(values)}f", *values)).decode("ascii")
+
+
+def from_base64_f32(encoded: str) -> List[float]:
+    """Inverse of to_base64_f32"""
+    raw = base64.b64decode(encoded)
+    return list(struct.unpack(f"<{len(raw) // 4}f", raw))
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark(dim: int = 768, count: int = 2000):
+    """Compare payload size, encode time and round-trip error of each format"""
+    import random
+    import time
+
+    random.seed(0)
+    vectors = [[random.gauss(0, 0.05) for _ in range(dim)] for _ in range(count)]
+
+    formats = [
+        ("json floats (repr)", lambda v: json.dumps(v), lambda s: json.loads(s)),
+        (f"pgvector text {VECTOR_PRECISION}g", to_pgvector_text, parse_vector),
+        ("pgvector text 6g", lambda v: to_pgvector_text(v, 6), parse_vector),
+        ("base64 float32", to_base64_f32, from_base64_f32),
+    ]
+
+    print(f"Encoding {count} x {dim}-dim vectors\n")
+    print(f"  {'format':<22} {'bytes/vector':>12} {'vs json':>8} {'encode µs':>10} {'max rel err':>12}")
+    baseline = None
+    for name, encode, decode in formats:
+        started = time.perf_counter()
+        encoded = [encode(v) for v in vectors]
+        elapsed = time.perf_counter() - started
+        size = sum(len(e) for e in encoded) / count
+        baseline = baseline or size
+        worst = 0.0
+        for original, enc in zip(vectors[:100], encoded[:100]):
+            for a, b in zip(original, decode(enc)):
+                if a:
+                    worst = max(worst, abs(a - b) / abs(a))
+        print(f"  {name:<22} {size:>12.0f} {baseline / size:>7.2f}x {elapsed / count * 1e6:>10.1f} {worst:>12.2e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark embedding wire formats")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--count", type=int, default=2000)
+    args = parser.parse_args()
+    benchmark(args.dim, args.count)
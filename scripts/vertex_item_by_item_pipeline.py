@@ -25,6 +25,8 @@ import requests
 from supabase import create_client, Client
 import pdfplumber
 import anthropic # Import anthropic for Claude API
+from batch_prediction import get_batch_backend, make_request, run_batch_job, DEFAULT_POLL_INTERVAL
+from task_dag import TaskGraph
 
 load_dotenv()
 
@@ -51,6 +53,9 @@ MODEL_LOCATION = os.getenv("MODEL_LOCATION", "us-central1")
 API_ENDPOINT = f"https://{MODEL_LOCATION}-aiplatform.googleapis.com/v1/projects/{PROJECT_ID}/locations/{MODEL_LOCATION}/publishers/google/models/gemini-2.5-flash-lite:generateContent"
 MODEL_NAME = "gemini-2.5-flash-lite"
 
+# Max Item analyses (and other independent DAG tasks) running at once
+ITEM_CONCURRENCY = int(os.getenv("ITEM_CONCURRENCY", "6"))
+
 # ============================================================================
 # STEP 1: PDF TEXT EXTRACTION
 # ============================================================================
@@ -76,9 +81,21 @@ def clean_text(text: str) -> str:
 
 def extract_pdf_text(pdf_path: str) -> str:
     """Extract complete text from PDF using pdfplumber"""
+    full_text, _ = extract_pdf_text_with_pages(pdf_path)
+    return full_text
+
+
+def extract_pdf_text_with_pages(pdf_path: str) -> Tuple[str, List[int]]:
+    """
+    Extract complete text from PDF using pdfplumber, recording where each page
+    starts. page_starts[i] is the character offset of page i+1 in full_text
+    (pages without text start where the next page does).
+    """
     print(f"Extracting text from PDF using pdfplumber...")
     
-    full_text = ""
+    page_texts = []
+    page_starts = []
+    text_length = 0
     
     try:
         with pdfplumber.open(pdf_path) as pdf:
@@ -86,16 +103,19 @@ def extract_pdf_text(pdf_path: str) -> str:
             print(f"Processing {num_pages} pages...")
             
             for page_num, page in enumerate(pdf.pages):
+                page_starts.append(text_length)
                 page_text = page.extract_text()
                 if page_text:
-                    page_text = clean_text(page_text)
-                    full_text += page_text + "\n\n"
+                    page_text = clean_text(page_text) + "\n\n"
+                    page_texts.append(page_text)
+                    text_length += len(page_text)
                 
                 if (page_num + 1) % 100 == 0:
                     print(f"  Processed {page_num + 1}/{num_pages} pages...")
         
+        full_text = "".join(page_texts)
         print(f"✓ Extracted {len(full_text):,} characters from {num_pages} pages")
-        return full_text
+        return full_text, page_starts
         
     except Exception as e:
         raise Exception(f"PDF extraction failed: {str(e)}")
@@ -2826,22 +2846,27 @@ def synthesize_analysis(combined_data: Dict) -> Dict:
     - considerations (array with citations)
     - analytical_summary (comprehensive analysis)
     """
-    global SYNTHESIS_API  # Required to modify module-level variable
+    synthesis = generate_synthesis(combined_data)
+    if not synthesis:
+        return {}
     
-    print("\nSynthesizing final analysis (FranchiseScore™, strengths, considerations, summary)...")
+    # CRITICAL: Validate and fix scores based on the methodology BEFORE returning
+    synthesis = validate_and_fix_scores(combined_data, synthesis)
     
-    # Pass the combined_data object to the prompt template
-    synthesis_prompt = SYNTHESIS_PROMPT_TEMPLATE.replace(
-        "{extracted_data}",
-        json.dumps(combined_data, indent=2) # Use indent=2 for readability in the prompt
-    )
+    print("  ✓ Generated FranchiseScore™ (0-600), strengths, considerations, and summary")
+    return synthesis
+
+
+def call_synthesis_model(prompt: str, max_tokens: int = 16000) -> Optional[str]:
+    """Call the configured synthesis API (Claude with Gemini fallback)"""
+    global SYNTHESIS_API  # Required to modify module-level variable
     
     response = None
     # Call the configured API for synthesis
     if SYNTHESIS_API == "claude" and CLAUDE_API_KEY:
         try:
             # Use the updated call_claude_api function
-            response = call_claude_api(synthesis_prompt, max_tokens=16000)
+            response = call_claude_api(prompt, max_tokens=max_tokens)
             if response:
                 print("  ✓ Claude API call successful")
             else:
@@ -2854,12 +2879,109 @@ def synthesize_analysis(combined_data: Dict) -> Dict:
     # Default or fallback to Gemini
     if SYNTHESIS_API == "gemini" or response is None: 
         print("  Calling Gemini API for synthesis...")
-        # Use a generous max_tokens for synthesis, as it's complex.
-        response = call_gemini_api(synthesis_prompt, max_tokens=16000) 
+        response = call_gemini_api(prompt, max_tokens=max_tokens) 
         if not response:
             print("  ✗ Gemini API call failed for synthesis")
-            return {}
+            return None
         print("  ✓ Gemini API call successful")
+    
+    return response
+
+
+# ============================================================================
+# SYNTHESIS INPUT PROJECTION
+# ============================================================================
+#
+# combined_data repeats several Item analyses at the top level (revenue_data,
+# support_training, renewal_termination, investment_breakdown duplicate
+# Items 19, 11, 17 and 7) and carries every null field. The projection keeps
+# the scalar summary fields once, the raw Item analyses once (optionally only
+# the Items a dimension needs), drops empty values and serializes without
+# whitespace.
+
+SYNTHESIS_SUMMARY_FIELDS = (
+    "franchise_name", "description", "industry", "years_in_franchising",
+    "initial_investment_low", "initial_investment_high", "initial_investment_midpoint",
+    "franchise_fee", "royalty_fee", "marketing_fee", "royalty_fee_percentage",
+    "marketing_fee_percentage", "total_ongoing_fees_percentage",
+    "has_item19", "average_revenue", "median_revenue",
+    "total_units", "franchised_units", "company_owned_units",
+    "units_opened_last_year", "units_closed_last_year",
+)
+
+_token_encoding = None
+_token_encoding_loaded = False
+
+
+def _get_token_encoding():
+    """cl100k_base on first use, or None if tiktoken is missing or can't load it (e.g. offline)"""
+    global _token_encoding, _token_encoding_loaded
+    if not _token_encoding_loaded:
+        _token_encoding_loaded = True
+        try:
+            import tiktoken
+            _token_encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"⚠ tiktoken unavailable ({type(e).__name__}), estimating ~4 chars/token")
+            _token_encoding = None
+    return _token_encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate prompt tokens (cl100k_base if tiktoken can load it, else ~4 chars/token)"""
+    encoding = _get_token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4
+
+
+def prune_empty(value):
+    """Recursively drop None, empty strings, empty lists and empty dicts"""
+    if isinstance(value, dict):
+        pruned = {k: prune_empty(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        pruned = [prune_empty(v) for v in value]
+        return [v for v in pruned if v not in (None, "", [], {})]
+    return value
+
+
+def project_synthesis_payload(combined_data: Dict, item_nums: Optional[List[int]] = None) -> Dict:
+    """Minimal synthesis input: summary fields plus the raw analyses of the selected Items"""
+    all_items = combined_data.get("all_items") or {}
+    selected = sorted(all_items) if item_nums is None else [n for n in item_nums if n in all_items]
+    return prune_empty({
+        "summary": {field: combined_data.get(field) for field in SYNTHESIS_SUMMARY_FIELDS},
+        "items": {str(n): all_items[n] for n in selected},
+    })
+
+
+def compact_json(data) -> str:
+    """Whitespace-free JSON for prompts"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def report_synthesis_input(label: str, before: str, after: str):
+    """Print input token counts for the legacy vs projected synthesis payload"""
+    before_tokens = estimate_tokens(before)
+    after_tokens = estimate_tokens(after)
+    saved = (1 - after_tokens / before_tokens) * 100 if before_tokens else 0
+    print(f"  [TOKENS] {label} input: {before_tokens:,} → {after_tokens:,} tokens ({saved:.0f}% smaller)")
+
+
+def generate_synthesis(combined_data: Dict) -> Dict:
+    """Call the synthesis model and parse its JSON (scores are NOT yet validated)"""
+    print("\nSynthesizing final analysis (FranchiseScore™, strengths, considerations, summary)...")
+    
+    # Project combined_data down to the fields synthesis needs
+    extracted_data = compact_json(project_synthesis_payload(combined_data))
+    report_synthesis_input("Synthesis", json.dumps(combined_data, indent=2), extracted_data)
+    synthesis_prompt = SYNTHESIS_PROMPT_TEMPLATE.replace("{extracted_data}", extracted_data)
+    
+    # Use a generous max_tokens for synthesis, as it's complex.
+    response = call_synthesis_model(synthesis_prompt, max_tokens=16000)
+    if not response:
+        return {}
 
     # Save raw response for debugging purposes
     try:
@@ -2884,40 +3006,163 @@ def synthesize_analysis(combined_data: Dict) -> Dict:
         print("  [DEBUG] Please check synthesis_debug.txt for raw output.")
         return {}
     
-    # CRITICAL: Validate and fix scores based on the methodology BEFORE returning
-    synthesis = validate_and_fix_scores(combined_data, synthesis)
-    
-    print("  ✓ Generated FranchiseScore™ (0-600), strengths, considerations, and summary")
     return synthesis
 
 
+# ============================================================================
+# PER-DIMENSION SYNTHESIS (INCREMENTAL RE-SYNTHESIS)
+# ============================================================================
+#
+# Each FranchiseScore™ dimension only depends on a few Items. When Items are
+# re-analyzed, only the dimensions that read them are re-synthesized and the
+# results are merged into the existing analysis.json. Prompts are sliced from
+# SYNTHESIS_PROMPT_TEMPLATE so the rubric stays defined in one place.
+
+DIMENSION_ITEM_INPUTS = {
+    "financial_transparency": [5, 6, 7, 19],
+    "system_strength": [1, 3, 4, 20],
+    "franchisee_support": [11, 12],
+    "business_foundation": [2, 19, 20],
+}
+
+DIMENSION_METRICS = {
+    "financial_transparency": [("Item 19 Quality", 90), ("Investment Clarity", 30), ("Fee Structure Transparency", 30)],
+    "system_strength": [("System Growth Pattern", 60), ("Franchisor Longevity", 48), ("Clean Record", 42)],
+    "franchisee_support": [("Training Program Quality", 60), ("Operational Support", 48), ("Territory Protection", 42)],
+    "business_foundation": [("Management Experience", 48), ("Item 19 Performance Indicators", 72), ("System Performance", 30)],
+}
+
+DIMENSION_SECTION_HEADINGS = {
+    "financial_transparency": "## 1. FINANCIAL TRANSPARENCY",
+    "system_strength": "## 2. SYSTEM STRENGTH",
+    "franchisee_support": "## 3. FRANCHISEE SUPPORT",
+    "business_foundation": "## 4. BUSINESS FOUNDATION",
+}
+
+
+def dimensions_for_items(item_nums: List[int]) -> List[str]:
+    """Dimensions whose scores depend on any of the given Items"""
+    return [dim for dim, items in DIMENSION_ITEM_INPUTS.items() if set(items) & set(item_nums)]
+
+
+def _template_slice(start_marker: str, end_marker: str) -> str:
+    start = SYNTHESIS_PROMPT_TEMPLATE.index(start_marker)
+    end = SYNTHESIS_PROMPT_TEMPLATE.index(end_marker, start)
+    return SYNTHESIS_PROMPT_TEMPLATE[start:end].strip()
+
+
+def build_dimension_prompt(dimension: str, dimension_data: Dict) -> str:
+    """Synthesis prompt for a single scoring dimension, sliced from the full template"""
+    headings = list(DIMENSION_SECTION_HEADINGS.values())
+    heading = DIMENSION_SECTION_HEADINGS[dimension]
+    next_index = headings.index(heading) + 1
+    end_marker = headings[next_index] if next_index < len(headings) else "MANDATORY SCORE VALIDATION:"
+    
+    preamble = SYNTHESIS_PROMPT_TEMPLATE[:SYNTHESIS_PROMPT_TEMPLATE.index("**EXTRACTED DATA:**")].strip()
+    rubric = _template_slice(heading, end_marker)
+    guidelines = _template_slice("CRITICAL SCORING GUIDELINES:", "**STRENGTHS & CONSIDERATIONS:**")
+    revenue_note = _template_slice("CRITICAL - REVENUE-ONLY DATA IS NORMAL:", "ANALYTICAL SUMMARY:")
+    
+    output_structure = {
+        dimension: {
+            "total_score": "number",
+            "max_score": 150,
+            "metrics": [
+                {
+                    "metric_name": name,
+                    "score": "number",
+                    "max_score": max_score,
+                    "rating": "string",
+                    "explanation": "string",
+                    "formula_used": "string"
+                }
+                for name, max_score in DIMENSION_METRICS[dimension]
+            ]
+        }
+    }
+    
+    return f"""{preamble}
+
+This request scores ONLY ONE dimension of the FranchiseScore™ ({dimension}). Use only the rubric below.
+
+**EXTRACTED DATA:**
+{compact_json(dimension_data)}
+
+**FRANCHISESCORE™ METHODOLOGY (THIS DIMENSION ONLY):**
+
+{rubric}
+
+{guidelines}
+
+{revenue_note}
+
+**OUTPUT STRUCTURE:**
+
+Return ONLY valid JSON (no markdown, no explanations):
+{json.dumps(output_structure, indent=2).replace('"number"', 'number')}"""
+
+
+def synthesize_dimension(dimension: str, item_analyses: Dict[int, Dict], franchise_name: Optional[str]) -> Optional[Dict]:
+    """Score a single dimension from only the Items it depends on"""
+    print(f"  Re-synthesizing {dimension} from Items {DIMENSION_ITEM_INPUTS[dimension]}...")
+    dimension_data = project_synthesis_payload(
+        {"franchise_name": franchise_name, "all_items": {n: a for n, a in item_analyses.items() if a}},
+        item_nums=DIMENSION_ITEM_INPUTS[dimension]
+    )
+    
+    response = call_synthesis_model(build_dimension_prompt(dimension, dimension_data), max_tokens=4000)
+    if not response:
+        return None
+    
+    result = extract_json_from_response(response)
+    if not result or dimension not in result or not result[dimension].get("metrics"):
+        print(f"  ✗ Could not extract {dimension} JSON from response")
+        return None
+    return result[dimension]
+
+
+def merge_dimensions(previous_synthesis: Dict, dimensions: Dict[str, Dict]) -> Dict:
+    """Replace re-synthesized dimensions in a previous synthesis (totals are recomputed by validation)"""
+    merged = json.loads(json.dumps(previous_synthesis))  # deep copy
+    breakdown = merged.setdefault("franchise_score_breakdown", {})
+    for dimension, data in dimensions.items():
+        if data:
+            breakdown[dimension] = data
+    return merged
+
+
+SYNTHESIS_FIELDS = ("franchise_score", "franchise_score_breakdown", "strengths", "considerations", "analytical_summary")
+
+
+def previous_synthesis_from_analysis(analysis: Dict) -> Optional[Dict]:
+    """Extract the synthesis part of a saved analysis.json, if it has a full breakdown"""
+    breakdown = analysis.get("franchise_score_breakdown") or {}
+    if not all(breakdown.get(dim, {}).get("metrics") for dim in DIMENSION_ITEM_INPUTS):
+        return None
+    return {field: analysis[field] for field in SYNTHESIS_FIELDS if field in analysis}
+
+
 # ============================================================================
 # MAIN PIPELINE
 # ============================================================================
 
-def process_pdf(pdf_path: Path) -> bool:
-    """Process a single PDF with Item-by-Item approach"""
-    franchise_name = pdf_path.stem # Use filename without extension as franchise name
-    output_dir = Path(OUTPUT_DIR) / franchise_name
+def extract_and_save_items(pdf_path: Path, output_dir: Path) -> Optional[Dict[int, str]]:
+    """Steps 1-2: extract full PDF text and split it into Items, saving both to disk"""
     items_dir = output_dir / "items"
     items_dir.mkdir(parents=True, exist_ok=True)
     
-    print(f"\n{'='*70}")
-    print(f"ITEM-BY-ITEM PROCESSING: {franchise_name}")
-    print(f"{'='*70}\n")
-    print(f"Using model: {MODEL_NAME}")
-    print(f"Synthesis API: {SYNTHESIS_API}")
-    print(f"Approach: Analyzing each of the 23 Items separately.\n")
-    
     # Step 1: Extract full PDF text
     try:
-        full_text = extract_pdf_text(str(pdf_path))
+        full_text, page_starts = extract_pdf_text_with_pages(str(pdf_path))
         with open(output_dir / "full_text.txt", 'w', encoding='utf-8') as f:
             f.write(full_text)
+        # Per-page character offsets let the semantic chunker give each chunk its real page range
+        with open(output_dir / "page_offsets.json", 'w') as f:
+            json.dump({"page_starts": page_starts}, f)
         print("  ✓ Full PDF text extracted and saved.")
     except Exception as e:
         print(f"✗ PDF extraction failed: {e}")
-        return False
+        return None
     
     # Step 2: Extract all 23 Items
     print("\nStep 2: Extracting all 23 Items...")
@@ -2928,47 +3173,234 @@ def process_pdf(pdf_path: Path) -> bool:
         with open(items_dir / f"item_{item_num:02d}.txt", 'w', encoding='utf-8') as f:
             f.write(item_text)
     
-    print(f"\nStep 3: Analyzing each Item...")
-    # Step 3: Analyze each Item with Gemini
-    item_analyses = {}
-    # Iterate through all possible item numbers (1-23)
-    for item_num in range(1, 24):
-        if item_num not in items:
-            print(f"  ⚠ Item {item_num} not found in extracted text, skipping analysis.")
-            continue
-        
-        # Perform analysis for the current item
-        analysis = analyze_item(item_num, items[item_num], items_dir)
-        if analysis:
-            item_analyses[item_num] = analysis
-            # Save individual Item analysis as JSON
-            try:
-                with open(items_dir / f"item_{item_num:02d}_analysis.json", 'w') as f:
-                    json.dump(analysis, f, indent=2)
-            except Exception as e:
-                print(f"  [DEBUG] Could not save analysis for Item {item_num}: {e}")
-    
-    print(f"\n✓ Completed analysis for {len(item_analyses)}/{len(items)} found Items.")
-    
-    # Step 4: Combine all Item analyses
-    print("\nStep 4: Combining analyses from all Items...")
-    combined_analysis = combine_item_analyses(item_analyses)
-    
-    # Step 5: Synthesize final analysis (scores, strengths, considerations, summary)
-    print("\nStep 5: Synthesizing final analysis...")
-    synthesis = synthesize_analysis(combined_analysis)
-    
-    # Update combined analysis with synthesis results
-    if synthesis:
-        combined_analysis.update(synthesis)
-    
-    # Step 6: Save the final combined analysis
-    print("\nStep 6: Saving final analysis...")
+    return items
+
+
+def save_item_analysis(items_dir: Path, item_num: int, analysis: Dict):
+    """Save an individual Item analysis as JSON"""
     try:
-        with open(output_dir / "analysis.json", 'w', encoding='utf-8') as f:
-            json.dump(combined_analysis, f, indent=2)
+        with open(items_dir / f"item_{item_num:02d}_analysis.json", 'w') as f:
+            json.dump(analysis, f, indent=2)
     except Exception as e:
-        print(f"✗ Failed to save final analysis.json: {e}")
+        print(f"  [DEBUG] Could not save analysis for Item {item_num}: {e}")
+
+
+# ============================================================================
+# PIPELINE DAG
+# ============================================================================
+#
+# item_NN (x23, concurrent) ──► combine ──► synthesize ──► validate_scores ──► save_analysis
+#                     └──── Items 1, 2, 3, 11, 19, 20 ────────────┘
+#
+# validate_and_fix_scores only reads franchise_name (Item 1) and the raw
+# analyses of the Items below, so those are its explicit inputs. Territory
+# Protection (Item 12) is validated from the synthesis explanation itself.
+
+VALIDATION_ITEM_INPUTS = {
+    1: "Franchise name (portfolio/affiliate detection)",
+    2: "Management Experience",
+    3: "Clean Record",
+    11: "Training Program Quality",
+    19: "Item 19 Performance Indicators",
+    20: "System Growth Pattern / System Performance",
+}
+
+
+def item_artifact(item_num: int) -> str:
+    return f"item_analysis_{item_num:02d}"
+
+
+def item_text_artifact(item_num: int) -> str:
+    return f"item_text_{item_num:02d}"
+
+
+def dimension_artifact(dimension: str) -> str:
+    return f"dimension_{dimension}"
+
+
+def build_fdd_task_graph(output_dir: Path, previous_synthesis: Optional[Dict] = None) -> TaskGraph:
+    """
+    Express Item analysis → combine → synthesis → validation → save as a DAG.
+    
+    With previous_synthesis (incremental mode) the single synthesis call is
+    replaced by one task per dimension, each reading only its Items, so
+    re-running an Item re-synthesizes only the dimensions that depend on it.
+    Seed the unchanged dimensions via incremental_artifacts().
+    """
+    items_dir = output_dir / "items"
+    graph = TaskGraph()
+    
+    def make_item_task(item_num: int):
+        def run(**artifacts):
+            item_text = artifacts[item_text_artifact(item_num)]
+            if not item_text:
+                print(f"  ⚠ Item {item_num} not found in extracted text, skipping analysis.")
+                return None
+            analysis = analyze_item(item_num, item_text, items_dir)
+            if analysis:
+                save_item_analysis(items_dir, item_num, analysis)
+            return analysis
+        return run
+    
+    for item_num in range(1, 24):
+        graph.add_task(f"item_{item_num:02d}", make_item_task(item_num),
+                       inputs=[item_text_artifact(item_num)], outputs=[item_artifact(item_num)])
+    
+    def combine(**artifacts):
+        item_analyses = {}
+        for item_num in range(1, 24):
+            analysis = artifacts[item_artifact(item_num)]
+            if analysis:
+                item_analyses[item_num] = analysis
+        print(f"\n✓ Completed analysis for {len(item_analyses)}/23 Items.")
+        return combine_item_analyses(item_analyses)
+    
+    def validate_scores(synthesis_raw, **artifacts):
+        if not synthesis_raw:
+            return {}
+        item1 = artifacts[item_artifact(1)] or {}
+        validation_input = {
+            "franchise_name": item1.get("franchise_name"),
+            "all_items": {n: artifacts[item_artifact(n)] for n in VALIDATION_ITEM_INPUTS if artifacts[item_artifact(n)]},
+        }
+        return validate_and_fix_scores(validation_input, synthesis_raw)
+    
+    def save_analysis(combined, synthesis):
+        analysis = dict(combined or {})
+        if synthesis:
+            analysis.update(synthesis)
+        with open(output_dir / "analysis.json", 'w', encoding='utf-8') as f:
+            json.dump(analysis, f, indent=2)
+        return analysis
+    
+    graph.add_task("combine", combine,
+                   inputs=[item_artifact(n) for n in range(1, 24)], outputs=["combined"])
+    
+    if previous_synthesis is None:
+        graph.add_task("synthesize", generate_synthesis, inputs=["combined"], outputs=["synthesis_raw"])
+    else:
+        def make_dimension_task(dimension: str):
+            def run(**artifacts):
+                item_analyses = {n: artifacts[item_artifact(n)] for n in DIMENSION_ITEM_INPUTS[dimension]}
+                result = synthesize_dimension(dimension, item_analyses, artifacts["franchise_name"])
+                # Keep the previous dimension if re-synthesis fails
+                return result or previous_synthesis["franchise_score_breakdown"][dimension]
+            return run
+        
+        for dimension, item_nums in DIMENSION_ITEM_INPUTS.items():
+            graph.add_task(f"synthesize_{dimension}", make_dimension_task(dimension),
+                           inputs=[item_artifact(n) for n in item_nums] + ["franchise_name"],
+                           outputs=[dimension_artifact(dimension)])
+        
+        def merge(**dimensions):
+            return merge_dimensions(previous_synthesis, {
+                dim: dimensions[dimension_artifact(dim)] for dim in DIMENSION_ITEM_INPUTS
+            })
+        
+        graph.add_task("merge_dimensions", merge,
+                       inputs=[dimension_artifact(dim) for dim in DIMENSION_ITEM_INPUTS], outputs=["synthesis_raw"])
+    graph.add_task("validate_scores", validate_scores,
+                   inputs=["synthesis_raw"] + [item_artifact(n) for n in VALIDATION_ITEM_INPUTS],
+                   outputs=["synthesis"])
+    graph.add_task("save_analysis", save_analysis, inputs=["combined", "synthesis"], outputs=["analysis"])
+    return graph
+
+
+def incremental_artifacts(previous_analysis: Dict) -> Dict:
+    """Seed artifacts for dimensions that will not be re-synthesized"""
+    breakdown = previous_analysis["franchise_score_breakdown"]
+    artifacts = {dimension_artifact(dim): breakdown[dim] for dim in DIMENSION_ITEM_INPUTS}
+    artifacts["franchise_name"] = previous_analysis.get("franchise_name")
+    return artifacts
+
+
+def load_fdd_artifacts(output_dir: Path) -> Dict:
+    """Load saved Item texts and Item analyses for a processed FDD"""
+    items_dir = output_dir / "items"
+    artifacts = {}
+    for item_num in range(1, 24):
+        text_path = items_dir / f"item_{item_num:02d}.txt"
+        if text_path.exists():
+            artifacts[item_text_artifact(item_num)] = text_path.read_text(encoding='utf-8')
+        analysis_path = items_dir / f"item_{item_num:02d}_analysis.json"
+        if analysis_path.exists():
+            with open(analysis_path, 'r', encoding='utf-8') as f:
+                artifacts[item_artifact(item_num)] = json.load(f)
+    return artifacts
+
+
+def finalize_analysis(item_analyses: Dict[int, Dict], output_dir: Path) -> bool:
+    """Steps 4-6: combine Item analyses, synthesize, and save analysis.json"""
+    graph = build_fdd_task_graph(output_dir)
+    artifacts = {item_artifact(n): analysis for n, analysis in item_analyses.items()}
+    store = graph.run(artifacts, rerun=["combine"], max_workers=ITEM_CONCURRENCY)
+    return store.get("analysis") is not None
+
+
+def rerun_items(output_dir: Path, item_nums: List[int], full_synthesis: bool = False) -> bool:
+    """
+    Re-analyze specific Items of an already-processed FDD and recompute only
+    their dependents. If analysis.json already has a full score breakdown,
+    only the dimensions that depend on the re-run Items are re-synthesized
+    and merged into it (unless full_synthesis is set).
+    """
+    artifacts = load_fdd_artifacts(output_dir)
+    missing = [n for n in item_nums if item_text_artifact(n) not in artifacts]
+    if missing:
+        print(f"✗ No saved Item text for Items {missing} in {output_dir / 'items'}")
+        return False
+    
+    previous_analysis = {}
+    previous_synthesis = None
+    analysis_path = output_dir / "analysis.json"
+    if not full_synthesis and analysis_path.exists():
+        with open(analysis_path, 'r', encoding='utf-8') as f:
+            previous_analysis = json.load(f)
+        previous_synthesis = previous_synthesis_from_analysis(previous_analysis)
+    
+    graph = build_fdd_task_graph(output_dir, previous_synthesis=previous_synthesis)
+    if previous_synthesis:
+        artifacts.update(incremental_artifacts(previous_analysis))
+        print(f"Incremental synthesis: re-scoring {', '.join(dimensions_for_items(item_nums)) or 'no dimensions'}; "
+              f"strengths, considerations and summary are kept from the previous run")
+    
+    rerun = [f"item_{n:02d}" for n in item_nums]
+    print(f"Re-running {', '.join(rerun)} and dependents: "
+          f"{', '.join(n for n in graph.topological_order() if n in graph.dependents(rerun) and n not in rerun)}")
+    store = graph.run(artifacts, rerun=rerun, max_workers=ITEM_CONCURRENCY)
+    graph.print_report()
+    return store.get("analysis") is not None
+
+
+def process_pdf(pdf_path: Path) -> bool:
+    """Process a single PDF with Item-by-Item approach"""
+    franchise_name = pdf_path.stem # Use filename without extension as franchise name
+    output_dir = Path(OUTPUT_DIR) / franchise_name
+    items_dir = output_dir / "items"
+    items_dir.mkdir(parents=True, exist_ok=True)
+    
+    print(f"\n{'='*70}")
+    print(f"ITEM-BY-ITEM PROCESSING: {franchise_name}")
+    print(f"{'='*70}\n")
+    print(f"Using model: {MODEL_NAME}")
+    print(f"Synthesis API: {SYNTHESIS_API}")
+    print(f"Approach: Analyzing each of the 23 Items separately.\n")
+    
+    # Steps 1-2: Extract PDF text and all 23 Items
+    items = extract_and_save_items(pdf_path, output_dir)
+    if items is None:
+        return False
+    
+    # Steps 3-6 as a DAG: Items analyzed concurrently, then combine,
+    # synthesize, validate and save
+    print(f"\nSteps 3-6: Analyzing Items ({ITEM_CONCURRENCY} concurrent), combining and synthesizing...")
+    graph = build_fdd_task_graph(output_dir)
+    artifacts = {item_text_artifact(n): text for n, text in items.items()}
+    store = graph.run(artifacts, max_workers=ITEM_CONCURRENCY)
+    graph.print_report()
+    
+    if store.get("analysis") is None:
+        print(f"✗ Failed to save final analysis.json")
         return False
     
     print(f"\n{'='*70}")
@@ -2984,12 +3416,139 @@ def process_pdf(pdf_path: Path) -> bool:
     return True
 
 
+# ============================================================================
+# BATCH MODE (BULK BACKFILLS)
+# ============================================================================
+
+def process_pdfs_batch(pdf_paths: List[Path], backend_name: str, batch_model: Optional[str] = None,
+                       poll_interval: int = DEFAULT_POLL_INTERVAL) -> Dict[str, bool]:
+    """
+    Process many PDFs with one provider-native batch job for all Item analyses.
+    
+    Text/Item extraction still runs per PDF, but every Item prompt for every
+    FDD is written to a single JSONL request file and submitted as one batch
+    job. Results are fed back into combine_item_analyses() and synthesis as
+    in process_pdf(). Item 19 responses that fail extraction fall back to an
+    online Claude call.
+    
+    Requests carry the online generation config (make_request defaults match
+    call_gemini_api). vertex runs MODEL_NAME unless batch_model overrides it,
+    anthropic needs batch_model, and local answers with call_gemini_api.
+    """
+    batch_dir = Path(OUTPUT_DIR) / "_batch_jobs" / time.strftime('%Y%m%d-%H%M%S')
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    if backend_name == "local":
+        backend = get_batch_backend(backend_name, batch_dir, responder=call_gemini_api)
+    else:
+        model = batch_model or (MODEL_NAME if backend_name == "vertex" else None)
+        backend = get_batch_backend(backend_name, batch_dir, model=model)
+        if not backend.model.endswith(MODEL_NAME):
+            print(f"⚠ Batch model {backend.model} differs from the online model {MODEL_NAME}")
+    
+    print(f"\nBatch mode: {len(pdf_paths)} FDDs via {backend_name} backend")
+    print(f"Batch work directory: {batch_dir}\n")
+    
+    # Steps 1-2 per FDD, then collect every Item prompt
+    fdds = {}
+    batch_requests = []
+    manifest = {}
+    for fdd_index, pdf_path in enumerate(pdf_paths):
+        output_dir = Path(OUTPUT_DIR) / pdf_path.stem
+        print(f"\nPreparing Items: {pdf_path.stem}")
+        items = extract_and_save_items(pdf_path, output_dir)
+        if items is None:
+            continue
+        fdds[pdf_path.stem] = {"output_dir": output_dir, "items": items}
+        
+        for item_num in sorted(items):
+            custom_id = f"req-{fdd_index:04d}-item-{item_num:02d}"
+            prompt = f"{get_item_prompt(item_num)}\n\nItem {item_num} Text:\n{items[item_num]}"
+            batch_requests.append(make_request(custom_id, prompt))
+            manifest[custom_id] = {"franchise_name": pdf_path.stem, "item_num": item_num}
+    
+    with open(batch_dir / "manifest.json", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    
+    if not batch_requests:
+        print("✗ No Items to analyze")
+        return {name: False for name in (p.stem for p in pdf_paths)}
+    
+    # Step 3: one batch job for all Item analyses
+    print(f"\nStep 3: Submitting {len(batch_requests)} Item prompts as one batch job...")
+    responses = run_batch_job(backend, batch_requests, batch_dir, label="items", poll_interval=poll_interval)
+    
+    item_analyses_by_fdd = {name: {} for name in fdds}
+    for custom_id, response in responses.items():
+        franchise_name = manifest[custom_id]["franchise_name"]
+        item_num = manifest[custom_id]["item_num"]
+        fdd = fdds[franchise_name]
+        items_dir = fdd["output_dir"] / "items"
+        
+        analysis = extract_json_from_response(response) if response else None
+        if item_num == 19 and extraction_failed(analysis):
+            print(f"  ⚠ {franchise_name}: Item 19 batch extraction failed, retrying with Claude...")
+            claude_response = call_claude_api(
+                f"{get_item_prompt(19)}\n\nItem 19 Text:\n{fdd['items'][19]}"
+            )
+            analysis = extract_json_from_response(claude_response) if claude_response else None
+        
+        if not analysis:
+            print(f"  ✗ {franchise_name}: no structured data for Item {item_num}")
+            if response:
+                with open(items_dir / f"item_{item_num:02d}_failed_response.txt", 'w', encoding='utf-8') as f:
+                    f.write(response)
+            continue
+        
+        item_analyses_by_fdd[franchise_name][item_num] = analysis
+        save_item_analysis(items_dir, item_num, analysis)
+    
+    # Steps 4-6 per FDD
+    results = {}
+    for pdf_path in pdf_paths:
+        franchise_name = pdf_path.stem
+        if franchise_name not in fdds:
+            results[franchise_name] = False
+            continue
+        item_analyses = item_analyses_by_fdd[franchise_name]
+        print(f"\n{franchise_name}: {len(item_analyses)}/{len(fdds[franchise_name]['items'])} Items analyzed")
+        results[franchise_name] = finalize_analysis(item_analyses, fdds[franchise_name]["output_dir"])
+    
+    return results
+
+
 def main():
     """Main entry point for the pipeline."""
     parser = argparse.ArgumentParser(description="Item-by-Item FDD Processing Pipeline using Vertex AI Gemini.")
-    parser.add_argument("--pdf", type=str, required=True, help="Path to the input PDF FDD file.")
+    parser.add_argument("--pdf", type=str, help="Path to the input PDF FDD file.")
+    parser.add_argument("--pdf-dir", type=str, help="Directory of PDF FDD files to process in batch mode.")
+    parser.add_argument("--batch-backend", type=str, choices=["local", "vertex", "anthropic"],
+                        help="Analyze Items with a provider-native batch job instead of online calls.")
+    parser.add_argument("--batch-model", type=str,
+                        help=f"Model for the batch job (vertex defaults to {MODEL_NAME}; required for anthropic).")
+    parser.add_argument("--poll-interval", type=int, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between batch job status checks.")
+    parser.add_argument("--rerun-items", type=int, nargs="+",
+                        help="Re-analyze only these Items of an already-processed FDD (requires --output-dir).")
+    parser.add_argument("--output-dir", type=str,
+                        help="Existing pipeline output folder for --rerun-items.")
+    parser.add_argument("--full-synthesis", action="store_true",
+                        help="With --rerun-items, re-run the full synthesis instead of only the affected dimensions.")
     args = parser.parse_args()
     
+    if args.rerun_items:
+        if not args.output_dir:
+            parser.error("--rerun-items requires --output-dir")
+        success = rerun_items(Path(args.output_dir), args.rerun_items, full_synthesis=args.full_synthesis)
+        print(f"\n{'='*70}")
+        print(f"RERUN {'COMPLETE' if success else 'FAILED'}")
+        print(f"{'='*70}\n")
+        return
+    
+    if not args.pdf and not args.pdf_dir:
+        parser.error("one of --pdf or --pdf-dir is required")
+    if args.pdf_dir and not args.batch_backend:
+        parser.error("--pdf-dir requires --batch-backend")
+    
     print(f"\n{'='*70}")
     print(f"INITIATING ITEM-BY-ITEM FDD ANALYSIS PIPELINE")
     print(f"{'='*70}\n")
@@ -2998,14 +3557,31 @@ def main():
     print(f"  Synthesis API: {SYNTHESIS_API}")
     print(f"  Output Directory: {OUTPUT_DIR}\n")
     
+    # Ensure the output directory exists
+    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+    
+    if args.batch_backend:
+        pdf_files = sorted(Path(args.pdf_dir).glob("*.pdf")) if args.pdf_dir else [Path(args.pdf)]
+        pdf_files = [p for p in pdf_files if p.exists()]
+        if not pdf_files:
+            print(f"✗ Error: no PDF files found")
+            return
+        results = process_pdfs_batch(pdf_files, args.batch_backend, batch_model=args.batch_model,
+                                     poll_interval=args.poll_interval)
+        succeeded = sum(1 for ok in results.values() if ok)
+        print(f"\n{'='*70}")
+        print(f"BATCH EXECUTION COMPLETE: {succeeded}/{len(results)} FDDs succeeded")
+        print(f"{'='*70}\n")
+        for name, ok in results.items():
+            if not ok:
+                print(f"  ✗ {name}")
+        return
+    
     pdf_file = Path(args.pdf)
     if not pdf_file.exists():
         print(f"✗ Error: PDF file not found at '{args.pdf}'")
         return
     
-    # Ensure the output directory exists
-    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
-    
     success = process_pdf(pdf_file)
     
     if success: